@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.palette import PALETTE_HEX, PALETTE_NAMES
+
+logger = logging.getLogger(__name__)
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    CV2_AVAILABLE = False
+    cv2 = None  # type: ignore
+
+RECOLOR_ALGORITHM = "lab-v1"
+# Fraction of the way source lightness is pulled toward the target shade;
+# the rest keeps the original highlights/lowlights (hair texture).
+RECOLOR_LIGHTNESS_PULL = float(os.getenv("RECOLOR_LIGHTNESS_PULL", "0.4"))
+DEFAULT_LUT_CACHE_DIR = os.getenv("COLOR_LUT_DIR", "/tmp/color-me-luts")
+
+# Bits kept per input channel: 64^3 cells x 4 bytes = 1 MiB per palette color
+LUT_BITS = 6
+
+
+@lru_cache(maxsize=None)
+def palette_lab(color: str) -> Tuple[int, int, int]:
+    """OpenCV 8-bit LAB coordinates of a palette color."""
+    hex_value = PALETTE_HEX[color].lstrip("#")
+    rgb = [int(hex_value[i : i + 2], 16) for i in (0, 2, 4)]
+    pixel = np.array([[rgb[::-1]]], dtype=np.uint8)
+    lightness, a, b = cv2.cvtColor(pixel, cv2.COLOR_BGR2LAB)[0, 0]
+    return int(lightness), int(a), int(b)
+
+
+@lru_cache(maxsize=None)
+def _lab_table(color: str) -> np.ndarray:
+    """Per-channel 256-entry LUT mapping source LAB → fully recolored LAB.
+
+    Chroma (a, b) is replaced by the target's; lightness is pulled toward
+    the target by ``RECOLOR_LIGHTNESS_PULL`` so strands keep their shading.
+    """
+    target_l, target_a, target_b = palette_lab(color)
+    levels = np.arange(256, dtype=np.float32)
+    table = np.empty((256, 1, 3), dtype=np.uint8)
+    table[:, 0, 0] = np.clip(
+        np.rint(levels + (target_l - levels) * RECOLOR_LIGHTNESS_PULL), 0, 255
+    )
+    table[:, 0, 1] = target_a
+    table[:, 0, 2] = target_b
+    table.setflags(write=False)
+    return table
+
+
+def recolor_lab(image: np.ndarray, color: str) -> np.ndarray:
+    """Reference full-strength transform: BGR → LAB → LUT → BGR.
+
+    Exact but pays two color conversions; requests go through the
+    precomputed ``COLOR_LUTS`` tables instead.
+    """
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    cv2.LUT(lab, _lab_table(color), dst=lab)
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+
+def _lut_grid(bits: int = LUT_BITS) -> np.ndarray:
+    """BGR cell centers ordered by ``b | g << bits | r << 2 * bits``."""
+    shift = 8 - bits
+    levels = (np.arange(1 << bits, dtype=np.uint8) << shift) + ((1 << shift) >> 1)
+    red, green, blue = np.meshgrid(levels, levels, levels, indexing="ij")
+    return np.stack([blue, green, red], axis=-1).reshape(-1, 1, 3)
+
+
+def build_color_lut(color: str, bits: int = LUT_BITS) -> np.ndarray:
+    """3D LUT for one color: packed BGRA uint32 per quantized BGR input."""
+    recolored = recolor_lab(_lut_grid(bits), color)
+    packed = cv2.cvtColor(recolored, cv2.COLOR_BGR2BGRA)
+    return packed.view(np.uint32).reshape(-1)
+
+
+def lut_key(bits: int = LUT_BITS) -> str:
+    """Version key: changes whenever the palette or the transform changes."""
+    spec = "|".join(
+        [RECOLOR_ALGORITHM, f"{RECOLOR_LIGHTNESS_PULL:.4f}", str(bits), cv2.__version__]
+        + [f"{name}={PALETTE_HEX[name]}" for name in PALETTE_NAMES]
+    )
+    return hashlib.sha1(spec.encode("utf-8")).hexdigest()[:12]
+
+
+class ColorLutCache:
+    """Precomputed recolor LUTs for every palette color, cached on disk.
+
+    All palette tables live in one ``.npy`` file named after ``lut_key()``
+    and are memory-mapped read-only, so worker processes share the pages.
+    The file is built (and written atomically) on first use when missing;
+    if the directory is not writable the tables are kept in memory only.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_LUT_CACHE_DIR) -> None:
+        self._cache_dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self._tables: Optional[np.ndarray] = None
+        self._source = "none"
+        self._path: Optional[Path] = None
+
+    def _load(self) -> np.ndarray:
+        tables = self._tables
+        if tables is not None:
+            return tables
+        with self._lock:
+            if self._tables is None:
+                self._tables = self._load_or_build()
+            return self._tables
+
+    def _load_or_build(self) -> np.ndarray:
+        path = self._cache_dir / f"recolor-lut-{lut_key()}.npy"
+        self._path = path
+        if path.exists():
+            try:
+                tables = np.load(path, mmap_mode="r")
+                if tables.shape == (len(PALETTE_NAMES), 1 << (3 * LUT_BITS)):
+                    self._source = "disk"
+                    return tables
+            except (OSError, ValueError) as exc:
+                logger.warning(f"Ignoring unreadable color LUT file {path}: {exc}")
+
+        tables = np.stack([build_color_lut(name) for name in PALETTE_NAMES])
+        tables.setflags(write=False)
+        self._source = "built"
+        try:
+            self._cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as handle:
+                np.save(handle, tables)
+            os.replace(tmp_path, path)
+            return np.load(path, mmap_mode="r")
+        except OSError as exc:
+            logger.warning(f"Could not persist color LUTs to {path}: {exc}")
+            return tables
+
+    def warm(self) -> None:
+        """Load (or build) the tables now instead of on the first request."""
+        if CV2_AVAILABLE:
+            self._load()
+
+    def tables(self) -> np.ndarray:
+        """All LUTs, one row per color in ``PALETTE_NAMES`` order."""
+        return self._load()
+
+    def table(self, color: str) -> np.ndarray:
+        """Packed BGRA uint32 LUT for ``color`` (see ``build_color_lut``)."""
+        return self._load()[PALETTE_NAMES.index(color)]
+
+    def stats(self) -> Dict[str, Any]:
+        tables = self._tables
+        return {
+            "source": self._source,
+            "path": str(self._path) if self._path else None,
+            "colors": 0 if tables is None else int(tables.shape[0]),
+            "bytes": 0 if tables is None else int(tables.nbytes),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables = None
+            self._source = "none"
+
+
+COLOR_LUTS = ColorLutCache()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Hashable, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle (recolor → delta_cache)
+    from app.core.recolor import RecolorDelta
+
+DEFAULT_DELTA_CACHE_MAX_BYTES = int(
+    os.getenv("DELTA_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+
+class DeltaCache:
+    """LRU cache of per-(selfie, color) recolor deltas, bounded by bytes.
+
+    A delta turns any intensity into a single multiply-add, so slider moves
+    on a selfie/color already rendered skip the LUT and mask work entirely.
+    Cached deltas are read-only because they are shared between requests.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_DELTA_CACHE_MAX_BYTES) -> None:
+        self._max_bytes = max(max_bytes, 0)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, RecolorDelta]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional["RecolorDelta"]:
+        with self._lock:
+            delta = self._entries.get(key)
+            if delta is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return delta
+
+    def put(self, key: Hashable, delta: "RecolorDelta") -> None:
+        size = delta.nbytes
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = delta
+            self._bytes += size
+            while self._bytes > self._max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+DELTA_CACHE = DeltaCache()
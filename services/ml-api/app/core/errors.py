@@ -10,6 +10,7 @@ class ApiError(Exception):
     code: str
     message: str
     details: Optional[Dict[str, Any]] = None
+    headers: Optional[Dict[str, str]] = None
 
     def to_dict(self, request_id: str) -> Dict[str, Any]:
         payload: Dict[str, Any] = {
@@ -32,6 +33,20 @@ class PayloadTooLargeError(ApiError):
         )
 
 
+class ImageDimensionsTooLargeError(ApiError):
+    def __init__(self, width: int, height: int, max_pixels: int):
+        super().__init__(
+            status_code=413,
+            code="IMAGE_DIMENSIONS_TOO_LARGE",
+            message="La selfie tiene demasiados píxeles. Usa una foto más pequeña.",
+            details={
+                "width": str(width),
+                "height": str(height),
+                "max_pixels": str(max_pixels),
+            },
+        )
+
+
 class UnsupportedMediaTypeError(ApiError):
     def __init__(self, mime_type: str):
         super().__init__(
@@ -59,3 +74,35 @@ class ImageNotFoundError(ApiError):
             message="El recurso de imagen no existe o expiró.",
             details={"image_id": image_id},
         )
+
+
+class RangeNotSatisfiableError(ApiError):
+    def __init__(self, size: int):
+        super().__init__(
+            status_code=416,
+            code="RANGE_NOT_SATISFIABLE",
+            message="El rango solicitado está fuera de la imagen.",
+            details={"size": str(size)},
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+
+
+class SelfieNotFoundError(ApiError):
+    def __init__(self, selfie_id: str):
+        super().__init__(
+            status_code=404,
+            code="SELFIE_NOT_FOUND",
+            message="La selfie no existe o expiró. Vuelve a subirla.",
+            details={"selfie_id": selfie_id},
+        )
+
+
+class ServerBusyError(ApiError):
+    def __init__(self, retry_after_seconds: int):
+        super().__init__(
+            status_code=503,
+            code="SERVER_BUSY",
+            message="El servicio está ocupado. Intenta de nuevo en unos segundos.",
+            details={"retry_after_seconds": str(retry_after_seconds)},
+            headers={"Retry-After": str(retry_after_seconds)},
+        )
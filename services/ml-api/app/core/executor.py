@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.errors import ServerBusyError
+
+T = TypeVar("T")
+
+DEFAULT_PIPELINE_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+DEFAULT_PIPELINE_QUEUE = int(os.getenv("PIPELINE_MAX_QUEUE", "16"))
+DEFAULT_RETRY_AFTER_SECONDS = int(os.getenv("PIPELINE_RETRY_AFTER_SECONDS", "2"))
+
+
+class PipelineExecutor:
+    """Runs the CPU-bound pipeline off the event loop with admission control.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` wait
+    for a worker; anything beyond that is rejected immediately with
+    ``ServerBusyError`` instead of queueing unbounded latency.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_PIPELINE_WORKERS,
+        max_queue: int = DEFAULT_PIPELINE_QUEUE,
+        retry_after_seconds: int = DEFAULT_RETRY_AFTER_SECONDS,
+    ) -> None:
+        self._max_workers = max(max_workers, 1)
+        self._max_queue = max(max_queue, 0)
+        self._retry_after_seconds = retry_after_seconds
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._admitted = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="pipeline",
+                )
+            return self._executor
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._admitted >= self._max_workers + self._max_queue:
+                self._rejected += 1
+                raise ServerBusyError(self._retry_after_seconds)
+            self._admitted += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._admitted -= 1
+            self._completed += 1
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func`` on a pipeline worker, or fail fast when saturated."""
+        self._admit()
+        try:
+            future = self._get_executor().submit(
+                functools.partial(func, *args, **kwargs)
+            )
+        except BaseException:
+            self._release()
+            raise
+        # Release on completion, not on await: a cancelled request (client
+        # disconnect) keeps its slot until the worker actually finishes.
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self._max_workers,
+                "max_queue": self._max_queue,
+                "in_flight": min(self._admitted, self._max_workers),
+                "queued": max(self._admitted - self._max_workers, 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+PIPELINE_EXECUTOR = PipelineExecutor()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Dict, Optional, Tuple
+
+from app.core.errors import RangeNotSatisfiableError
+
+
+def strong_etag(data: bytes) -> str:
+    """Strong validator for immutable content: a quoted content hash."""
+    return f'"{hashlib.sha1(data).hexdigest()}"'
+
+
+def immutable_headers(etag: str, expires_at: float) -> Dict[str, str]:
+    """Validator + caching headers for an output that never changes per id.
+
+    ``max-age`` is what is left of the TTL, so shared caches do not keep
+    serving a URL past the point where the origin would answer 404.
+    """
+    max_age = max(int(expires_at - time.time()), 0)
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, immutable",
+        "Accept-Ranges": "bytes",
+    }
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """``If-None-Match`` check (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_opaque(tag) == _opaque(etag) for tag in if_none_match.split(","))
+
+
+def byte_range(
+    range_header: Optional[str],
+    if_range: Optional[str],
+    etag: str,
+    size: int,
+) -> Optional[Tuple[int, int]]:
+    """Inclusive ``(start, end)`` to serve for a ``Range`` header, or None.
+
+    None means "send the whole body": no header, an ``If-Range`` that does
+    not match (strong comparison), a non-byte unit, several ranges (sending
+    the full representation is allowed) or an unparseable header.
+    Raises ``RangeNotSatisfiableError`` when the range starts past the end.
+    """
+    if not range_header or (if_range is not None and if_range.strip() != etag):
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:  # suffix: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiableError(size)
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiableError(size)
+    if start > end:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.models import ModelCache, SegmenterModel
+
+logger = logging.getLogger(__name__)
+
+# Per-process state, populated once by the worker initializer
+_worker_state: Dict[str, Any] = {}
+
+
+def _load_local_backend() -> Tuple[str, Any]:
+    model = ModelCache.load_segmenter()
+    return model.version, model.backend
+
+
+def _init_worker(loader: Callable[[], Tuple[str, Any]]) -> None:
+    version, backend = loader()
+    _worker_state["version"] = version
+    _worker_state["backend"] = backend
+
+
+def _worker_info() -> Tuple[str, bool]:
+    return _worker_state["version"], _worker_state["backend"] is not None
+
+
+def _worker_segment(image_rgb: np.ndarray) -> Optional[np.ndarray]:
+    results = _worker_state["backend"].process(image_rgb)
+    mask = results.segmentation_mask
+    return None if mask is None else np.asarray(mask)
+
+
+class InferencePool:
+    """Pool of inference worker processes, each with its own model.
+
+    Exposes the same ``process(image_rgb)`` call as a MediaPipe backend so
+    the segmenter does not care whether inference is local or remote. Each
+    call is handed to an idle worker; callers block until it returns.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        loader: Callable[[], Tuple[str, Any]] = _load_local_backend,
+    ) -> None:
+        self.workers = max(workers, 1)
+        # spawn: forking a process that already runs threads (and possibly
+        # MediaPipe's native runtime) is unsafe
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(loader,),
+        )
+
+    def info(self) -> Tuple[str, bool]:
+        """Return (model_version, has_backend) as loaded by a worker."""
+        return self._executor.submit(_worker_info).result()
+
+    def process(self, image_rgb: np.ndarray) -> SimpleNamespace:
+        mask = self._executor.submit(_worker_segment, image_rgb).result()
+        return SimpleNamespace(segmentation_mask=mask)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def create_pool_segmenter(
+    workers: int,
+    loader: Callable[[], Tuple[str, Any]] = _load_local_backend,
+) -> SegmenterModel:
+    """Start an inference pool and wrap it as a ``SegmenterModel``.
+
+    Falls back to the stub (no backend) when workers cannot load a model.
+    """
+    pool = InferencePool(workers, loader=loader)
+    version, has_backend = pool.info()
+    backend: Optional[InferencePool] = pool
+    if not has_backend:
+        pool.close()
+        backend = None
+    logger.info(
+        f"Started inference pool: {version} "
+        f"(workers={pool.workers}, backend={'pool' if backend else 'stub'})"
+    )
+    return SegmenterModel(name="hair-segmenter", version=version, backend=backend)
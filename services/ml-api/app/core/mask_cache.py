@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:  # pragma: no cover - import cycle (segmenter → models)
+    from app.core.segmenter import SegmentResult
+
+DEFAULT_MASK_CACHE_MAX_BYTES = int(
+    os.getenv("MASK_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+
+
+def _result_bytes(result: "SegmentResult") -> int:
+    return int(result.mask.nbytes) if result.mask is not None else 0
+
+
+class _Entry:
+    """A cached raw result plus its postprocessed variants (by config key)."""
+
+    __slots__ = ("result", "processed", "nbytes")
+
+    def __init__(self, result: "SegmentResult") -> None:
+        self.result = result
+        self.processed: Dict[str, "SegmentResult"] = {}
+        self.nbytes = _result_bytes(result)
+
+
+class MaskCache:
+    """Content-addressed LRU cache of segmentation results.
+
+    Keyed by ``SegmentResult.mask_id`` (hash of the selfie bytes) and bounded
+    by the total bytes of cached masks rather than by entry count. Cached
+    masks are made read-only because they are shared between requests.
+
+    Postprocessed masks (``postprocess_segment``) are memoized on the raw
+    entry they derive from, keyed by ``PostprocessConfig.key``: they count
+    towards the byte budget and are dropped together with it (eviction,
+    replacement, ``invalidate``), so they never outlive their raw mask.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MASK_CACHE_MAX_BYTES) -> None:
+        self._max_bytes = max(max_bytes, 0)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        self._processed_hits = 0
+        self._processed_misses = 0
+
+    def get(self, mask_id: str, model_version: str) -> Optional["SegmentResult"]:
+        with self._lock:
+            entry = self._entries.get(mask_id)
+            if entry is None or entry.result.model_version != model_version:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(mask_id)
+            self._hits += 1
+            return entry.result
+
+    def put(self, result: "SegmentResult") -> None:
+        size = _result_bytes(result)
+        if size > self._max_bytes:
+            return
+        if result.mask is not None:
+            result.mask.flags.writeable = False
+        with self._lock:
+            previous = self._entries.pop(result.mask_id, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[result.mask_id] = _Entry(result)
+            self._bytes += size
+            self._evict()
+
+    def get_processed(
+        self, raw: "SegmentResult", config_key: str
+    ) -> Optional["SegmentResult"]:
+        """Memoized ``postprocess_segment(raw, config)``, if still cached."""
+        with self._lock:
+            entry = self._entries.get(raw.mask_id)
+            processed = None
+            if entry is not None and entry.result.mask is raw.mask:
+                processed = entry.processed.get(config_key)
+            if processed is None:
+                self._processed_misses += 1
+                return None
+            self._entries.move_to_end(raw.mask_id)
+            self._processed_hits += 1
+            return processed
+
+    def put_processed(self, raw: "SegmentResult", processed: "SegmentResult") -> None:
+        """Memoize ``processed`` (derived from ``raw``) on raw's entry.
+
+        Ignored unless ``raw`` itself is the cached result: a variant is
+        never stored without (or for a different) raw mask.
+        """
+        size = _result_bytes(processed)
+        if processed.mask is not None:
+            processed.mask.flags.writeable = False
+        with self._lock:
+            entry = self._entries.get(raw.mask_id)
+            if entry is None or entry.result.mask is not raw.mask:
+                return
+            previous = entry.processed.pop(processed.postprocess, None)
+            if previous is not None:
+                entry.nbytes -= _result_bytes(previous)
+                self._bytes -= _result_bytes(previous)
+            entry.processed[processed.postprocess] = processed
+            entry.nbytes += size
+            self._bytes += size
+            self._entries.move_to_end(raw.mask_id)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self._max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached mask (e.g. after a model version swap)."""
+        with self._lock:
+            self._invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "processed_entries": sum(
+                    len(entry.processed) for entry in self._entries.values()
+                ),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "processed_hits": self._processed_hits,
+                "processed_misses": self._processed_misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+MASK_CACHE = MaskCache()
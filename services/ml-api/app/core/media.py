@@ -1,18 +1,50 @@
 from __future__ import annotations
 
 import base64
+import hashlib
+import os
 import re
-from dataclasses import dataclass
-from typing import Tuple
+import struct
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 from app.core.errors import (
+    ImageDimensionsTooLargeError,
     InvalidSelfieDataError,
     PayloadTooLargeError,
     UnsupportedMediaTypeError,
 )
 
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    CV2_AVAILABLE = False
+    cv2 = None  # type: ignore
+
 SUPPORTED_MIME_TYPES = {"image/png", "image/jpeg"}
 MAX_SELFIE_BYTES = 6 * 1024 * 1024  # 6 MB
+# Long side the pipeline actually works at; larger sources may be decoded at
+# 1/2, 1/4 or 1/8 scale directly by the codec (never below this size).
+SELFIE_WORKING_MAX_SIDE = int(os.getenv("SELFIE_WORKING_MAX_SIDE", "1280"))
+# Decoded pixel budget: a small compressed PNG can still expand to GBs.
+# Counted at the scale the codec actually decodes at (JPEG only), so large
+# phone JPEGs still fit; ~20 MB of BGR at the default working size.
+MAX_SELFIE_PIXELS = int(
+    os.getenv("MAX_SELFIE_PIXELS", str(4 * SELFIE_WORKING_MAX_SIDE**2))
+)
+OUTPUT_JPEG_QUALITY = int(os.getenv("OUTPUT_JPEG_QUALITY", "90"))
+# zlib level for rendered PNGs; low levels trade a little size for speed
+OUTPUT_PNG_COMPRESSION = int(os.getenv("OUTPUT_PNG_COMPRESSION", "1"))
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG SOFn markers carry frame dimensions (C4/C8/CC are DHT/JPG/DAC)
+_JPEG_SOF_MARKERS = {0xC0 + n for n in range(16)} - {0xC4, 0xC8, 0xCC}
+_REDUCED_DECODE_FACTORS = (8, 4, 2)
+# PNG IHDR color type → channel count
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
 
 DATA_URL_REGEX = re.compile(
     r"^data:(?P<mime>[\w/+.-]+);base64,(?P<data>[A-Za-z0-9+/=\s]+)$"
@@ -25,6 +57,187 @@ class MediaInfo:
     size_bytes: int
 
 
+@dataclass(frozen=True)
+class ImageHeader:
+    """Image geometry read from the file header, before any pixel decode."""
+
+    width: int
+    height: int
+    channels: int
+    # The codec decodes straight to 1/2, 1/4 or 1/8 scale (libjpeg); other
+    # formats are decoded at full size and only resized afterwards
+    reduced_decode: bool = False
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def decoded_bytes(self, scale: int = 1) -> int:
+        """Size of the 8-bit BGR array ``cv2.imdecode`` would allocate."""
+        return (self.width // scale) * (self.height // scale) * 3
+
+
+@dataclass
+class DecodedSelfie:
+    """Selfie decoded once per request and shared by every pipeline stage.
+
+    The base64 payload is decoded eagerly (size/mime validation needs it);
+    the pixel array is decoded lazily on first access and memoized, so
+    stages that never look at pixels do not pay for ``cv2.imdecode``.
+    """
+
+    mime_type: str
+    data: bytes
+    fingerprint: str
+    header: Optional[ImageHeader] = None
+    _image: Optional[np.ndarray] = field(default=None, repr=False)
+    _image_decoded: bool = field(default=False, repr=False)
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def image(self) -> Optional[np.ndarray]:
+        """BGR pixels, or None when the bytes are not a decodable image.
+
+        Sources much larger than ``SELFIE_WORKING_MAX_SIDE`` are decoded
+        directly at 1/2, 1/4 or 1/8 scale.
+        """
+        if not self._image_decoded:
+            self._image = _decode_image(self.data, self.header)
+            self._image_decoded = True
+        return self._image
+
+
+def fingerprint_bytes(data: bytes) -> str:
+    """Content hash used as the selfie/mask identity across caches and logs."""
+    return hashlib.sha1(data).hexdigest()[:12]
+
+
+def _probe_png(data: bytes) -> Optional[ImageHeader]:
+    if len(data) < 26 or data[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", data[16:24])
+    channels = _PNG_CHANNELS.get(data[25])
+    if channels is None:
+        return None
+    return ImageHeader(width=width, height=height, channels=channels)
+
+
+def _probe_jpeg(data: bytes) -> Optional[ImageHeader]:
+    pos = 2
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # no payload
+            pos += 2
+            continue
+        (length,) = struct.unpack(">H", data[pos + 2 : pos + 4])
+        if marker in _JPEG_SOF_MARKERS:
+            if pos + 10 > size:
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5 : pos + 9])
+            return ImageHeader(
+                width=width,
+                height=height,
+                channels=data[pos + 9],
+                reduced_decode=True,
+            )
+        pos += 2 + length
+    return None
+
+
+def sniff_mime_type(data: bytes) -> Optional[str]:
+    """Detect PNG/JPEG from magic bytes (for untyped binary uploads)."""
+    if data.startswith(_PNG_SIGNATURE):
+        return "image/png"
+    if data.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    return None
+
+
+def probe_image_header(data: bytes) -> Optional[ImageHeader]:
+    """Read width/height/channels from PNG IHDR or JPEG SOF without decoding.
+
+    Returns None for unknown or truncated headers.
+    """
+    mime_type = sniff_mime_type(data)
+    if mime_type == "image/png":
+        return _probe_png(data)
+    if mime_type == "image/jpeg":
+        return _probe_jpeg(data)
+    return None
+
+
+def _decode_scale(header: Optional[ImageHeader]) -> int:
+    """Largest reduced-decode factor that keeps the working size (1 = full)."""
+    if header is None or SELFIE_WORKING_MAX_SIDE <= 0:
+        return 1
+    long_side = max(header.width, header.height)
+    for factor in _REDUCED_DECODE_FACTORS:
+        if long_side // factor >= SELFIE_WORKING_MAX_SIDE:
+            return factor
+    return 1
+
+
+def _decode_flags(header: Optional[ImageHeader]) -> int:
+    """Pick the smallest codec-level decode scale that keeps the working size."""
+    factor = _decode_scale(header)
+    if factor == 1:
+        return cv2.IMREAD_COLOR
+    return getattr(cv2, f"IMREAD_REDUCED_COLOR_{factor}")
+
+
+def _decode_image(
+    data: bytes, header: Optional[ImageHeader] = None
+) -> Optional[np.ndarray]:
+    if not CV2_AVAILABLE or not data:
+        return None
+    flags = _decode_flags(header or probe_image_header(data))
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), flags)
+    return image if image is not None and image.size else None
+
+
+def encode_image(image: np.ndarray, mime_type: str) -> bytes:
+    """Encode BGR pixels as ``mime_type`` (PNG or JPEG)."""
+    if mime_type == "image/jpeg":
+        extension = ".jpg"
+        params = [cv2.IMWRITE_JPEG_QUALITY, OUTPUT_JPEG_QUALITY]
+    else:
+        extension = ".png"
+        params = [cv2.IMWRITE_PNG_COMPRESSION, OUTPUT_PNG_COMPRESSION]
+    ok, encoded = cv2.imencode(extension, image, params)
+    if not ok:
+        raise ValueError(f"Failed to encode image as {mime_type}")
+    return encoded.tobytes()
+
+
+def sprite_sheet(
+    tiles: np.ndarray, columns: int
+) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+    """Lay ``(n, h, w, 3)`` tiles out row-major on one image.
+
+    Returns the sheet and each tile's (x, y) origin, in input order.
+    """
+    count, height, width = tiles.shape[:3]
+    columns = max(min(columns, count), 1)
+    rows = -(-count // columns)
+    sheet = np.zeros((rows * height, columns * width, 3), dtype=tiles.dtype)
+    origins = []
+    for position, tile in enumerate(tiles):
+        x = (position % columns) * width
+        y = (position // columns) * height
+        sheet[y : y + height, x : x + width] = tile
+        origins.append((x, y))
+    return sheet, origins
+
+
 def _split_selfie_payload(selfie: str) -> Tuple[str, str]:
     """Return (mime_type, base64_data). Defaults mime when prefix missing."""
     match = DATA_URL_REGEX.match(selfie.strip())
@@ -68,3 +281,49 @@ def decode_selfie_payload(selfie: str) -> Tuple[str, bytes]:
     if len(decoded) > MAX_SELFIE_BYTES:
         raise PayloadTooLargeError(MAX_SELFIE_BYTES)
     return mime_type, decoded
+
+
+def load_selfie(selfie: str) -> DecodedSelfie:
+    """Validate and decode a selfie payload exactly once.
+
+    Raises the same errors as ``validate_selfie_payload``, plus
+    ``ImageDimensionsTooLargeError`` when the header exceeds the pixel budget.
+    """
+    mime_type, data = decode_selfie_payload(selfie)
+    return _build_selfie(mime_type, data)
+
+
+def load_selfie_bytes(data: bytes, mime_type: Optional[str]) -> DecodedSelfie:
+    """Validate raw image bytes (binary/multipart upload, no base64).
+
+    ``mime_type`` may be None or ``application/octet-stream``; the type is
+    then sniffed from the magic bytes.
+    """
+    if not data:
+        raise InvalidSelfieDataError()
+    if mime_type in (None, "", "application/octet-stream"):
+        mime_type = sniff_mime_type(data) or mime_type or "application/octet-stream"
+    if mime_type not in SUPPORTED_MIME_TYPES:
+        raise UnsupportedMediaTypeError(mime_type)
+    if len(data) > MAX_SELFIE_BYTES:
+        raise PayloadTooLargeError(MAX_SELFIE_BYTES)
+    return _build_selfie(mime_type, data)
+
+
+def _build_selfie(mime_type: str, data: bytes) -> DecodedSelfie:
+    header = probe_image_header(data)
+    if header is None:
+        # Not a readable PNG/JPEG whatever the declared type: cv2.imdecode
+        # would still decode BMP/TIFF/WebP/... without a pixel budget check
+        raise InvalidSelfieDataError()
+    scale = _decode_scale(header) if header.reduced_decode else 1
+    if header.decoded_bytes(scale) > MAX_SELFIE_PIXELS * 3:  # 8-bit BGR
+        raise ImageDimensionsTooLargeError(
+            header.width, header.height, MAX_SELFIE_PIXELS
+        )
+    return DecodedSelfie(
+        mime_type=mime_type,
+        data=data,
+        fingerprint=fingerprint_bytes(data),
+        header=header,
+    )
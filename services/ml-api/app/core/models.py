@@ -1,12 +1,25 @@
 from __future__ import annotations
 
 import logging
+import os
+import queue
+import time
+from contextlib import contextmanager
 from dataclasses import dataclass
 from threading import Lock
-from typing import Any, Optional
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.core.mask_cache import MASK_CACHE
 
 logger = logging.getLogger(__name__)
 
+# "thread": one in-process model; "process": a pool of inference workers,
+# each holding its own model (see app/core/inference_pool.py).
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+# Max in-process backend instances (thread mode); grown lazily on demand
+SEGMENTER_POOL_SIZE = int(os.getenv("SEGMENTER_POOL_SIZE", "4"))
+
 try:
     import mediapipe as mp
     MP_AVAILABLE = True
@@ -15,11 +28,114 @@ except ImportError:  # pragma: no cover
     mp = None  # type: ignore
 
 
+class BackendPool:
+    """Bounded pool of segmenter backends with checkout/checkin.
+
+    Starts with one loaded backend and lazily creates more (up to ``size``)
+    only when every instance is busy; past that, callers wait for a checkin.
+    Tracks utilization and checkout wait times.
+    """
+
+    def __init__(
+        self, first_backend: Any, factory: Callable[[], Any], size: int
+    ) -> None:
+        self._factory = factory
+        self._size = max(size, 1)
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._idle.put(first_backend)
+        self._lock = Lock()
+        self._created = 1
+        self._in_use = 0
+        self._checkouts = 0
+        self._total_wait_s = 0.0
+        self._max_wait_s = 0.0
+
+    def acquire(self) -> Any:
+        started = time.perf_counter()
+        try:
+            backend = self._idle.get_nowait()
+        except queue.Empty:
+            backend = self._grow_or_wait()
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait_s += waited
+            self._max_wait_s = max(self._max_wait_s, waited)
+        return backend
+
+    def _grow_or_wait(self) -> Any:
+        with self._lock:
+            can_grow = self._created < self._size
+            if can_grow:
+                self._created += 1
+        if can_grow:
+            try:
+                return self._factory()
+            except Exception as e:  # pragma: no cover - keep serving
+                logger.warning(f"Failed to grow segmenter pool: {e}")
+                with self._lock:
+                    self._created -= 1
+        return self._idle.get()
+
+    def release(self, backend: Any) -> None:
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(backend)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                "size": self._size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "utilization": round(self._in_use / self._size, 3),
+                "checkouts": checkouts,
+                "avg_wait_ms": round(
+                    self._total_wait_s * 1000 / checkouts if checkouts else 0.0, 3
+                ),
+                "max_wait_ms": round(self._max_wait_s * 1000, 3),
+            }
+
+    def close(self) -> None:
+        while True:
+            try:
+                backend = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                backend.close()
+            except Exception:  # pragma: no cover
+                pass
+
+
 @dataclass
 class SegmenterModel:
     name: str
     version: str
     backend: Any
+    pool: Optional[BackendPool] = None
+
+    @contextmanager
+    def checkout(self) -> Iterator[Any]:
+        """Borrow a backend instance for the duration of one inference."""
+        if self.pool is None:
+            yield self.backend
+            return
+        backend = self.pool.acquire()
+        try:
+            yield backend
+        finally:
+            self.pool.release(backend)
+
+
+def _new_mediapipe_backend() -> Any:
+    # model=1: General model (faster, good for most cases)
+    # model=0: Landscape model (more accurate, slower)
+    return mp.solutions.selfie_segmentation.SelfieSegmentation(
+        model_selection=1  # General model
+    )
 
 
 class ModelCache:
@@ -33,45 +149,77 @@ class ModelCache:
 
     @classmethod
     def segmenter(cls) -> SegmenterModel:
-        """Load MediaPipe SelfieSegmentation model (lazy, thread-safe).
+        """Return the cached segmenter, loading it on first use (thread-safe).
 
-        Uses model_selection=1 (general model, faster).
-        Falls back to stub if MediaPipe unavailable.
+        In ``INFERENCE_MODE=process`` the backend is an inference worker pool
+        with ``INFERENCE_WORKERS`` processes instead of an in-process model.
 
         Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.1
         """
+        # Fast path: no lock once loaded (attribute reads are atomic)
+        model = cls._segmenter_model
+        if model is not None:
+            return model
         with cls._lock:
             if cls._segmenter_model is None:
-                if MP_AVAILABLE:
-                    # model=1: General model (faster, good for most cases)
-                    # model=0: Landscape model (more accurate, slower)
-                    try:
-                        mp_model = mp.solutions.selfie_segmentation.SelfieSegmentation(
-                            model_selection=1  # General model
-                        )
-                        backend = mp_model
-                        version = "mediapipe-v1.0-general"
-                    except Exception as e:  # pragma: no cover
-                        logger.warning(
-                            f"Failed to load MediaPipe model: {type(e).__name__}: {str(e)}. "
-                            f"Using stub fallback."
-                        )
-                        backend = None
-                        version = "stub-v0.1.0"
+                if INFERENCE_MODE == "process":
+                    from app.core.inference_pool import create_pool_segmenter
+
+                    cls._segmenter_model = create_pool_segmenter(INFERENCE_WORKERS)
                 else:
-                    backend = None
-                    version = "stub-v0.1.0"
+                    cls._segmenter_model = cls.load_segmenter()
+                # Masks from a previous model must never be served again
+                MASK_CACHE.invalidate()
+            return cls._segmenter_model
 
-                cls._segmenter_model = SegmenterModel(
-                    name="hair-segmenter",
-                    version=version,
-                    backend=backend,
-                )
-                logger.info(
-                    f"Loaded segmenter model: {cls._segmenter_model.version} "
-                    f"(backend={'mediapipe' if MP_AVAILABLE and backend else 'stub'})"
+    @staticmethod
+    def load_segmenter() -> SegmenterModel:
+        """Load MediaPipe SelfieSegmentation model in this process (uncached).
+
+        Uses model_selection=1 (general model, faster).
+        Falls back to stub if MediaPipe unavailable. The backend is wrapped
+        in a ``BackendPool`` of up to ``SEGMENTER_POOL_SIZE`` instances.
+
+        Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.1
+        """
+        if MP_AVAILABLE:
+            try:
+                backend = _new_mediapipe_backend()
+                version = "mediapipe-v1.0-general"
+            except Exception as e:  # pragma: no cover
+                logger.warning(
+                    f"Failed to load MediaPipe model: {type(e).__name__}: {str(e)}. "
+                    f"Using stub fallback."
                 )
-            return cls._segmenter_model
+                backend = None
+                version = "stub-v0.1.0"
+        else:
+            backend = None
+            version = "stub-v0.1.0"
+
+        model = SegmenterModel(
+            name="hair-segmenter",
+            version=version,
+            backend=backend,
+            pool=(
+                BackendPool(backend, _new_mediapipe_backend, SEGMENTER_POOL_SIZE)
+                if backend is not None
+                else None
+            ),
+        )
+        logger.info(
+            f"Loaded segmenter backend: {model.version} "
+            f"(backend={'mediapipe' if MP_AVAILABLE and backend else 'stub'})"
+        )
+        return model
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        model = cls._segmenter_model
+        if model is None:
+            return {"loaded": False}
+        pool_stats = model.pool.stats() if model.pool else {}
+        return {"loaded": True, "version": model.version, **pool_stats}
 
     @classmethod
     def clear(cls) -> None:
@@ -80,9 +228,13 @@ class ModelCache:
         Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.1
         """
         with cls._lock:
-            if cls._segmenter_model and cls._segmenter_model.backend:
+            model = cls._segmenter_model
+            if model and model.pool:
+                model.pool.close()
+            elif model and model.backend:
                 try:
-                    cls._segmenter_model.backend.close()
+                    model.backend.close()
                 except Exception:  # pragma: no cover
                     pass
             cls._segmenter_model = None
+            MASK_CACHE.invalidate()
@@ -1,18 +1,39 @@
 from __future__ import annotations
 
 import base64
+import heapq
+import logging
 import os
+import shutil
 import threading
 import time
 import uuid
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from app.core.errors import ImageNotFoundError
+from app.core.http_cache import strong_etag
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_TTL_SECONDS = int(os.getenv("OUTPUT_TTL_SECONDS", "300"))
 DEFAULT_OUTPUT_DIR = os.getenv("OUTPUT_DIR", "/tmp/color-me-outputs")
+# Outputs kept in process memory; older ones are spilled to OUTPUT_DIR
+DEFAULT_OUTPUT_MEMORY_MAX_BYTES = int(
+    os.getenv("OUTPUT_MEMORY_MAX_BYTES", str(32 * 1024 * 1024))
+)
+# Hard caps on everything stored (RAM + disk); oldest outputs are evicted
+DEFAULT_OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(512 * 1024 * 1024)))
+DEFAULT_OUTPUT_MAX_ENTRIES = int(os.getenv("OUTPUT_MAX_ENTRIES", "10000"))
+DEFAULT_SWEEP_INTERVAL_SECONDS = float(os.getenv("OUTPUT_SWEEP_INTERVAL_SECONDS", "30"))
+# "memory" (per process, RAM tier + spill) or "sqlite" (shared by all the
+# worker processes on the host: files in OUTPUT_DIR + a WAL index)
+OUTPUT_STORE_BACKEND = os.getenv("OUTPUT_STORE_BACKEND", "memory")
+
+# Spill directories are per process: OUTPUT_DIR/memory-<pid>
+_SPILL_DIR_PREFIX = "memory-"
 
 _PLACEHOLDER_PNG_BASE64 = (
     "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAA"
@@ -26,47 +47,310 @@ def placeholder_png_bytes() -> bytes:
 
 @dataclass(frozen=True)
 class StoredOutput:
-    data: bytes
     content_type: str
     expires_at: float
+    size: int
+    etag: str  # strong validator (content hash)
+    data: Optional[bytes] = None  # RAM tier
+    path: Optional[Path] = None  # disk tier (spilled to ``output_dir``)
 
 
 class OutputStore:
-    """Ephemeral output store for processed images (TTL-based)."""
+    """Ephemeral output store for processed images (TTL-based).
+
+    Two tiers: the most recently used outputs stay in RAM up to
+    ``memory_max_bytes``; older ones are spilled to files in
+    ``output_dir/memory-<pid>`` and served from there (``GET /images``
+    answers with a file response), so process memory stays bounded however
+    much traffic comes in.
+
+    Expiry is tracked in a heap: ``purge_expired`` (run periodically by the
+    sweeper thread, see ``start_sweeper``) pops only what has expired, so
+    outputs nobody fetches do not pile up. ``max_bytes`` / ``max_entries``
+    hard-cap the store on top of that, evicting the oldest outputs first.
+    """
 
     def __init__(
         self,
         output_dir: str = DEFAULT_OUTPUT_DIR,
         ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        memory_max_bytes: int = DEFAULT_OUTPUT_MEMORY_MAX_BYTES,
+        max_bytes: int = DEFAULT_OUTPUT_MAX_BYTES,
+        max_entries: int = DEFAULT_OUTPUT_MAX_ENTRIES,
     ) -> None:
-        self._output_dir = Path(output_dir)
-        self._output_dir.mkdir(parents=True, exist_ok=True)
+        # Spilled files are only indexed in this process's memory, so each
+        # process spills to its own directory, emptied on start together with
+        # those left by dead processes (crash/restart) so they cannot leak.
+        self._spill_dir = Path(output_dir) / f"{_SPILL_DIR_PREFIX}{os.getpid()}"
+        _remove_stale_spill_dirs(Path(output_dir))
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
         self._ttl_seconds = ttl_seconds
+        self._memory_max_bytes = max(memory_max_bytes, 0)
+        self._max_bytes = max(max_bytes, 0)
+        self._max_entries = max(max_entries, 1)
         self._lock = threading.Lock()
+        # Insertion order == age order (the TTL is the same for every entry)
         self._metadata: Dict[str, StoredOutput] = {}
+        self._bytes = 0
+        # RAM-tier ids, least recently used first, and their total size
+        self._memory: "OrderedDict[str, int]" = OrderedDict()
+        self._memory_bytes = 0
+        # (expires_at, image_id); stale pairs are skipped when popped
+        self._expiry: List[Tuple[float, str]] = []
+        self._spills = 0
+        self._spill_errors = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
 
     def save(self, data: bytes, content_type: str) -> str:
         image_id = uuid.uuid4().hex
         expires_at = time.time() + max(self._ttl_seconds, 0)
+        output = StoredOutput(
+            content_type=content_type,
+            expires_at=expires_at,
+            size=len(data),
+            etag=strong_etag(data),
+            data=data,
+        )
         with self._lock:
-            self._metadata[image_id] = StoredOutput(
-                data=data, content_type=content_type, expires_at=expires_at
-            )
+            self._metadata[image_id] = output
+            self._bytes += output.size
+            heapq.heappush(self._expiry, (expires_at, image_id))
+            self._memory[image_id] = output.size
+            self._memory_bytes += output.size
+            stale = self._evict_over_capacity(image_id)
+            victims = self._take_spill_victims()
+        _unlink(stale)
+        for victim_id, victim in victims:
+            self._spill(victim_id, victim)
         return image_id
 
-    def get(self, image_id: str) -> Tuple[bytes, str]:
+    def _evict_over_capacity(self, keep: str) -> List[Path]:
+        """Drop the oldest outputs beyond the caps (caller holds the lock)."""
+        paths = []
+        while len(self._metadata) > self._max_entries or self._bytes > self._max_bytes:
+            oldest = next(iter(self._metadata))
+            if oldest == keep:
+                break
+            paths.extend(self._discard(oldest))
+            self._evictions += 1
+        return paths
+
+    def _take_spill_victims(self) -> List[Tuple[str, StoredOutput]]:
+        """Pop LRU RAM entries until the budget holds (caller holds the lock)."""
+        victims = []
+        while self._memory_bytes > self._memory_max_bytes and self._memory:
+            image_id, size = self._memory.popitem(last=False)
+            self._memory_bytes -= size
+            victims.append((image_id, self._metadata[image_id]))
+        return victims
+
+    def _spill(self, image_id: str, output: StoredOutput) -> None:
+        """Write ``output`` to disk outside the lock, then swap the entry."""
+        path = self._spill_dir / image_id
+        try:
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_bytes(output.data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning(f"Could not spill output {image_id} to {path}: {exc}")
+            with self._lock:
+                self._spill_errors += 1
+                if self._is_spilling(image_id, output):
+                    # Keep serving it from RAM, as most recently used
+                    self._memory[image_id] = output.size
+                    self._memory_bytes += output.size
+            return
+        with self._lock:
+            if self._is_spilling(image_id, output):
+                current = self._metadata[image_id]
+                self._metadata[image_id] = replace(current, data=None, path=path)
+                self._spills += 1
+                return
+        # Expired, evicted or cleared while being written
+        path.unlink(missing_ok=True)
+
+    def _is_spilling(self, image_id: str, output: StoredOutput) -> bool:
+        """Whether the spill victim ``output`` is still stored (caller holds the lock).
+
+        ``refresh`` may have replaced the entry (new TTL) while its file was
+        being written, so it is matched by etag rather than identity.
+        """
+        current = self._metadata.get(image_id)
+        return (
+            current is not None
+            and current.path is None
+            and current.etag == output.etag
+            and image_id not in self._memory
+        )
+
+    def _discard(self, image_id: str) -> List[Path]:
+        """Drop an entry (caller holds the lock); returns files to unlink."""
+        output = self._metadata.pop(image_id, None)
+        size = self._memory.pop(image_id, None)
+        if size is not None:
+            self._memory_bytes -= size
+        if output is None:
+            return []
+        self._bytes -= output.size
+        return [output.path] if output.path is not None else []
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Remove every expired output; O(expired · log n). Returns the count."""
+        now = time.time() if now is None else now
+        purged = 0
+        paths: List[Path] = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                expires_at, image_id = heapq.heappop(self._expiry)
+                output = self._metadata.get(image_id)
+                if output is None or output.expires_at != expires_at:
+                    continue  # already evicted or fetched-after-expiry
+                paths.extend(self._discard(image_id))
+                purged += 1
+            self._expirations += purged
+        _unlink(paths)
+        return purged
+
+    def start_sweeper(
+        self, interval_seconds: float = DEFAULT_SWEEP_INTERVAL_SECONDS
+    ) -> None:
+        """Purge expired outputs every ``interval_seconds`` on a daemon thread."""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._stop_sweeper.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep,
+                args=(max(interval_seconds, 0.01),),
+                name="output-sweeper",
+                daemon=True,
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        with self._lock:
+            sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            self._stop_sweeper.set()
+            sweeper.join()
+
+    def _sweep(self, interval_seconds: float) -> None:
+        while not self._stop_sweeper.wait(interval_seconds):
+            try:
+                self.purge_expired()
+            except Exception:  # pragma: no cover - keep sweeping
+                logger.exception("Output sweeper failed")
+
+    def lookup(self, image_id: str) -> StoredOutput:
+        """The live entry for ``image_id``: in RAM (``data``) or on disk (``path``)."""
         with self._lock:
             output = self._metadata.get(image_id)
             if output is None:
                 raise ImageNotFoundError(image_id)
             if output.expires_at <= time.time():
-                self._metadata.pop(image_id, None)
-                raise ImageNotFoundError(image_id)
+                paths = self._discard(image_id)
+                self._expirations += 1
+            else:
+                if image_id in self._memory:
+                    self._memory.move_to_end(image_id)
+                return output
+        _unlink(paths)
+        raise ImageNotFoundError(image_id)
+
+    def refresh(self, image_id: str) -> bool:
+        """Restart ``image_id``'s TTL (it counts as newest); False if gone."""
+        with self._lock:
+            output = self._metadata.get(image_id)
+            now = time.time()
+            if output is None or output.expires_at <= now:
+                return False
+            expires_at = now + max(self._ttl_seconds, 0)
+            del self._metadata[image_id]
+            self._metadata[image_id] = replace(output, expires_at=expires_at)
+            heapq.heappush(self._expiry, (expires_at, image_id))
+            if image_id in self._memory:
+                self._memory.move_to_end(image_id)
+            return True
+
+    def get(self, image_id: str) -> Tuple[bytes, str]:
+        output = self.lookup(image_id)
+        if output.data is not None:
             return output.data, output.content_type
+        try:
+            return output.path.read_bytes(), output.content_type
+        except OSError:
+            raise ImageNotFoundError(image_id)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            disk = [o.size for o in self._metadata.values() if o.path is not None]
+            return {
+                "backend": "memory",
+                "entries": len(self._metadata),
+                "max_entries": self._max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self._memory_max_bytes,
+                "disk_entries": len(disk),
+                "disk_bytes": sum(disk),
+                "spills": self._spills,
+                "spill_errors": self._spill_errors,
+                "expirations": self._expirations,
+                "evictions": self._evictions,
+            }
 
     def clear(self) -> None:
+        paths: List[Path] = []
         with self._lock:
-            self._metadata.clear()
+            for image_id in list(self._metadata):
+                paths.extend(self._discard(image_id))
+            self._expiry.clear()
+        _unlink(paths)
+
+
+def _unlink(paths: List[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def _remove_stale_spill_dirs(output_dir: Path) -> None:
+    """Delete spill directories whose process no longer exists."""
+    if not output_dir.is_dir():
+        return
+    for path in output_dir.glob(f"{_SPILL_DIR_PREFIX}*"):
+        pid = path.name[len(_SPILL_DIR_PREFIX) :]
+        if pid.isdigit() and not _process_alive(int(pid)):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by another user
+        return True
+    return True
+
+
+def create_output_store(backend: str = OUTPUT_STORE_BACKEND, **options):
+    """Output store for ``backend`` (see ``OUTPUT_STORE_BACKEND``).
+
+    ``options`` are passed to the store's constructor.
+    """
+    if backend == "sqlite":
+        from app.core.shared_output_store import SqliteOutputStore
+
+        return SqliteOutputStore(**options)
+    if backend != "memory":
+        raise ValueError(f"Unknown OUTPUT_STORE_BACKEND: {backend!r}")
+    return OutputStore(**options)
 
 
-OUTPUT_STORE = OutputStore()
+OUTPUT_STORE = create_output_store()
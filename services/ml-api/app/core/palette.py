@@ -14,3 +14,18 @@ PALETTE_NAMES = [
 DEFAULT_INTENSITY = 50
 MIN_INTENSITY = 0
 MAX_INTENSITY = 100
+INTENSITY_STEP = 5  # slider snap, as in the mobile palette.ts
+
+# Swatch colors, kept in sync with the mobile palette (palette.ts)
+PALETTE_HEX = {
+    "Midnight Espresso": "#2C1B2F",
+    "Copper Bloom": "#A15C3E",
+    "Rosewood Fade": "#7E3C3C",
+    "Saffron Glaze": "#D9902D",
+    "Sunlit Amber": "#F4B55E",
+    "Forest Veil": "#375A40",
+    "Lilac Mist": "#A78EBB",
+    "Soft Slate": "#54616F",
+    "Blush Garnet": "#94425E",
+    "Champagne Frost": "#BFAF99",
+}
@@ -1,11 +1,90 @@
+import os
 import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from app import schemas
-from app.core.media import validate_selfie_payload
+from app.core.mask_cache import MASK_CACHE
+from app.core.media import (
+    DecodedSelfie,
+    encode_image,
+    load_selfie,
+    load_selfie_bytes,
+    sprite_sheet,
+)
+from app.core.models import ModelCache
 from app.core.output_store import OUTPUT_STORE, placeholder_png_bytes
-from app.core.postprocess import apply_postprocess
-from app.core.recolor import apply_recolor
-from app.core.segmenter import segment_selfie
+from app.core.palette import PALETTE_NAMES
+from app.core.postprocess import (
+    POSTPROCESS_TIMINGS,
+    PostprocessConfig,
+    apply_postprocess,
+    postprocess_config_for,
+    postprocess_segment,
+)
+from app.core.recolor import (
+    RECOLOR_ALGORITHM,
+    apply_recolor,
+    render_intensity_sweep,
+    render_palette_previews,
+)
+from app.core.render_cache import RENDER_CACHE, CachedRender, RenderKey
+from app.core.segmenter import SegmentResult, segment_selfie
+from app.core.selfie_store import SELFIE_STORE
+
+PREVIEW_SPRITE_COLUMNS = int(os.getenv("PREVIEW_SPRITE_COLUMNS", "5"))
+
+
+def _load_source(
+    payload: schemas.SelfieSource,
+) -> Tuple[DecodedSelfie, Optional[SegmentResult]]:
+    """The selfie (not yet decoded to pixels) and its stored mask, if any."""
+    if payload.selfie_id is None:
+        return load_selfie(payload.selfie), None
+    session = SELFIE_STORE.get(payload.selfie_id)
+    return session.selfie, session.segment
+
+
+def _segment_source(
+    payload: schemas.SelfieSource,
+    selfie: DecodedSelfie,
+    stored: Optional[SegmentResult],
+) -> SegmentResult:
+    if stored is None:
+        return segment_selfie(selfie)
+    if stored.model_version != ModelCache.segmenter().version:
+        # Model swapped since upload: re-segment the stored pixels once
+        stored = segment_selfie(selfie)
+        SELFIE_STORE.replace_segment(payload.selfie_id, stored)
+    return stored
+
+
+def _resolve_selfie(
+    payload: schemas.SelfieSource,
+) -> Tuple[DecodedSelfie, SegmentResult]:
+    """Return the decoded selfie + mask, from the session store when possible."""
+    selfie, stored = _load_source(payload)
+    return selfie, _segment_source(payload, selfie, stored)
+
+
+def register_selfie(
+    payload: schemas.SelfieUploadRequest,
+) -> schemas.SelfieUploadResponse:
+    """Decode + segment a selfie once and keep it for follow-up try-ons."""
+    selfie = load_selfie(payload.selfie)
+    segment = segment_selfie(selfie)
+    image = selfie.image
+    height, width = image.shape[:2] if image is not None else (0, 0)
+    selfie_id = SELFIE_STORE.save(selfie, segment)
+    return schemas.SelfieUploadResponse(
+        selfie_id=selfie_id,
+        expires_in_seconds=SELFIE_STORE.ttl_seconds,
+        width=width,
+        height=height,
+        request_id=payload.request_id,
+    )
 
 
 def process_tryon(
@@ -13,21 +92,285 @@ def process_tryon(
 ) -> schemas.TryOnResponse:
     """Orchestrate segmentation → recolor → response assembly."""
     started = time.perf_counter()
-    media_info = validate_selfie_payload(payload.selfie)
-    segment = segment_selfie(payload.selfie)
-    recolor = apply_recolor(segment, payload.color, payload.intensity)
-    elapsed_ms = max(int((time.perf_counter() - started) * 1000), 1)
-    image_id = OUTPUT_STORE.save(
-        data=placeholder_png_bytes(), content_type=media_info.mime_type
+    selfie, stored = _load_source(payload)
+    cached = _cached_render(selfie, payload, base_url, started)
+    if cached is not None:
+        return cached
+    segment = _segment_source(payload, selfie, stored)
+    return _render(selfie, segment, payload, base_url, started)
+
+
+def process_tryon_upload(
+    data: bytes,
+    mime_type: Optional[str],
+    options: schemas.TryOnOptions,
+    base_url: str,
+) -> schemas.TryOnResponse:
+    """Same as ``process_tryon`` for raw image bytes (binary/multipart)."""
+    started = time.perf_counter()
+    selfie = load_selfie_bytes(data, mime_type)
+    cached = _cached_render(selfie, options, base_url, started)
+    if cached is not None:
+        return cached
+    return _render(selfie, segment_selfie(selfie), options, base_url, started)
+
+
+def _render_key(
+    selfie: DecodedSelfie, options: schemas.TryOnOptions, model_version: str
+) -> RenderKey:
+    config = postprocess_config_for(options.intensity)
+    return (
+        selfie.fingerprint,
+        options.color,
+        options.intensity,
+        model_version,
+        config.key,
+    )
+
+
+def _cached_render(
+    selfie: DecodedSelfie,
+    options: schemas.TryOnOptions,
+    base_url: str,
+    started: float,
+) -> Optional[schemas.TryOnResponse]:
+    """Response for an identical earlier render still in ``OUTPUT_STORE``.
+
+    Checked before segmentation: a hit costs one hash of the selfie bytes.
+    The stored image's TTL restarts so the returned URL stays fetchable.
+    """
+    key = _render_key(selfie, options, ModelCache.segmenter().version)
+    cached = RENDER_CACHE.get(key, OUTPUT_STORE.refresh)
+    if cached is None:
+        return None
+    return schemas.TryOnResponse(
+        image_url=f"{base_url}/images/{cached.image_id}",
+        processing_ms=max(int((time.perf_counter() - started) * 1000), 1),
+        request_id=options.request_id,
+        color=options.color,
+        details=cached.details | {"render_cache": "hit"},
+    )
+
+
+def _postprocess(
+    segment: SegmentResult, intensity: int
+) -> Tuple[SegmentResult, float]:
+    """Apply the intensity tier's mask postprocessing; returns (segment, ms).
+
+    Memoized per (mask_id, config) on the raw mask's ``MASK_CACHE`` entry,
+    so slider moves within a tier reuse the processed mask (0 ms).
+    """
+    config = postprocess_config_for(intensity)
+    if segment.mask is None:
+        return segment, 0.0
+    cached = MASK_CACHE.get_processed(segment, config.key)
+    if cached is not None:
+        return cached, 0.0
+    started = time.perf_counter()
+    processed = postprocess_segment(segment, config)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    POSTPROCESS_TIMINGS.record(config, elapsed_ms)
+    MASK_CACHE.put_processed(segment, processed)
+    return processed, elapsed_ms
+
+
+def _render(
+    selfie: DecodedSelfie,
+    segment: SegmentResult,
+    options: schemas.TryOnOptions,
+    base_url: str,
+    started: float,
+) -> schemas.TryOnResponse:
+    processed, postprocess_ms = _postprocess(segment, options.intensity)
+    recolor = apply_recolor(
+        processed, options.color, options.intensity, selfie=selfie
     )
+    if recolor.image is not None:
+        data = encode_image(recolor.image, selfie.mime_type)
+        content_type = selfie.mime_type
+    else:
+        # No pixels or no mask (stub backend): keep the placeholder output
+        data, content_type = placeholder_png_bytes(), "image/png"
+    image_id = OUTPUT_STORE.save(data=data, content_type=content_type)
+    elapsed_ms = max(int((time.perf_counter() - started) * 1000), 1)
     image_url = f"{base_url}/images/{image_id}"
 
-    metadata = apply_postprocess(segment, recolor, payload.intensity)
+    metadata = apply_postprocess(segment, recolor, options.intensity)
+    details = metadata | {
+        "mime_type": selfie.mime_type,
+        "postprocess_ms": f"{postprocess_ms:.2f}",
+    }
+    if recolor.image is not None:
+        # Only real renders: stub placeholders may be transient fallbacks
+        RENDER_CACHE.put(
+            _render_key(selfie, options, segment.model_version),
+            CachedRender(image_id=image_id, details=details),
+        )
     return schemas.TryOnResponse(
         image_url=image_url,
         processing_ms=elapsed_ms,
-        request_id=payload.request_id,
+        request_id=options.request_id,
         color=recolor.color,
-        details=metadata
-        | {"mime_type": media_info.mime_type},
+        details=details | {"render_cache": "miss"},
+    )
+
+
+@dataclass(frozen=True)
+class _PublishedTiles:
+    width: int
+    height: int
+    sprite_url: Optional[str]
+    # Per tile: its own URL (no sprite) and its (x, y) origin in the sprite
+    urls: List[Optional[str]]
+    origins: List[Tuple[int, int]]
+
+
+def _publish_tiles(
+    tiles: Optional[np.ndarray],
+    count: int,
+    sprite: bool,
+    mime_type: str,
+    base_url: str,
+) -> _PublishedTiles:
+    """Encode + store rendered tiles, one image each or as one sprite sheet.
+
+    ``tiles`` is None when nothing was rendered (stub backend): every tile
+    then points at one shared placeholder and the size is reported as 0.
+    """
+
+    def store(data: bytes, content_type: str) -> str:
+        image_id = OUTPUT_STORE.save(data=data, content_type=content_type)
+        return f"{base_url}/images/{image_id}"
+
+    if tiles is None:
+        placeholder_url = store(placeholder_png_bytes(), "image/png")
+        return _PublishedTiles(
+            width=0,
+            height=0,
+            sprite_url=placeholder_url if sprite else None,
+            urls=[None if sprite else placeholder_url] * count,
+            origins=[(0, 0)] * count,
+        )
+
+    height, width = tiles.shape[1:3]
+    if sprite:
+        sheet, origins = sprite_sheet(tiles, PREVIEW_SPRITE_COLUMNS)
+        return _PublishedTiles(
+            width=width,
+            height=height,
+            sprite_url=store(encode_image(sheet, mime_type), mime_type),
+            urls=[None] * count,
+            origins=origins,
+        )
+    return _PublishedTiles(
+        width=width,
+        height=height,
+        sprite_url=None,
+        urls=[store(encode_image(tile, mime_type), mime_type) for tile in tiles],
+        origins=[(0, 0)] * count,
+    )
+
+
+def _batch_details(
+    selfie: DecodedSelfie, segment: SegmentResult, rendered: bool
+) -> Dict[str, str]:
+    details = {
+        "segment_mask_id": segment.mask_id,
+        "segment_model_version": segment.model_version,
+        "backend": segment.backend,
+        "mime_type": selfie.mime_type,
+    }
+    if rendered:
+        details["recolor"] = RECOLOR_ALGORITHM
+    return details
+
+
+def process_palette_preview(
+    payload: schemas.PalettePreviewRequest, base_url: str
+) -> schemas.PalettePreviewResponse:
+    """Decode + segment once, then render every requested color as a preview."""
+    started = time.perf_counter()
+    selfie, segment = _resolve_selfie(payload)
+    colors = payload.colors or list(PALETTE_NAMES)
+    processed, _ = _postprocess(segment, payload.intensity)
+    tiles = render_palette_previews(
+        selfie, processed, colors, payload.intensity, payload.max_side
+    )
+    published = _publish_tiles(
+        tiles, len(colors), payload.sprite, selfie.mime_type, base_url
+    )
+    return schemas.PalettePreviewResponse(
+        request_id=payload.request_id,
+        processing_ms=max(int((time.perf_counter() - started) * 1000), 1),
+        intensity=payload.intensity,
+        tile_width=published.width,
+        tile_height=published.height,
+        sprite_url=published.sprite_url,
+        previews=[
+            schemas.PalettePreviewItem(color=color, image_url=url, x=x, y=y)
+            for color, url, (x, y) in zip(colors, published.urls, published.origins)
+        ],
+        details=_batch_details(selfie, segment, tiles is not None),
+    )
+
+
+def _render_sweep(
+    selfie: DecodedSelfie,
+    segment: SegmentResult,
+    color: str,
+    intensities: List[int],
+    max_side: Optional[int],
+) -> Optional[np.ndarray]:
+    """Sweep frames, rendered per postprocess tier (one delta per tier)."""
+    tiers: Dict[PostprocessConfig, List[int]] = {}
+    for position, intensity in enumerate(intensities):
+        tiers.setdefault(postprocess_config_for(intensity), []).append(position)
+
+    frames: Optional[np.ndarray] = None
+    for positions in tiers.values():
+        processed, _ = _postprocess(segment, intensities[positions[0]])
+        tier_frames = render_intensity_sweep(
+            selfie,
+            processed,
+            color,
+            [intensities[position] for position in positions],
+            max_side,
+        )
+        if tier_frames is None:
+            return None
+        if frames is None:
+            frames = np.empty(
+                (len(intensities),) + tier_frames.shape[1:], dtype=np.uint8
+            )
+        frames[positions] = tier_frames
+    return frames
+
+
+def process_intensity_sweep(
+    payload: schemas.IntensitySweepRequest, base_url: str
+) -> schemas.IntensitySweepResponse:
+    """Render every slider position of one color from a single delta."""
+    started = time.perf_counter()
+    selfie, segment = _resolve_selfie(payload)
+    intensities = payload.intensities
+    frames = _render_sweep(
+        selfie, segment, payload.color, intensities, payload.max_side
+    )
+    published = _publish_tiles(
+        frames, len(intensities), payload.sprite, selfie.mime_type, base_url
+    )
+    return schemas.IntensitySweepResponse(
+        request_id=payload.request_id,
+        processing_ms=max(int((time.perf_counter() - started) * 1000), 1),
+        color=payload.color,
+        frame_width=published.width,
+        frame_height=published.height,
+        sprite_url=published.sprite_url,
+        frames=[
+            schemas.IntensitySweepFrame(intensity=intensity, image_url=url, x=x, y=y)
+            for intensity, url, (x, y) in zip(
+                intensities, published.urls, published.origins
+            )
+        ],
+        details=_batch_details(selfie, segment, frames is not None),
     )
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import dataclasses
+import math
+import threading
 from dataclasses import dataclass
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 
@@ -16,10 +20,12 @@ except ImportError:  # pragma: no cover
     cv2 = None  # type: ignore
 
 
-@dataclass
+@dataclass(frozen=True)
 class PostprocessConfig:
     """Post-processing configuration.
 
+    Frozen (hashable) so kernels and processed masks can be cached per config.
+
     Task: ML_TRAINING_EXECUTION_PLAN.md § 1.4.1
     """
     feather_radius: int = 5  # Gaussian blur radius (pixels)
@@ -28,16 +34,86 @@ class PostprocessConfig:
     enable_dilation: bool = False  # Fill small holes
     anti_bleed_threshold: int = 10  # Edge refinement threshold
 
+    @property
+    def key(self) -> str:
+        """Compact stable id, used in cache keys and stats."""
+        return (
+            f"f{self.feather_radius}-k{self.morph_kernel_size}"
+            f"-e{int(self.enable_erosion)}-d{int(self.enable_dilation)}"
+            f"-t{self.anti_bleed_threshold}"
+        )
+
+
+def postprocess_config_for(intensity: int) -> PostprocessConfig:
+    """Intensity tier → config: higher intensity = more feathering.
+
+    Task: ML_TRAINING_EXECUTION_PLAN.md § 1.4.1
+    """
+    if intensity >= 70:
+        feather = 7
+    elif intensity >= 40:
+        feather = 5
+    else:
+        feather = 3
+    return PostprocessConfig(
+        feather_radius=feather,
+        enable_erosion=False,
+        enable_dilation=False,
+        anti_bleed_threshold=0,
+    )
+
+
+# Smallest feather at mask resolution: one mask pixel (3-tap kernel). Radii
+# scaled below it would blur nothing yet still cost a filter pass.
+_MIN_FEATHER_RADIUS = 1.0
+
+
+@dataclass(frozen=True)
+class _Kernels:
+    gaussian: Optional[np.ndarray]  # 1-D, applied separably
+    structuring: Optional[np.ndarray]
+
+
+@lru_cache(maxsize=64)
+def _kernels(config: PostprocessConfig, scale: float) -> _Kernels:
+    """Kernels for ``config`` with sizes scaled to the mask resolution.
+
+    The feather radius is clamped to ``_MIN_FEATHER_RADIUS`` mask pixels.
+    """
+    gaussian = None
+    if config.feather_radius > 0:
+        radius = max(config.feather_radius * scale, _MIN_FEATHER_RADIUS)
+        gaussian = cv2.getGaussianKernel(2 * math.ceil(radius) + 1, radius / 2)
+        gaussian.setflags(write=False)
+    structuring = None
+    if config.enable_erosion or config.enable_dilation:
+        size = max(int(round(config.morph_kernel_size * scale)), 1) | 1
+        structuring = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+        structuring.setflags(write=False)
+    return _Kernels(gaussian=gaussian, structuring=structuring)
+
 
 def postprocess_mask(
     mask: Optional[np.ndarray],
-    config: Optional[PostprocessConfig] = None
+    config: Optional[PostprocessConfig] = None,
+    scale: float = 1.0,
 ) -> Optional[np.ndarray]:
     """Apply post-processing to segmentation mask.
 
+    Pass the ROI view of the mask (``SegmentResult.roi``) rather than the
+    full frame: the ROI margin covers the feather radius, so the result
+    matches full-frame processing cropped to the ROI. The input is never
+    modified (it may be a shared cached mask).
+
     Args:
         mask: Binary mask (0-255 uint8)
         config: Post-processing config (defaults if None)
+        scale: Mask resolution relative to the source image; kernel sizes
+            (given in source pixels) are scaled to match. The feather never
+            drops below one mask pixel, so on sources much larger than the
+            mask (e.g. a 4K selfie on a 256 px model mask) every feather
+            tier yields the same one-pixel blur, and the edge softness
+            after upsampling is set by the mask resolution instead
 
     Returns:
         Improved mask (0-255 uint8) or None if input is None
@@ -53,29 +129,21 @@ def postprocess_mask(
     if mask is None or mask.size == 0:
         return mask
 
-    processed = mask.copy()
+    kernels = _kernels(config, round(scale, 4))
+    # Every op below allocates its output, so no defensive copy is needed
+    processed = mask
 
     # Morphological operations (remove noise, fill holes)
-    if config.enable_erosion or config.enable_dilation:
-        kernel = cv2.getStructuringElement(
-            cv2.MORPH_ELLIPSE,
-            (config.morph_kernel_size, config.morph_kernel_size)
-        )
-
+    if kernels.structuring is not None:
         if config.enable_erosion:
-            processed = cv2.erode(processed, kernel, iterations=1)
+            processed = cv2.erode(processed, kernels.structuring, iterations=1)
 
         if config.enable_dilation:
-            processed = cv2.dilate(processed, kernel, iterations=1)
+            processed = cv2.dilate(processed, kernels.structuring, iterations=1)
 
     # Feathering (blur edges for smooth transition)
-    if config.feather_radius > 0:
-        ksize = config.feather_radius * 2 + 1
-        processed = cv2.GaussianBlur(
-            processed,
-            (ksize, ksize),
-            sigmaX=config.feather_radius / 2
-        )
+    if kernels.gaussian is not None:
+        processed = cv2.sepFilter2D(processed, -1, kernels.gaussian, kernels.gaussian)
 
     # Anti-bleed (threshold after blur to maintain edge definition)
     if config.anti_bleed_threshold > 0:
@@ -89,13 +157,63 @@ def postprocess_mask(
     return processed
 
 
+def postprocess_segment(
+    segment: SegmentResult, config: PostprocessConfig
+) -> SegmentResult:
+    """``segment`` with its mask postprocessed by ``config``.
+
+    Runs at the mask's own (model) resolution with kernels scaled to it;
+    upsampling afterwards spreads the feather over the source pixels, at a
+    fraction of the cost of blurring the full-resolution mask. The ROI is
+    kept: its margin already covers the feather radius.
+    """
+    if segment.mask is None:
+        return segment
+    scale = segment.mask.shape[1] / segment.width if segment.width else 1.0
+    mask = postprocess_mask(segment.mask, config, scale=scale)
+    if mask is not segment.mask:
+        mask.flags.writeable = False
+    return dataclasses.replace(segment, mask=mask, postprocess=config.key)
+
+
+class PostprocessTimings:
+    """Per-config postprocess latency counters (``GET /stats``)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._timings: Dict[str, Tuple[int, float, float]] = {}
+
+    def record(self, config: PostprocessConfig, elapsed_ms: float) -> None:
+        with self._lock:
+            count, total, peak = self._timings.get(config.key, (0, 0.0, 0.0))
+            self._timings[config.key] = (
+                count + 1,
+                total + elapsed_ms,
+                max(peak, elapsed_ms),
+            )
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                key: {
+                    "count": count,
+                    "avg_ms": round(total / count, 3),
+                    "max_ms": round(peak, 3),
+                }
+                for key, (count, total, peak) in self._timings.items()
+            }
+
+
+POSTPROCESS_TIMINGS = PostprocessTimings()
+
+
 def apply_postprocess(
     segment: SegmentResult, recolor_result: RecolorResult, intensity: int
 ) -> Dict[str, str]:
-    """Apply post-processing and return metadata.
+    """Return post-processing metadata for a render.
 
-    For now, returns metadata only (mask ops in future PR).
-    Intensity-based config: higher intensity = more aggressive feathering.
+    The mask itself is processed by ``postprocess_segment`` (pipeline)
+    before recolor; this reports the intensity tier's config.
 
     Args:
         segment: Segmentation result
@@ -107,14 +225,9 @@ def apply_postprocess(
 
     Task: ML_TRAINING_EXECUTION_PLAN.md § 1.4.1
     """
-    # Determine post-processing config based on intensity
-    # Higher intensity = more feathering for natural blend
-    if intensity >= 70:
-        feather = 7
-    elif intensity >= 40:
-        feather = 5
-    else:
-        feather = 3
+    config = postprocess_config_for(intensity)
+    morph_ops = config.enable_erosion or config.enable_dilation
+    anti_bleed = config.anti_bleed_threshold > 0
 
     metadata = {
         **recolor_result.metadata,
@@ -123,11 +236,10 @@ def apply_postprocess(
         "mask_hash": segment.mask_id,
         "backend": segment.backend,
         "postprocess": (
-            f"feather_radius={feather};morph_ops=false;anti_bleed=false"
+            f"feather_radius={config.feather_radius};"
+            f"morph_ops={str(morph_ops).lower()};"
+            f"anti_bleed={str(anti_bleed).lower()}"
         ),
     }
 
-    # Future: Apply postprocess_mask() and composite result
-    # For Phase 1, metadata only (no actual mask ops in pipeline yet)
-
     return metadata
@@ -1,8 +1,26 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Tuple
 
-from app.core.segmenter import SegmentResult
+import numpy as np
+
+from app.core.color_lut import COLOR_LUTS, LUT_BITS, RECOLOR_ALGORITHM
+from app.core.delta_cache import DELTA_CACHE
+from app.core.media import DecodedSelfie
+from app.core.palette import PALETTE_NAMES
+from app.core.segmenter import SegmentResult, segment_roi, upsample_mask
+
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    CV2_AVAILABLE = False
+    cv2 = None  # type: ignore
+
+# Deltas span -255..255; stored as int8 in steps of 2 (max error 1 level)
+DELTA_SCALE = 2
 
 
 @dataclass(frozen=True)
@@ -11,19 +29,326 @@ class RecolorResult:
     color: str
     intensity: int
     metadata: dict[str, str]
+    # Rendered BGR image at source resolution; None when nothing was rendered
+    image: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+
+
+class _Workspace(threading.local):
+    """Per-thread scratch buffers reused across renders (grow-only)."""
+
+    def __init__(self) -> None:
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def take(self, name: str, shape: Tuple[int, ...], dtype) -> np.ndarray:
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size or buffer.dtype != dtype:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[name] = buffer
+        # Prefix of a flat buffer: contiguous, so OpenCV writes into it in place
+        return buffer[:size].reshape(shape)
+
+
+_WORKSPACE = _Workspace()
+
+
+@dataclass(frozen=True)
+class RecolorDelta:
+    """Mask-weighted ``recolored - source`` for one selfie and color.
+
+    Cropped to the mask bounding box at (``x``, ``y``) and quantized to int8
+    in steps of ``DELTA_SCALE``; ``delta`` is None when the mask is empty.
+    Any intensity renders as ``source + delta * DELTA_SCALE * intensity/100``.
+    """
+
+    x: int
+    y: int
+    delta: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.delta.nbytes) if self.delta is not None else 0
 
 
-def apply_recolor(segment: SegmentResult, color: str, intensity: int) -> RecolorResult:
-    """Mock recolor step that produces a deterministic URL for demo/testing."""
+def _lut_index(source: np.ndarray) -> np.ndarray:
+    """3D LUT cell index of every BGR pixel of ``source`` (per-thread buffer).
+
+    Pixels are widened to BGRA so each one is a little-endian uint32; the
+    top ``LUT_BITS`` of each channel are then packed into the table index
+    with shifts/masks.
+    """
+    height, width = source.shape[:2]
+    bgra = _WORKSPACE.take("bgra", (height, width, 4), np.uint8)
+    cv2.cvtColor(source, cv2.COLOR_BGR2BGRA, dst=bgra)
+    packed = bgra.view(np.uint32).reshape(height, width)
+    index = _WORKSPACE.take("index", (height, width), np.uint32)
+    scratch = _WORKSPACE.take("scratch", (height, width), np.uint32)
+
+    shift = 8 - LUT_BITS
+    channel_mask = (1 << LUT_BITS) - 1
+    np.right_shift(packed, shift, out=index)
+    np.bitwise_and(index, channel_mask, out=index)
+    for channel in (1, 2):
+        np.right_shift(packed, 8 * channel + shift - LUT_BITS * channel, out=scratch)
+        np.bitwise_and(scratch, channel_mask << (LUT_BITS * channel), out=scratch)
+        np.bitwise_or(index, scratch, out=index)
+    return index
+
+
+def _apply_lut(source: np.ndarray, table: np.ndarray, out: np.ndarray) -> None:
+    """Map every BGR pixel of ``source`` through a packed 3D LUT into ``out``."""
+    height, width = source.shape[:2]
+    index = _lut_index(source)
+    bgra = _WORKSPACE.take("bgra", (height, width, 4), np.uint8)
+    np.take(table, index, out=bgra.view(np.uint32).reshape(height, width), mode="clip")
+    cv2.cvtColor(bgra, cv2.COLOR_BGRA2BGR, dst=out)
+
+
+def downscale(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Shrink so the long side is at most ``max_side`` (never upscale)."""
+    height, width = image.shape[:2]
+    long_side = max(height, width)
+    if max_side <= 0 or long_side <= max_side:
+        return image
+    scale = max_side / long_side
+    size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def build_recolor_delta(
+    image: np.ndarray, mask: np.ndarray, color: str
+) -> RecolorDelta:
+    """Full-strength recolor of the masked region, stored as a delta.
+
+    ``mask`` (0-255) covers the whole image; only its bounding box is
+    processed. Segments with a known ROI use ``_build_delta`` directly.
+    """
+    x, y, width, height = cv2.boundingRect(mask)
+    if width == 0 or height == 0:
+        return RecolorDelta(x=0, y=0)
+    region = (slice(y, y + height), slice(x, x + width))
+    return _build_delta(image[region], mask[region], x, y, color)
+
+
+def _build_delta(
+    source: np.ndarray, region_mask: np.ndarray, x: int, y: int, color: str
+) -> RecolorDelta:
+    """Delta for the region of the image at (``x``, ``y``).
+
+    ``source`` and ``region_mask`` are views of the same region. The
+    full-strength transform (see ``color_lut.recolor_lab``) is one lookup in
+    the color's precomputed 3D LUT; the difference to the source is weighted
+    by the mask. Intermediates live in reusable per-thread buffers.
+    """
+    recolored = _WORKSPACE.take("recolored", source.shape, np.uint8)
+    _apply_lut(source, COLOR_LUTS.table(color), recolored)
+
+    difference = _WORKSPACE.take("difference", source.shape, np.int16)
+    cv2.subtract(recolored, source, dst=difference, dtype=cv2.CV_16S)
+    weights = _WORKSPACE.take("weights", source.shape, np.uint8)
+    cv2.cvtColor(region_mask, cv2.COLOR_GRAY2BGR, dst=weights)
+    delta = np.empty(source.shape, dtype=np.int8)
+    cv2.multiply(
+        difference, weights, dst=delta, scale=1 / (255 * DELTA_SCALE), dtype=cv2.CV_8S
+    )
+    delta.flags.writeable = False
+    return RecolorDelta(x=x, y=y, delta=delta)
+
+
+def render_delta(
+    image: np.ndarray,
+    delta: RecolorDelta,
+    intensity: int,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Apply ``delta`` at ``intensity`` (0-100) with one fused multiply-add.
+
+    Writes into ``out`` when given (same shape as ``image``), else a copy.
+    """
+    if out is None:
+        output = image.copy()
+    else:
+        output = out
+        np.copyto(output, image)
+    if delta.delta is None or intensity <= 0:
+        return output
+    height, width = delta.delta.shape[:2]
+    region = (slice(delta.y, delta.y + height), slice(delta.x, delta.x + width))
+    cv2.addWeighted(
+        image[region],
+        1.0,
+        delta.delta,
+        DELTA_SCALE * intensity / 100,
+        0.0,
+        dst=output[region],
+        dtype=cv2.CV_8U,
+    )
+    return output
+
+
+def recolor_image(
+    image: np.ndarray, mask: np.ndarray, color: str, intensity: int
+) -> np.ndarray:
+    """Recolor the masked region of a BGR image toward ``color``.
+
+    Blends with the original through ``mask`` (0-255) scaled by
+    ``intensity`` (0-100); the returned image is a new array.
+    """
+    return render_delta(image, build_recolor_delta(image, mask, color), intensity)
+
+
+def render_palette(
+    image: np.ndarray, mask: np.ndarray, colors: Sequence[str], intensity: int
+) -> np.ndarray:
+    """Render several colors over one image in a single batch.
+
+    Returns ``(len(colors), height, width, 3)`` uint8. The LUT index of the
+    masked region is computed once and every color is resolved with one
+    gather over all tables, then blended together with broadcasting; meant
+    for preview-sized images, where the batch fits comfortably in memory.
+    """
+    tiles = np.repeat(image[np.newaxis], len(colors), axis=0)
+    x, y, width, height = cv2.boundingRect(mask)
+    if width == 0 or height == 0 or intensity <= 0 or not colors:
+        return tiles
+
+    region = (slice(y, y + height), slice(x, x + width))
+    source = image[region]
+    index = _lut_index(source)
+    tables = COLOR_LUTS.tables()
+    offsets = np.array(
+        [PALETTE_NAMES.index(color) * tables.shape[1] for color in colors],
+        dtype=np.uint32,
+    )
+    packed = np.take(
+        tables.reshape(-1), offsets[:, None, None] + index[None], mode="clip"
+    )
+    recolored = packed.view(np.uint8).reshape(len(colors), height, width, 4)[..., :3]
+
+    alpha = mask[region].astype(np.float32)[..., None]
+    alpha *= np.float32(intensity / (100 * 255))
+    blended = recolored.astype(np.float32)
+    blended -= source
+    blended *= alpha
+    blended += source
+    np.rint(blended, out=blended)
+    tiles[:, region[0], region[1]] = blended.astype(np.uint8)
+    return tiles
+
+
+def render_palette_previews(
+    selfie: DecodedSelfie,
+    segment: SegmentResult,
+    colors: Sequence[str],
+    intensity: int,
+    max_side: int,
+) -> Optional[np.ndarray]:
+    """``render_palette`` on the selfie shrunk to ``max_side``.
+
+    The model-resolution mask is upsampled straight to the preview size.
+    Returns None when there is nothing to render (no mask or no pixels).
+    """
+    if segment.mask is None or not CV2_AVAILABLE:
+        return None
+    pixels = selfie.image
+    if pixels is None:
+        return None
+    preview = downscale(pixels, max_side)
+    height, width = preview.shape[:2]
+    mask = upsample_mask(segment, width, height, guide=preview)
+    return render_palette(preview, mask, colors, intensity)
+
+
+def render_intensity_sweep(
+    selfie: DecodedSelfie,
+    segment: SegmentResult,
+    color: str,
+    intensities: Sequence[int],
+    max_side: Optional[int] = None,
+) -> Optional[np.ndarray]:
+    """Render one color at several intensities: ``(len(intensities), h, w, 3)``.
+
+    The delta is built once (and shared with ``apply_recolor`` through
+    ``DELTA_CACHE`` at full size); every frame is then a multiply-add.
+    ``max_side`` shrinks the frames first. Returns None when there is
+    nothing to render (no mask or no pixels).
+    """
+    if segment.mask is None or not CV2_AVAILABLE:
+        return None
+    pixels = selfie.image
+    if pixels is None:
+        return None
+    image = downscale(pixels, max_side) if max_side else pixels
+    if image is pixels:
+        delta = _selfie_delta(selfie, pixels, segment, color)
+    else:
+        height, width = image.shape[:2]
+        delta = build_recolor_delta(
+            image, upsample_mask(segment, width, height, guide=image), color
+        )
+
+    frames = np.empty((len(intensities),) + image.shape, dtype=np.uint8)
+    for frame, intensity in zip(frames, intensities):
+        render_delta(image, delta, intensity, out=frame)
+    return frames
+
+
+def _selfie_delta(
+    selfie: DecodedSelfie, pixels: np.ndarray, segment: SegmentResult, color: str
+) -> RecolorDelta:
+    key = (selfie.fingerprint, segment.model_version, segment.postprocess, color)
+    delta = DELTA_CACHE.get(key)
+    if delta is None:
+        height, width = pixels.shape[:2]
+        x, y, roi_width, roi_height = segment_roi(segment)
+        if roi_width == 0 or roi_height == 0:
+            delta = RecolorDelta(x=0, y=0)
+        else:
+            # Only the ROI is upsampled and recolored; the rest passes through
+            mask = upsample_mask(
+                segment, width, height, roi=(x, y, roi_width, roi_height), guide=pixels
+            )
+            source = pixels[y : y + roi_height, x : x + roi_width]
+            delta = _build_delta(source, mask, x, y, color)
+        DELTA_CACHE.put(key, delta)
+    return delta
+
+
+def apply_recolor(
+    segment: SegmentResult,
+    color: str,
+    intensity: int,
+    selfie: Optional[DecodedSelfie] = None,
+) -> RecolorResult:
+    """Recolor the selfie's hair and describe the result.
+
+    Renders only when ``selfie`` pixels and a segmentation mask are both
+    available; otherwise (stub backend, undecodable bytes) ``image`` is
+    None and callers fall back to a placeholder. The per-(selfie, color)
+    delta is kept in ``DELTA_CACHE``, so other intensities of the same
+    color cost one multiply-add. ``image_url`` is a deterministic id for
+    demo/testing either way.
+    """
     slug = color.replace(" ", "-").lower()
     image_url = f"https://cdn.example.com/processed/{slug}-{intensity}-{segment.mask_id}.png"
     metadata = {
         "segment_mask_id": segment.mask_id,
         "segment_model_version": segment.model_version,
     }
+
+    image = None
+    pixels = None
+    if selfie is not None and segment.mask is not None and CV2_AVAILABLE:
+        pixels = selfie.image
+    if pixels is not None:
+        delta = _selfie_delta(selfie, pixels, segment, color)
+        image = render_delta(pixels, delta, intensity)
+        metadata["recolor"] = RECOLOR_ALGORITHM
+
     return RecolorResult(
         image_url=image_url,
         color=color,
         intensity=intensity,
         metadata=metadata,
+        image=image,
     )
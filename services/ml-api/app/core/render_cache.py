@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+DEFAULT_RENDER_CACHE_MAX_ENTRIES = int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "4096"))
+
+# (mask_id, color, intensity, model_version, postprocess config key)
+RenderKey = Tuple[str, str, int, str, str]
+
+
+@dataclass(frozen=True)
+class CachedRender:
+    """A finished try-on: its stored image and the response details."""
+
+    image_id: str
+    details: Dict[str, str]
+
+
+class RenderCache:
+    """Content-addressed LRU of finished renders → stored ``image_id``.
+
+    Identical requests (retries, toggling back to a color) reuse the image
+    already in ``OUTPUT_STORE`` instead of re-running the pipeline. Entries
+    are tiny, so the bound is an entry count. An entry whose image is gone
+    from the store (expired/evicted) is dropped on lookup and counted as
+    ``stale``.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_RENDER_CACHE_MAX_ENTRIES) -> None:
+        self._max_entries = max(max_entries, 0)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, CachedRender]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+
+    def get(
+        self, key: Hashable, is_live: Callable[[str], bool]
+    ) -> Optional[CachedRender]:
+        """Cached render for ``key`` whose image ``is_live`` still confirms."""
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None and not is_live(cached.image_id):
+            with self._lock:
+                if self._entries.get(key) is cached:
+                    del self._entries[key]
+                self._stale += 1
+            cached = None
+        with self._lock:
+            if cached is None:
+                self._misses += 1
+                return None
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._hits += 1
+            return cached
+
+    def put(self, key: Hashable, render: CachedRender) -> None:
+        if self._max_entries == 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = render
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self._max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+RENDER_CACHE = RenderCache()
@@ -2,30 +2,68 @@ from __future__ import annotations
 
 import hashlib
 import logging
+import math
+import os
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple, Union
 
 import numpy as np
 
-from app.core.media import decode_selfie_payload
+from app.core.errors import ApiError
+from app.core.mask_cache import MASK_CACHE
+from app.core.media import DecodedSelfie, load_selfie
 from app.core.models import ModelCache, SegmenterModel
+from app.core.upsample import MASK_UPSAMPLE_MODE, guided_upsample, upsample_region
 
 logger = logging.getLogger(__name__)
 
 try:
     import cv2
+except ImportError:  # pragma: no cover - optional dependency
+    cv2 = None  # type: ignore
+
+try:
     import mediapipe as mp
-    MP_AVAILABLE = True
+    MP_AVAILABLE = cv2 is not None
 except ImportError:  # pragma: no cover - optional dependency
     MP_AVAILABLE = False
-    cv2 = None  # type: ignore
     mp = None  # type: ignore
 
+# Long side of the image fed to the model. MediaPipe SelfieSegmentation runs
+# at 256x256 internally, so larger inputs only add resize/copy cost.
+SEGMENTER_INPUT_SIZE = int(os.getenv("SEGMENTER_INPUT_SIZE", "256"))
+SEGMENTER_DOWNSCALE_INTERPOLATION = os.getenv(
+    "SEGMENTER_DOWNSCALE_INTERPOLATION", "area"
+)
+SEGMENTER_UPSCALE_INTERPOLATION = os.getenv(
+    "SEGMENTER_UPSCALE_INTERPOLATION", "linear"
+)
+# Padding (source pixels) around the hair bounding box; must cover the
+# largest feather radius so blurs see the same neighbourhood as full-frame.
+SEGMENT_ROI_MARGIN = int(os.getenv("SEGMENT_ROI_MARGIN", "16"))
+
+Roi = Tuple[int, int, int, int]  # x, y, width, height in source pixels
+
+_INTERPOLATION_FLAGS = {
+    "nearest": "INTER_NEAREST",
+    "linear": "INTER_LINEAR",
+    "area": "INTER_AREA",
+    "cubic": "INTER_CUBIC",
+}
+
 
 @dataclass(frozen=True)
 class SegmentResult:
     """Result of hair segmentation operation.
 
+    ``mask`` stays at model resolution (it may be smaller than
+    ``width`` x ``height``, the source image size); use ``upsample_mask``
+    to get it at image resolution when a stage actually needs it.
+    ``roi`` is the hair bounding box plus ``SEGMENT_ROI_MARGIN`` in source
+    pixels (zero-sized when the mask is empty); see ``segment_roi``.
+    ``postprocess`` is the key of the ``PostprocessConfig`` already applied
+    to ``mask`` ("" for the raw model output).
+
     Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.2
     """
     mask_id: str
@@ -34,6 +72,96 @@ class SegmentResult:
     backend: str = "stub"
     width: int = 0
     height: int = 0
+    roi: Optional[Roi] = None
+    postprocess: str = ""
+
+
+def _interpolation(name: str) -> int:
+    return getattr(cv2, _INTERPOLATION_FLAGS.get(name, "INTER_LINEAR"))
+
+
+def _resize_for_model(image: np.ndarray) -> np.ndarray:
+    """Downscale so the long side is ``SEGMENTER_INPUT_SIZE`` (never upscale)."""
+    height, width = image.shape[:2]
+    long_side = max(height, width)
+    if SEGMENTER_INPUT_SIZE <= 0 or long_side <= SEGMENTER_INPUT_SIZE:
+        return image
+    scale = SEGMENTER_INPUT_SIZE / long_side
+    size = (max(int(round(width * scale)), 1), max(int(round(height * scale)), 1))
+    return cv2.resize(
+        image, size, interpolation=_interpolation(SEGMENTER_DOWNSCALE_INTERPOLATION)
+    )
+
+
+def _binarize_mask(mask_float: np.ndarray) -> np.ndarray:
+    """Threshold a 0-1 float mask into 0/255 uint8 with a single allocation."""
+    mask = np.greater(mask_float, 0.5).view(np.uint8)
+    mask *= 255
+    return mask
+
+
+def _mask_roi(mask: np.ndarray, width: int, height: int) -> Roi:
+    """Bounding box of ``mask`` scaled to ``width`` x ``height``, padded.
+
+    Besides ``SEGMENT_ROI_MARGIN`` the box grows by one mask pixel per
+    side, which covers the spill of linear upsampling.
+    """
+    rows = np.flatnonzero(mask.any(axis=1))
+    columns = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return (0, 0, 0, 0)
+    scale_x = width / mask.shape[1]
+    scale_y = height / mask.shape[0]
+    pad_x = SEGMENT_ROI_MARGIN + math.ceil(scale_x)
+    pad_y = SEGMENT_ROI_MARGIN + math.ceil(scale_y)
+    left = max(math.floor(columns[0] * scale_x) - pad_x, 0)
+    top = max(math.floor(rows[0] * scale_y) - pad_y, 0)
+    right = min(math.ceil((columns[-1] + 1) * scale_x) + pad_x, width)
+    bottom = min(math.ceil((rows[-1] + 1) * scale_y) + pad_y, height)
+    return (left, top, right - left, bottom - top)
+
+
+def segment_roi(segment: SegmentResult) -> Optional[Roi]:
+    """``segment.roi``, computed from the mask for results built without it."""
+    if segment.roi is not None or segment.mask is None:
+        return segment.roi
+    height, width = segment.mask.shape[:2]
+    return _mask_roi(segment.mask, segment.width or width, segment.height or height)
+
+
+def upsample_mask(
+    segment: SegmentResult,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    roi: Optional[Roi] = None,
+    guide: Optional[np.ndarray] = None,
+) -> Optional[np.ndarray]:
+    """Return ``segment.mask`` at ``width`` x ``height`` (default: source size).
+
+    With ``roi`` only that region of the upsampled mask is produced
+    (``roi`` height x width), without materializing the full frame.
+    ``guide`` (the BGR image at the target size) enables edge-aware
+    guided upsampling when ``MASK_UPSAMPLE_MODE`` is "guided"; otherwise
+    the mask is resized with ``SEGMENTER_UPSCALE_INTERPOLATION``.
+    Resizes only when the sizes differ; otherwise the cached mask (or a
+    view of it) is returned as-is (read-only, do not modify in place).
+    """
+    mask = segment.mask
+    if mask is None:
+        return None
+    width = width or segment.width
+    height = height or segment.height
+    if mask.shape[:2] == (height, width):
+        if roi is None:
+            return mask
+        x, y, roi_width, roi_height = roi
+        return mask[y : y + roi_height, x : x + roi_width]
+    if guide is not None and MASK_UPSAMPLE_MODE == "guided":
+        return guided_upsample(mask, guide, roi)
+    interpolation = _interpolation(SEGMENTER_UPSCALE_INTERPOLATION)
+    if roi is None:
+        return cv2.resize(mask, (width, height), interpolation=interpolation)
+    return upsample_region(mask, width, height, roi, interpolation=interpolation)
 
 
 def _fingerprint_selfie(selfie: str) -> str:
@@ -45,48 +173,46 @@ def _fingerprint_selfie(selfie: str) -> str:
     return digest[:12]
 
 
-def _segment_with_mediapipe(selfie: str, model: SegmenterModel) -> SegmentResult:
+def _segment_with_mediapipe(
+    selfie: DecodedSelfie, model: SegmenterModel
+) -> SegmentResult:
     """Segment hair using MediaPipe SelfieSegmentation.
 
+    Reuses the pixels already decoded on ``selfie`` (no second decode).
+
     Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.2
     """
     if not MP_AVAILABLE or model.backend is None:
-        return _segment_stub(selfie, model)
+        return _segment_stub(selfie.fingerprint, model)
 
     try:
-        # Decode base64 image
-        _, image_bytes = decode_selfie_payload(selfie)
-
-        # Load image with OpenCV
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = selfie.image
 
         if image is None:
             raise ValueError("Failed to decode image")
 
-        # Convert BGR → RGB (MediaPipe expects RGB)
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         height, width = image.shape[:2]
+        # Infer at model resolution; convert BGR → RGB (MediaPipe expects RGB)
+        image_rgb = cv2.cvtColor(_resize_for_model(image), cv2.COLOR_BGR2RGB)
 
         # Run MediaPipe segmentation
-        results = model.backend.process(image_rgb)
+        with model.checkout() as backend:
+            results = backend.process(image_rgb)
 
         if results.segmentation_mask is None:
             raise ValueError("MediaPipe returned no segmentation mask")
 
-        # Extract mask (0-1 float) → (0-255 uint8)
-        mask_float = results.segmentation_mask
-        mask_binary = (mask_float > 0.5).astype(np.uint8) * 255
-
-        mask_id = _fingerprint_selfie(selfie)
+        # Extract mask (0-1 float) → (0-255 uint8), kept at model resolution
+        mask_binary = _binarize_mask(results.segmentation_mask)
 
         return SegmentResult(
-            mask_id=mask_id,
+            mask_id=selfie.fingerprint,
             model_version=model.version,
             mask=mask_binary,
             backend="mediapipe",
             width=width,
             height=height,
+            roi=_mask_roi(mask_binary, width, height),
         )
 
     except Exception as e:
@@ -95,15 +221,14 @@ def _segment_with_mediapipe(selfie: str, model: SegmenterModel) -> SegmentResult
             f"MediaPipe segmentation failed, using stub fallback. "
             f"Error: {type(e).__name__}: {str(e)}"
         )
-        return _segment_stub(selfie, model)
+        return _segment_stub(selfie.fingerprint, model)
 
 
-def _segment_stub(selfie: str, model: SegmenterModel) -> SegmentResult:
+def _segment_stub(mask_id: str, model: SegmenterModel) -> SegmentResult:
     """Stub segmentation (returns placeholder mask ID).
 
     Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.2
     """
-    mask_id = _fingerprint_selfie(selfie)
     return SegmentResult(
         mask_id=mask_id,
         model_version=model.version,
@@ -111,13 +236,16 @@ def _segment_stub(selfie: str, model: SegmenterModel) -> SegmentResult:
     )
 
 
-def segment_selfie(selfie: str) -> SegmentResult:
+def segment_selfie(selfie: Union[str, DecodedSelfie]) -> SegmentResult:
     """Segment hair region from selfie.
 
     Uses MediaPipe SelfieSegmentation if available, otherwise stub.
+    Results are cached by content hash in ``MASK_CACHE``, so repeated
+    requests for the same selfie skip pixel decoding and inference.
 
     Args:
-        selfie: Base64-encoded image (data:image/png;base64,...)
+        selfie: Decoded selfie from ``load_selfie`` (preferred), or the raw
+            base64 payload (data:image/png;base64,...), decoded here.
 
     Returns:
         SegmentResult with mask and metadata
@@ -125,4 +253,19 @@ def segment_selfie(selfie: str) -> SegmentResult:
     Task: ML_TRAINING_EXECUTION_PLAN.md § 1.2.2
     """
     model: SegmenterModel = ModelCache.segmenter()
-    return _segment_with_mediapipe(selfie, model)
+    if isinstance(selfie, str):
+        try:
+            selfie = load_selfie(selfie)
+        except ApiError:
+            # Undecodable payloads degrade to the stub, as before
+            return _segment_stub(_fingerprint_selfie(selfie), model)
+
+    cached = MASK_CACHE.get(selfie.fingerprint, model.version)
+    if cached is not None:
+        return cached
+
+    result = _segment_with_mediapipe(selfie, model)
+    # Only real masks are cached; stub fallbacks may be transient failures
+    if result.backend == "mediapipe":
+        MASK_CACHE.put(result)
+    return result
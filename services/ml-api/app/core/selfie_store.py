@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.core.errors import SelfieNotFoundError
+from app.core.media import DecodedSelfie
+from app.core.segmenter import SegmentResult
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SELFIE_TTL_SECONDS = int(os.getenv("SELFIE_TTL_SECONDS", "900"))
+DEFAULT_SELFIE_MAX_ENTRIES = int(os.getenv("SELFIE_STORE_MAX_ENTRIES", "64"))
+# Decoded pixels + encoded bytes + masks pinned by all sessions together
+DEFAULT_SELFIE_MAX_BYTES = int(
+    os.getenv("SELFIE_STORE_MAX_BYTES", str(256 * 1024 * 1024))
+)
+DEFAULT_SELFIE_SWEEP_INTERVAL_SECONDS = float(
+    os.getenv("SELFIE_SWEEP_INTERVAL_SECONDS", "60")
+)
+
+
+def _session_bytes(selfie: DecodedSelfie, segment: SegmentResult) -> int:
+    """RAM a session pins: encoded bytes, decoded pixels and the mask."""
+    image = selfie.image
+    pixels = int(image.nbytes) if image is not None else 0
+    mask = int(segment.mask.nbytes) if segment.mask is not None else 0
+    return len(selfie.data) + pixels + mask
+
+
+@dataclass(frozen=True)
+class SelfieSession:
+    selfie: DecodedSelfie
+    segment: SegmentResult
+    expires_at: float
+    nbytes: int = 0
+
+
+class SelfieStore:
+    """Upload-once selfie sessions (decoded pixels + mask) with a TTL.
+
+    Bounded by the bytes every session pins (``max_bytes``) as well as by
+    entry count; the oldest sessions are dropped first, but the newest one
+    is always kept so an upload can be used right away. Sessions are kept
+    in save order, which is also expiry order (same TTL for all), so
+    ``purge_expired`` (run by the sweeper thread, see ``start_sweeper``)
+    only pops expired sessions off the front.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = DEFAULT_SELFIE_TTL_SECONDS,
+        max_entries: int = DEFAULT_SELFIE_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_SELFIE_MAX_BYTES,
+    ) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max(max_entries, 1)
+        self._max_bytes = max(max_bytes, 0)
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, SelfieSession]" = OrderedDict()
+        self._bytes = 0
+        self._expirations = 0
+        self._evictions = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+
+    @property
+    def ttl_seconds(self) -> int:
+        return self._ttl_seconds
+
+    def save(self, selfie: DecodedSelfie, segment: SegmentResult) -> str:
+        selfie_id = uuid.uuid4().hex
+        expires_at = time.time() + max(self._ttl_seconds, 0)
+        session = SelfieSession(
+            selfie=selfie,
+            segment=segment,
+            expires_at=expires_at,
+            nbytes=_session_bytes(selfie, segment),
+        )
+        with self._lock:
+            self._sessions[selfie_id] = session
+            self._bytes += session.nbytes
+            while len(self._sessions) > 1 and (
+                len(self._sessions) > self._max_entries
+                or self._bytes > self._max_bytes
+            ):
+                _, oldest = self._sessions.popitem(last=False)
+                self._bytes -= oldest.nbytes
+                self._evictions += 1
+        return selfie_id
+
+    def get(self, selfie_id: str) -> SelfieSession:
+        with self._lock:
+            session = self._sessions.get(selfie_id)
+            if session is None:
+                raise SelfieNotFoundError(selfie_id)
+            if session.expires_at <= time.time():
+                del self._sessions[selfie_id]
+                self._bytes -= session.nbytes
+                self._expirations += 1
+                raise SelfieNotFoundError(selfie_id)
+            return session
+
+    def replace_segment(self, selfie_id: str, segment: SegmentResult) -> None:
+        with self._lock:
+            session = self._sessions.get(selfie_id)
+            if session is not None:
+                nbytes = _session_bytes(session.selfie, segment)
+                # Assigning an existing key keeps its (expiry) position
+                self._sessions[selfie_id] = SelfieSession(
+                    selfie=session.selfie,
+                    segment=segment,
+                    expires_at=session.expires_at,
+                    nbytes=nbytes,
+                )
+                self._bytes += nbytes - session.nbytes
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Remove every expired session; O(expired). Returns the count."""
+        now = time.time() if now is None else now
+        purged = 0
+        with self._lock:
+            while self._sessions:
+                selfie_id, session = next(iter(self._sessions.items()))
+                if session.expires_at > now:
+                    break
+                del self._sessions[selfie_id]
+                self._bytes -= session.nbytes
+                purged += 1
+            self._expirations += purged
+        return purged
+
+    def start_sweeper(
+        self, interval_seconds: float = DEFAULT_SELFIE_SWEEP_INTERVAL_SECONDS
+    ) -> None:
+        """Purge expired sessions every ``interval_seconds`` on a daemon thread."""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._stop_sweeper.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep,
+                args=(max(interval_seconds, 0.01),),
+                name="selfie-sweeper",
+                daemon=True,
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        with self._lock:
+            sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            self._stop_sweeper.set()
+            sweeper.join()
+
+    def _sweep(self, interval_seconds: float) -> None:
+        while not self._stop_sweeper.wait(interval_seconds):
+            try:
+                self.purge_expired()
+            except Exception:  # pragma: no cover - keep sweeping
+                logger.exception("Selfie sweeper failed")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._sessions),
+                "max_entries": self._max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "expirations": self._expirations,
+                "evictions": self._evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._bytes = 0
+
+
+SELFIE_STORE = SelfieStore()
@@ -0,0 +1,307 @@
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.errors import ImageNotFoundError
+from app.core.http_cache import strong_etag
+from app.core.output_store import (
+    DEFAULT_OUTPUT_DIR,
+    DEFAULT_OUTPUT_MAX_BYTES,
+    DEFAULT_OUTPUT_MAX_ENTRIES,
+    DEFAULT_SWEEP_INTERVAL_SECONDS,
+    DEFAULT_TTL_SECONDS,
+    StoredOutput,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "outputs.sqlite3"
+# How long a writer waits for another process's transaction to finish
+_BUSY_TIMEOUT_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    image_id TEXT PRIMARY KEY,
+    content_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    touched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outputs_expires_at ON outputs (expires_at);
+CREATE INDEX IF NOT EXISTS outputs_touched_at ON outputs (touched_at);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    expirations INTEGER NOT NULL,
+    evictions INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals VALUES (0, 0, 0, 0, 0);
+"""
+
+
+class SqliteOutputStore:
+    """``OutputStore`` shared by every worker process on the host.
+
+    Image bytes are files in ``output_dir`` (served with ``FileResponse``,
+    cached by the OS page cache for all workers) and the index lives in a
+    SQLite database in WAL mode next to them, so any worker can serve an
+    image another one saved. Readers never block writers or each other;
+    writes are a single short ``BEGIN IMMEDIATE`` transaction on a small
+    row, with file I/O kept outside it. Entry/byte totals and the
+    expiration/eviction counters are kept in the database, shared too.
+
+    Same interface as ``OutputStore`` (select with ``OUTPUT_STORE_BACKEND``).
+    """
+
+    def __init__(
+        self,
+        output_dir: str = DEFAULT_OUTPUT_DIR,
+        ttl_seconds: int = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_OUTPUT_MAX_BYTES,
+        max_entries: int = DEFAULT_OUTPUT_MAX_ENTRIES,
+    ) -> None:
+        self._output_dir = Path(output_dir)
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        self._index_path = self._output_dir / INDEX_FILENAME
+        self._ttl_seconds = ttl_seconds
+        self._max_bytes = max(max_bytes, 0)
+        self._max_entries = max(max_entries, 1)
+        # sqlite3 connections are per thread
+        self._local = threading.local()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+        self._stop_sweeper = threading.Event()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self._index_path,
+                timeout=_BUSY_TIMEOUT_SECONDS,
+                isolation_level=None,  # explicit transactions only
+                check_same_thread=False,
+            )
+            # Outputs are ephemeral: skip the fsync on every commit
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _write(self, statements) -> Any:
+        """Run ``statements(connection)`` in one write transaction."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(connection)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    def _path(self, image_id: str) -> Path:
+        return self._output_dir / image_id
+
+    def save(self, data: bytes, content_type: str) -> str:
+        image_id = uuid.uuid4().hex
+        path = self._path(image_id)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+        now = time.time()
+        expires_at = now + max(self._ttl_seconds, 0)
+
+        def insert(connection: sqlite3.Connection) -> List[str]:
+            connection.execute(
+                "INSERT INTO outputs VALUES (?, ?, ?, ?, ?, ?)",
+                (image_id, content_type, len(data), strong_etag(data), expires_at, now),
+            )
+            connection.execute(
+                "UPDATE totals SET entries = entries + 1, bytes = bytes + ?",
+                (len(data),),
+            )
+            return self._evict_over_capacity(connection, image_id)
+
+        try:
+            evicted = self._write(insert)
+        except BaseException:
+            # Never indexed (e.g. busy timeout): nothing else would remove it
+            path.unlink(missing_ok=True)
+            raise
+        _unlink(self._path(evicted_id) for evicted_id in evicted)
+        return image_id
+
+    def _evict_over_capacity(
+        self, connection: sqlite3.Connection, keep: str
+    ) -> List[str]:
+        """Delete the least recently saved/refreshed rows beyond the caps."""
+        entries, total_bytes = connection.execute(
+            "SELECT entries, bytes FROM totals"
+        ).fetchone()
+        if entries <= self._max_entries and total_bytes <= self._max_bytes:
+            return []
+        victims: List[Tuple[str, int]] = []
+        rows = connection.execute(
+            "SELECT image_id, size FROM outputs"
+            " WHERE image_id != ? ORDER BY touched_at",
+            (keep,),
+        )
+        for image_id, size in rows:
+            if entries <= self._max_entries and total_bytes <= self._max_bytes:
+                break
+            victims.append((image_id, size))
+            entries -= 1
+            total_bytes -= size
+        self._delete(connection, victims)
+        connection.execute(
+            "UPDATE totals SET evictions = evictions + ?", (len(victims),)
+        )
+        return [image_id for image_id, _ in victims]
+
+    @staticmethod
+    def _delete(connection: sqlite3.Connection, rows: List[Tuple[str, int]]) -> None:
+        connection.executemany(
+            "DELETE FROM outputs WHERE image_id = ?",
+            [(image_id,) for image_id, _ in rows],
+        )
+        connection.execute(
+            "UPDATE totals SET entries = entries - ?, bytes = bytes - ?",
+            (len(rows), sum(size for _, size in rows)),
+        )
+
+    def lookup(self, image_id: str) -> StoredOutput:
+        """The live entry for ``image_id``; its bytes are at ``path``."""
+        row = self._connection().execute(
+            "SELECT content_type, size, etag, expires_at FROM outputs"
+            " WHERE image_id = ? AND expires_at > ?",
+            (image_id, time.time()),
+        ).fetchone()
+        if row is None:
+            # Expired rows are left to the sweeper: reads stay read-only
+            raise ImageNotFoundError(image_id)
+        content_type, size, etag, expires_at = row
+        return StoredOutput(
+            content_type=content_type,
+            expires_at=expires_at,
+            size=size,
+            etag=etag,
+            path=self._path(image_id),
+        )
+
+    def get(self, image_id: str) -> Tuple[bytes, str]:
+        output = self.lookup(image_id)
+        try:
+            return output.path.read_bytes(), output.content_type
+        except OSError:
+            raise ImageNotFoundError(image_id)
+
+    def refresh(self, image_id: str) -> bool:
+        """Restart ``image_id``'s TTL (it counts as newest); False if gone."""
+        now = time.time()
+
+        def touch(connection: sqlite3.Connection) -> bool:
+            cursor = connection.execute(
+                "UPDATE outputs SET expires_at = ?, touched_at = ?"
+                " WHERE image_id = ? AND expires_at > ?",
+                (now + max(self._ttl_seconds, 0), now, image_id, now),
+            )
+            return cursor.rowcount == 1
+
+        return self._write(touch)
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Remove every expired output (index range scan). Returns the count."""
+        now = time.time() if now is None else now
+
+        def purge(connection: sqlite3.Connection) -> List[str]:
+            rows = connection.execute(
+                "SELECT image_id, size FROM outputs WHERE expires_at <= ?", (now,)
+            ).fetchall()
+            if rows:
+                self._delete(connection, rows)
+                connection.execute(
+                    "UPDATE totals SET expirations = expirations + ?", (len(rows),)
+                )
+            return [image_id for image_id, _ in rows]
+
+        expired = self._write(purge)
+        _unlink(self._path(image_id) for image_id in expired)
+        return len(expired)
+
+    def start_sweeper(
+        self, interval_seconds: float = DEFAULT_SWEEP_INTERVAL_SECONDS
+    ) -> None:
+        """Purge expired outputs every ``interval_seconds`` on a daemon thread.
+
+        Every worker may run one; purges are transactional, so concurrent
+        sweepers never double-count or double-delete.
+        """
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            self._stop_sweeper.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep,
+                args=(max(interval_seconds, 0.01),),
+                name="output-sweeper",
+                daemon=True,
+            )
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        with self._sweeper_lock:
+            sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            self._stop_sweeper.set()
+            sweeper.join()
+
+    def _sweep(self, interval_seconds: float) -> None:
+        while not self._stop_sweeper.wait(interval_seconds):
+            try:
+                self.purge_expired()
+            except Exception:  # pragma: no cover - keep sweeping
+                logger.exception("Output sweeper failed")
+
+    def stats(self) -> Dict[str, Any]:
+        entries, total_bytes, expirations, evictions = self._connection().execute(
+            "SELECT entries, bytes, expirations, evictions FROM totals"
+        ).fetchone()
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "max_entries": self._max_entries,
+            "bytes": total_bytes,
+            "max_bytes": self._max_bytes,
+            "disk_entries": entries,
+            "disk_bytes": total_bytes,
+            "expirations": expirations,
+            "evictions": evictions,
+        }
+
+    def clear(self) -> None:
+        def delete_all(connection: sqlite3.Connection) -> List[str]:
+            image_ids = [
+                image_id
+                for (image_id,) in connection.execute("SELECT image_id FROM outputs")
+            ]
+            connection.execute("DELETE FROM outputs")
+            connection.execute("UPDATE totals SET entries = 0, bytes = 0")
+            return image_ids
+
+        _unlink(self._path(image_id) for image_id in self._write(delete_all))
+
+
+def _unlink(paths: Iterable[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
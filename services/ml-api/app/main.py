@@ -1,19 +1,80 @@
 import logging
+import os
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List
 
 from fastapi import FastAPI, Request, Response
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from .core.errors import ApiError
-from .schemas.tryon import TryOnRequest, TryOnResponse
+from fastapi.responses import FileResponse, JSONResponse
+from pydantic import ValidationError
+from .core.errors import ApiError, ImageNotFoundError, InvalidSelfieDataError
+from .schemas.tryon import (
+    MAX_SELFIE_BASE64_CHARS,
+    IntensitySweepRequest,
+    IntensitySweepResponse,
+    PalettePreviewRequest,
+    PalettePreviewResponse,
+    SelfieUploadRequest,
+    SelfieUploadResponse,
+    TryOnOptions,
+    TryOnRequest,
+    TryOnResponse,
+)
+from .core.color_lut import COLOR_LUTS
+from .core.delta_cache import DELTA_CACHE
+from .core.executor import PIPELINE_EXECUTOR
+from .core.http_cache import byte_range, etag_matches, immutable_headers
+from .core.mask_cache import MASK_CACHE
+from .core.media import MAX_SELFIE_BYTES
+from .core.models import ModelCache
 from .core.output_store import OUTPUT_STORE
-from .core.pipeline import process_tryon
+from .core.postprocess import POSTPROCESS_TIMINGS
+from .core.pipeline import (
+    process_intensity_sweep,
+    process_palette_preview,
+    process_tryon,
+    process_tryon_upload,
+    register_selfie,
+)
+from .core.render_cache import RENDER_CACHE
+from .core.selfie_store import SELFIE_STORE
+from .middleware.body_limit import BODY_LIMIT_COUNTERS, BodyLimitMiddleware
 from .middleware.request_id import inject_request_id, current_request_id
 
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Color Me ML", version="0.1.0")
 
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Map (or build once) the recolor LUTs before taking traffic
+    COLOR_LUTS.warm()
+    OUTPUT_STORE.start_sweeper()
+    SELFIE_STORE.start_sweeper()
+    yield
+    SELFIE_STORE.stop_sweeper()
+    OUTPUT_STORE.stop_sweeper()
+    PIPELINE_EXECUTOR.shutdown()
+
+
+app = FastAPI(title="Color Me ML", version="0.1.0", lifespan=lifespan)
+
+# Envelope allowance on top of the selfie itself (JSON keys, multipart parts)
+_BODY_OVERHEAD_BYTES = 64 * 1024
+_JSON_SELFIE_LIMIT = MAX_SELFIE_BASE64_CHARS + _BODY_OVERHEAD_BYTES
+
+# Registered before the request-id middleware so it runs inside it and the
+# 413 envelope carries the request id.
+app.add_middleware(
+    BodyLimitMiddleware,
+    limits={
+        "/try-on": _JSON_SELFIE_LIMIT,
+        "/selfies": _JSON_SELFIE_LIMIT,
+        "/try-on/upload": MAX_SELFIE_BYTES + _BODY_OVERHEAD_BYTES,
+        "/try-on/palette-preview": _JSON_SELFIE_LIMIT,
+        "/try-on/intensity-sweep": _JSON_SELFIE_LIMIT,
+    },
+    default_limit=_BODY_OVERHEAD_BYTES,
+)
 app.middleware("http")(inject_request_id)
 
 
@@ -22,14 +83,147 @@ async def try_on(payload: TryOnRequest, request: Request) -> TryOnResponse:
     request_id = current_request_id(request)
     logging.info("Processing try-on request %s", request_id)
     base_url = str(request.base_url).rstrip("/")
-    result = process_tryon(payload, base_url=base_url)
+    result = await PIPELINE_EXECUTOR.run(process_tryon, payload, base_url=base_url)
     return result
 
 
+def _parse_options(fields: Dict[str, Any]) -> TryOnOptions:
+    try:
+        return TryOnOptions(
+            **{key: value for key, value in fields.items() if value is not None}
+        )
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors()) from exc
+
+
+@app.post("/try-on/upload", response_model=TryOnResponse)
+async def try_on_upload(request: Request) -> TryOnResponse:
+    """Binary try-on: multipart/form-data or a raw image body.
+
+    multipart: ``selfie`` file part plus ``color``/``intensity``/``request_id``
+    fields. Raw body (``image/png``, ``image/jpeg`` or
+    ``application/octet-stream``): ``x-color``/``x-intensity`` headers and
+    the ``x-request-id`` trace id. The bytes go to the decoder as-is.
+    """
+    request_id = current_request_id(request)
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        # Closes the spooled upload file once read, even on errors
+        async with request.form(max_files=1) as form:
+            upload = form.get("selfie")
+            if upload is None or isinstance(upload, str):
+                raise InvalidSelfieDataError()
+            data = await upload.read()
+            mime_type = upload.content_type
+            fields = {
+                "color": form.get("color"),
+                "intensity": form.get("intensity"),
+                "request_id": form.get("request_id") or request_id,
+            }
+    else:
+        data = await request.body()
+        mime_type = content_type.split(";", 1)[0].strip()
+        fields = {
+            "color": request.headers.get("x-color"),
+            "intensity": request.headers.get("x-intensity"),
+            "request_id": request_id,
+        }
+    options = _parse_options(fields)
+    logging.info("Processing try-on upload %s", request_id)
+    base_url = str(request.base_url).rstrip("/")
+    return await PIPELINE_EXECUTOR.run(
+        process_tryon_upload, data, mime_type, options, base_url=base_url
+    )
+
+
+@app.post("/try-on/palette-preview", response_model=PalettePreviewResponse)
+async def palette_preview(
+    payload: PalettePreviewRequest, request: Request
+) -> PalettePreviewResponse:
+    """Render several palette colors (default: all) from one decode + mask."""
+    request_id = current_request_id(request)
+    logging.info("Rendering palette preview %s", request_id)
+    base_url = str(request.base_url).rstrip("/")
+    return await PIPELINE_EXECUTOR.run(
+        process_palette_preview, payload, base_url=base_url
+    )
+
+
+@app.post("/try-on/intensity-sweep", response_model=IntensitySweepResponse)
+async def intensity_sweep(
+    payload: IntensitySweepRequest, request: Request
+) -> IntensitySweepResponse:
+    """Render every slider position (0-100, step 5) of one color."""
+    request_id = current_request_id(request)
+    logging.info("Rendering intensity sweep %s", request_id)
+    base_url = str(request.base_url).rstrip("/")
+    return await PIPELINE_EXECUTOR.run(
+        process_intensity_sweep, payload, base_url=base_url
+    )
+
+
+@app.post("/selfies", response_model=SelfieUploadResponse)
+async def upload_selfie(
+    payload: SelfieUploadRequest, request: Request
+) -> SelfieUploadResponse:
+    request_id = current_request_id(request)
+    logging.info("Registering selfie session %s", request_id)
+    return await PIPELINE_EXECUTOR.run(register_selfie, payload)
+
+
 @app.get("/images/{image_id}")
 async def get_image(image_id: str, request: Request) -> Response:
-    data, content_type = OUTPUT_STORE.get(image_id)
-    return Response(content=data, media_type=content_type)
+    output = OUTPUT_STORE.lookup(image_id)
+    headers = immutable_headers(output.etag, output.expires_at)
+    if etag_matches(request.headers.get("if-none-match"), output.etag):
+        return Response(status_code=304, headers=headers)
+    if output.path is not None:
+        # Spilled to disk: streamed from the file (sendfile where supported);
+        # FileResponse handles Range / If-Range itself. The sweeper may have
+        # removed the file since the lookup: a 404, not a 500 mid-response.
+        try:
+            stat_result = os.stat(output.path)
+        except FileNotFoundError:
+            raise ImageNotFoundError(image_id)
+        return FileResponse(
+            output.path,
+            media_type=output.content_type,
+            headers=headers,
+            stat_result=stat_result,
+        )
+    served = byte_range(
+        request.headers.get("range"),
+        request.headers.get("if-range"),
+        output.etag,
+        output.size,
+    )
+    if served is None:
+        return Response(
+            content=output.data, media_type=output.content_type, headers=headers
+        )
+    start, end = served
+    return Response(
+        content=output.data[start : end + 1],
+        status_code=206,
+        media_type=output.content_type,
+        headers=headers | {"Content-Range": f"bytes {start}-{end}/{output.size}"},
+    )
+
+
+@app.get("/stats")
+async def get_stats() -> Dict[str, Any]:
+    return {
+        "pipeline": PIPELINE_EXECUTOR.stats(),
+        "body_limit": BODY_LIMIT_COUNTERS.stats(),
+        "segmenter": ModelCache.stats(),
+        "mask_cache": MASK_CACHE.stats(),
+        "selfie_store": SELFIE_STORE.stats(),
+        "color_luts": COLOR_LUTS.stats(),
+        "recolor_deltas": DELTA_CACHE.stats(),
+        "postprocess": POSTPROCESS_TIMINGS.stats(),
+        "output_store": OUTPUT_STORE.stats(),
+        "render_cache": RENDER_CACHE.stats(),
+    }
 
 
 def _collect_validation_errors(errors: List[Dict[str, Any]]) -> Dict[str, List[str]]:
@@ -67,7 +261,9 @@ async def api_error_handler(request: Request, exc: ApiError):
     request_id = current_request_id(request)
     logging.info("API error (%s): %s", request_id, exc.code)
     return JSONResponse(
-        status_code=exc.status_code, content=exc.to_dict(request_id)
+        status_code=exc.status_code,
+        content=exc.to_dict(request_id),
+        headers=exc.headers,
     )
 
 
@@ -0,0 +1,123 @@
+import json
+import threading
+from typing import Dict, Optional
+
+from app.core.errors import PayloadTooLargeError
+
+
+class BodyLimitCounters:
+    """Thread-safe counters for requests rejected by ``BodyLimitMiddleware``."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._dropped_bytes = 0
+
+    def record(self, dropped_bytes: int) -> None:
+        with self._lock:
+            self._rejected += 1
+            self._dropped_bytes += dropped_bytes
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"rejected": self._rejected, "dropped_bytes": self._dropped_bytes}
+
+
+BODY_LIMIT_COUNTERS = BodyLimitCounters()
+
+
+class BodyLimitMiddleware:
+    """ASGI middleware that enforces per-route body limits while streaming.
+
+    Requests whose ``Content-Length`` exceeds the route limit are rejected
+    before the app runs; chunked bodies are counted as they arrive and cut
+    off as soon as the limit is crossed, before JSON/pydantic parsing. The
+    rejection reuses the ``PayloadTooLargeError`` envelope (413).
+    """
+
+    def __init__(
+        self,
+        app,
+        limits: Dict[str, int],
+        default_limit: Optional[int] = None,
+        counters: BodyLimitCounters = BODY_LIMIT_COUNTERS,
+    ) -> None:
+        self.app = app
+        self.limits = limits
+        self.default_limit = default_limit
+        self.counters = counters
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        limit = self.limits.get(scope["path"], self.default_limit)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = _content_length(scope)
+        if declared is not None and declared > limit:
+            self.counters.record(declared)
+            await _send_too_large(scope, send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    # Make the app stop reading; its response is discarded
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if not exceeded:
+                response_started = True
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded:
+            self.counters.record(declared if declared is not None else received)
+            if not response_started:
+                await _send_too_large(scope, send, limit)
+
+
+def _content_length(scope) -> Optional[int]:
+    for key, value in scope.get("headers", []):
+        if key == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def _send_too_large(scope, send, limit: int) -> None:
+    request_id = scope.get("state", {}).get("request_id", "unknown")
+    body = json.dumps(PayloadTooLargeError(limit).to_dict(request_id)).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
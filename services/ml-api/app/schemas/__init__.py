@@ -1,3 +1,29 @@
-from .tryon import TryOnRequest, TryOnResponse
+from .tryon import (
+    IntensitySweepFrame,
+    IntensitySweepRequest,
+    IntensitySweepResponse,
+    PalettePreviewItem,
+    PalettePreviewRequest,
+    PalettePreviewResponse,
+    SelfieSource,
+    SelfieUploadRequest,
+    SelfieUploadResponse,
+    TryOnOptions,
+    TryOnRequest,
+    TryOnResponse,
+)
 
-__all__ = ["TryOnRequest", "TryOnResponse"]
+__all__ = [
+    "IntensitySweepFrame",
+    "IntensitySweepRequest",
+    "IntensitySweepResponse",
+    "PalettePreviewItem",
+    "PalettePreviewRequest",
+    "PalettePreviewResponse",
+    "SelfieSource",
+    "SelfieUploadRequest",
+    "SelfieUploadResponse",
+    "TryOnOptions",
+    "TryOnRequest",
+    "TryOnResponse",
+]
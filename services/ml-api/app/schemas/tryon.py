@@ -1,6 +1,6 @@
-from typing import Annotated
+from typing import Annotated, List, Optional
 
-from pydantic import AnyUrl, BaseModel, Field, PositiveInt
+from pydantic import AnyUrl, BaseModel, Field, PositiveInt, model_validator
 
 try:
     from pydantic import field_validator
@@ -9,12 +9,15 @@ except ImportError:  # pragma: no cover - fallback for Pydantic v1
 
 from app.core.palette import (
     DEFAULT_INTENSITY,
+    INTENSITY_STEP,
     MAX_INTENSITY,
     MIN_INTENSITY,
     PALETTE_NAMES,
 )
 
 MAX_SELFIE_BASE64_CHARS = 8_000_000  # ~6 MB payload allowance
+DEFAULT_PREVIEW_SIDE = 256  # long side of preview renders (pixels)
+MAX_PREVIEW_SIDE = 512
 
 SelfieStr = Annotated[
     str,
@@ -26,6 +29,16 @@ SelfieStr = Annotated[
     ),
 ]
 
+SelfieIdStr = Annotated[
+    str,
+    Field(
+        min_length=1,
+        max_length=64,
+        description="Id returned by POST /selfies (upload-once session).",
+        examples=["3f2b9c0d4e5f4a6b8c7d9e0f1a2b3c4d"],
+    ),
+]
+
 RequestIdStr = Annotated[
     str,
     Field(
@@ -37,8 +50,15 @@ RequestIdStr = Annotated[
 ]
 
 
-class TryOnRequest(BaseModel):
-    selfie: SelfieStr
+def _validate_color(value: str) -> str:
+    if value not in PALETTE_NAMES:
+        raise ValueError("Color no soportado.")
+    return value
+
+
+class TryOnOptions(BaseModel):
+    """Render options shared by the JSON and binary/multipart try-on routes."""
+
     color: str = Field(..., min_length=1, description="One of the palette names.")
     intensity: int = Field(
         default=DEFAULT_INTENSITY,
@@ -51,9 +71,92 @@ class TryOnRequest(BaseModel):
     @field_validator("color")
     @classmethod
     def validate_color(cls, value: str) -> str:
-        if value not in PALETTE_NAMES:
-            raise ValueError("Color no soportado.")
-        return value
+        return _validate_color(value)
+
+
+class SelfieSource(BaseModel):
+    """Either an inline selfie or the id of an uploaded session (one of)."""
+
+    selfie: Optional[SelfieStr] = None
+    selfie_id: Optional[SelfieIdStr] = None
+
+    @model_validator(mode="after")
+    def validate_selfie_source(self) -> "SelfieSource":
+        if (self.selfie is None) == (self.selfie_id is None):
+            raise ValueError("Envía selfie o selfie_id (solo uno).")
+        return self
+
+
+class TryOnRequest(TryOnOptions, SelfieSource):
+    """Single render: a selfie source plus ``TryOnOptions``."""
+
+
+class PalettePreviewRequest(SelfieSource):
+    colors: Optional[List[str]] = Field(
+        default=None,
+        min_length=1,
+        description="Palette names to render (default: the whole palette).",
+    )
+    intensity: int = Field(
+        default=DEFAULT_INTENSITY, ge=MIN_INTENSITY, le=MAX_INTENSITY
+    )
+    max_side: int = Field(
+        default=DEFAULT_PREVIEW_SIDE,
+        ge=32,
+        le=MAX_PREVIEW_SIDE,
+        description="Long side of each preview, in pixels.",
+    )
+    sprite: bool = Field(
+        default=False,
+        description="Return one sprite sheet instead of one image per color.",
+    )
+    request_id: RequestIdStr
+
+    @field_validator("colors")
+    @classmethod
+    def validate_colors(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        if value is None:
+            return value
+        # Keep request order, drop repeats
+        return list(dict.fromkeys(_validate_color(color) for color in value))
+
+
+class IntensitySweepRequest(SelfieSource):
+    color: str = Field(..., min_length=1, description="One of the palette names.")
+    max_side: int = Field(
+        default=DEFAULT_PREVIEW_SIDE,
+        ge=32,
+        le=MAX_PREVIEW_SIDE,
+        description="Long side of each frame, in pixels.",
+    )
+    sprite: bool = Field(
+        default=False,
+        description="Return one sprite sheet instead of one image per frame.",
+    )
+    request_id: RequestIdStr
+
+    @field_validator("color")
+    @classmethod
+    def validate_color(cls, value: str) -> str:
+        return _validate_color(value)
+
+    @property
+    def intensities(self) -> List[int]:
+        """Every slider position, ``MIN_INTENSITY``..``MAX_INTENSITY``."""
+        return list(range(MIN_INTENSITY, MAX_INTENSITY + 1, INTENSITY_STEP))
+
+
+class SelfieUploadRequest(BaseModel):
+    selfie: SelfieStr
+    request_id: RequestIdStr
+
+
+class SelfieUploadResponse(BaseModel):
+    selfie_id: str
+    expires_in_seconds: int
+    width: int = Field(default=0, description="Decoded width (0 if unknown).")
+    height: int = Field(default=0, description="Decoded height (0 if unknown).")
+    request_id: RequestIdStr
 
 
 class TryOnResponse(BaseModel):
@@ -67,3 +170,47 @@ class TryOnResponse(BaseModel):
         default=None,
         description="Optional metadata (no base64/raw image data).",
     )
+
+
+class PalettePreviewItem(BaseModel):
+    color: str
+    image_url: Optional[AnyUrl] = Field(
+        default=None, description="Per-color image (when sprite=false)."
+    )
+    x: int = Field(default=0, description="Tile left edge in the sprite.")
+    y: int = Field(default=0, description="Tile top edge in the sprite.")
+
+
+class PalettePreviewResponse(BaseModel):
+    request_id: RequestIdStr
+    processing_ms: PositiveInt
+    intensity: int
+    tile_width: int = Field(default=0, description="Preview width (0 if unknown).")
+    tile_height: int = Field(
+        default=0, description="Preview height (0 if unknown)."
+    )
+    sprite_url: Optional[AnyUrl] = None
+    previews: List[PalettePreviewItem]
+    details: dict[str, str] | None = None
+
+
+class IntensitySweepFrame(BaseModel):
+    intensity: int
+    image_url: Optional[AnyUrl] = Field(
+        default=None, description="Per-frame image (when sprite=false)."
+    )
+    x: int = Field(default=0, description="Frame left edge in the sprite.")
+    y: int = Field(default=0, description="Frame top edge in the sprite.")
+
+
+class IntensitySweepResponse(BaseModel):
+    request_id: RequestIdStr
+    processing_ms: PositiveInt
+    color: str
+    frame_width: int = Field(default=0, description="Frame width (0 if unknown).")
+    frame_height: int = Field(
+        default=0, description="Frame height (0 if unknown)."
+    )
+    sprite_url: Optional[AnyUrl] = None
+    frames: List[IntensitySweepFrame]
+    details: dict[str, str] | None = None
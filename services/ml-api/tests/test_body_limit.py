@@ -0,0 +1,107 @@
+import asyncio
+
+import fastapi
+import pytest
+
+if getattr(fastapi, "__stub__", False):
+    pytest.skip("fastapi stub active", allow_module_level=True)
+
+from fastapi import FastAPI, Request  # type: ignore
+from fastapi.testclient import TestClient  # type: ignore
+
+from app.main import app
+from app.middleware.body_limit import BodyLimitCounters, BodyLimitMiddleware
+
+
+def _limited_app(counters: BodyLimitCounters) -> FastAPI:
+    small = FastAPI()
+    small.add_middleware(
+        BodyLimitMiddleware, limits={"/echo": 10}, default_limit=None, counters=counters
+    )
+    reads = []
+
+    @small.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        reads.append(len(body))
+        return {"size": len(body)}
+
+    @small.post("/open")
+    async def open_route(request: Request):
+        return {"size": len(await request.body())}
+
+    small.state.reads = reads
+    return small
+
+
+def test_body_limit_rejects_declared_length_without_reading():
+    counters = BodyLimitCounters()
+    small = _limited_app(counters)
+    response = TestClient(small).post("/echo", content=b"x" * 50)
+
+    assert response.status_code == 413
+    assert response.json()["code"] == "PAYLOAD_TOO_LARGE"
+    assert response.json()["details"] == {"max_bytes": "10"}
+    assert small.state.reads == []
+    assert counters.stats() == {"rejected": 1, "dropped_bytes": 50}
+
+
+def test_body_limit_cuts_off_chunked_stream():
+    counters = BodyLimitCounters()
+    small = _limited_app(counters)
+
+    def chunks():
+        for _ in range(10):
+            yield b"x" * 4
+
+    response = TestClient(small).post("/echo", content=chunks())
+
+    assert response.status_code == 413
+    assert small.state.reads == []
+    assert counters.stats()["rejected"] == 1
+    assert counters.stats()["dropped_bytes"] > 10
+
+
+def test_body_limit_passes_small_and_unlisted_routes():
+    counters = BodyLimitCounters()
+    client = TestClient(_limited_app(counters))
+    assert client.post("/echo", content=b"x" * 10).json() == {"size": 10}
+    assert client.post("/open", content=b"x" * 100).json() == {"size": 100}
+    assert counters.stats()["rejected"] == 0
+
+
+def test_try_on_rejects_oversized_body_with_request_id():
+    response = TestClient(app).post(
+        "/try-on",
+        content=b"{" + b" " * 9_000_000 + b"}",
+        headers={"content-type": "application/json", "x-request-id": "req-big"},
+    )
+    assert response.status_code == 413
+    assert response.json()["request_id"] == "req-big"
+    assert response.headers["x-request-id"] == "req-big"
+
+
+def test_body_limit_stops_reading_mid_stream():
+    counters = BodyLimitCounters()
+    pulled = []
+    sent = []
+
+    async def receive():
+        pulled.append(1)
+        return {"type": "http.request", "body": b"x" * 4, "more_body": True}
+
+    async def send(message):
+        sent.append(message)
+
+    async def inner(scope, receive, send):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        raise RuntimeError("client went away")
+
+    middleware = BodyLimitMiddleware(inner, limits={"/echo": 10}, counters=counters)
+    scope = {"type": "http", "path": "/echo", "headers": []}
+    asyncio.run(middleware(scope, receive, send))
+
+    assert len(pulled) == 3
+    assert sent[0]["status"] == 413
+    assert counters.stats() == {"rejected": 1, "dropped_bytes": 12}
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.core import color_lut as color_lut_module
+from app.core.color_lut import ColorLutCache, build_color_lut, lut_key, recolor_lab
+from app.core.palette import PALETTE_NAMES
+from app.core.recolor import _apply_lut
+
+
+def test_tables_are_persisted_and_memory_mapped(tmp_path):
+    built = ColorLutCache(str(tmp_path))
+    table = built.table("Soft Slate")
+    assert built.stats()["source"] == "built"
+    assert built.stats()["colors"] == len(PALETTE_NAMES)
+    assert list(tmp_path.glob(f"recolor-lut-{lut_key()}.npy"))
+
+    reloaded = ColorLutCache(str(tmp_path))
+    mapped = reloaded.table("Soft Slate")
+    assert reloaded.stats()["source"] == "disk"
+    assert isinstance(mapped, np.memmap)
+    assert np.array_equal(mapped, table)
+
+
+def test_lut_matches_reference_transform(tmp_path):
+    cache = ColorLutCache(str(tmp_path))
+    image = np.random.default_rng(3).integers(0, 256, (64, 96, 3), dtype=np.uint8)
+    for color in ("Copper Bloom", "Lilac Mist", "Champagne Frost"):
+        out = np.empty_like(image)
+        _apply_lut(image, cache.table(color), out)
+        diff = np.abs(out.astype(np.int16) - recolor_lab(image, color))
+        assert diff.max() <= 6
+        assert diff.mean() < 1.5
+
+
+def test_build_color_lut_shape():
+    table = build_color_lut("Forest Veil", bits=4)
+    assert table.dtype == np.uint32
+    assert table.shape == (16**3,)
+
+
+def test_lut_key_tracks_transform_parameters(monkeypatch):
+    original = lut_key()
+    monkeypatch.setattr(color_lut_module, "RECOLOR_LIGHTNESS_PULL", 0.9)
+    assert lut_key() != original
+
+
+def test_unwritable_cache_dir_keeps_tables_in_memory(tmp_path):
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("x")
+    cache = ColorLutCache(str(blocker))
+    table = cache.table("Blush Garnet")
+    assert table.shape == (1 << (3 * color_lut_module.LUT_BITS),)
+    assert cache.stats()["source"] == "built"
@@ -0,0 +1,42 @@
+import numpy as np
+
+from app.core.delta_cache import DeltaCache
+from app.core.recolor import RecolorDelta
+
+
+def _delta(size: int) -> RecolorDelta:
+    return RecolorDelta(x=0, y=0, delta=np.zeros((1, size, 1), dtype=np.int8))
+
+
+def test_delta_cache_hit_and_miss_counters():
+    cache = DeltaCache(max_bytes=1024)
+    assert cache.get(("selfie", "v1", "Copper Bloom")) is None
+    cache.put(("selfie", "v1", "Copper Bloom"), _delta(10))
+    assert cache.get(("selfie", "v1", "Copper Bloom")) is not None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bytes"] == 10
+
+
+def test_delta_cache_evicts_least_recently_used_by_bytes():
+    cache = DeltaCache(max_bytes=100)
+    cache.put("a", _delta(40))
+    cache.put("b", _delta(40))
+    cache.get("a")
+    cache.put("c", _delta(40))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_delta_cache_skips_oversized_and_empty_entries_cost_nothing():
+    cache = DeltaCache(max_bytes=10)
+    cache.put("big", _delta(11))
+    cache.put("empty", RecolorDelta(x=0, y=0))
+
+    assert cache.get("big") is None
+    assert cache.get("empty") is not None
+    assert cache.stats()["bytes"] == 0
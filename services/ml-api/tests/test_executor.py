@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.errors import ServerBusyError
+from app.core.executor import PipelineExecutor
+
+
+def test_executor_runs_work_off_the_event_loop_thread():
+    executor = PipelineExecutor(max_workers=1, max_queue=0)
+
+    async def main():
+        return await executor.run(threading.current_thread)
+
+    worker = asyncio.run(main())
+    assert worker is not threading.current_thread()
+    assert executor.stats()["completed"] == 1
+    executor.shutdown()
+
+
+def test_executor_rejects_fast_when_queue_is_full():
+    executor = PipelineExecutor(max_workers=1, max_queue=1, retry_after_seconds=3)
+    gate = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run(gate.wait))
+        second = asyncio.ensure_future(executor.run(gate.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(ServerBusyError) as excinfo:
+            await executor.run(gate.wait)
+        stats = executor.stats()
+        gate.set()
+        await asyncio.gather(first, second)
+        return excinfo.value, stats
+
+    error, stats = asyncio.run(main())
+    assert error.status_code == 503
+    assert error.headers == {"Retry-After": "3"}
+    assert stats["in_flight"] == 1
+    assert stats["queued"] == 1
+    assert executor.stats()["rejected"] == 1
+    assert executor.stats()["in_flight"] == 0
+    executor.shutdown()
+
+
+def test_executor_propagates_pipeline_errors():
+    executor = PipelineExecutor(max_workers=1, max_queue=0)
+
+    def boom():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        asyncio.run(executor.run(boom))
+    assert executor.stats()["in_flight"] == 0
+    executor.shutdown()
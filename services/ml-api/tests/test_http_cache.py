@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from app.core.errors import RangeNotSatisfiableError
+from app.core.http_cache import byte_range, etag_matches, immutable_headers, strong_etag
+
+ETAG = strong_etag(b"image-bytes")
+
+
+def test_strong_etag_is_a_quoted_content_hash():
+    assert ETAG.startswith('"') and ETAG.endswith('"')
+    assert strong_etag(b"image-bytes") == ETAG
+    assert strong_etag(b"other-bytes") != ETAG
+
+
+def test_immutable_headers_use_remaining_ttl():
+    headers = immutable_headers(ETAG, time.time() + 120.5)
+    assert headers["ETag"] == ETAG
+    assert headers["Cache-Control"] == "public, max-age=120, immutable"
+    assert immutable_headers(ETAG, time.time() - 5)["Cache-Control"].startswith(
+        "public, max-age=0,"
+    )
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        (ETAG, True),
+        (f'"nope", {ETAG}', True),
+        (f"W/{ETAG}", True),
+        ("*", True),
+        ('"nope"', False),
+    ],
+)
+def test_etag_matches_if_none_match(header, expected):
+    assert etag_matches(header, ETAG) is expected
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-9", (0, 9)),
+        ("bytes=90-", (90, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=-500", (0, 99)),
+        ("bytes=50-500", (50, 99)),
+        ("bytes=0-1,5-6", None),  # multiple ranges: full body
+        ("items=0-1", None),
+        ("bytes=abc", None),
+        ("bytes=9-3", None),
+    ],
+)
+def test_byte_range_parsing(header, expected):
+    assert byte_range(header, None, ETAG, 100) == expected
+
+
+def test_byte_range_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiableError) as exc_info:
+        byte_range("bytes=100-", None, ETAG, 100)
+    assert exc_info.value.status_code == 416
+    assert exc_info.value.headers == {"Content-Range": "bytes */100"}
+
+
+def test_byte_range_honours_if_range():
+    assert byte_range("bytes=0-9", ETAG, ETAG, 100) == (0, 9)
+    assert byte_range("bytes=0-9", '"stale"', ETAG, 100) is None
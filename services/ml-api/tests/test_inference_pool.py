@@ -0,0 +1,59 @@
+import os
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core import inference_pool as inference_pool_module
+from app.core import models as models_module
+from app.core.inference_pool import InferencePool, create_pool_segmenter
+from app.core.models import ModelCache, SegmenterModel
+
+
+class _PidBackend:
+    """Returns a mask filled with the worker pid to prove remote execution."""
+
+    def process(self, image_rgb):
+        mask = np.full(image_rgb.shape[:2], os.getpid(), dtype=np.float32)
+        return SimpleNamespace(segmentation_mask=mask)
+
+
+def _fake_loader():
+    return "fake-v1", _PidBackend()
+
+
+def _stub_loader():
+    return "stub-v0.1.0", None
+
+
+def test_inference_pool_runs_backend_in_worker_process():
+    pool = InferencePool(workers=1, loader=_fake_loader)
+    try:
+        assert pool.info() == ("fake-v1", True)
+        result = pool.process(np.zeros((2, 3, 3), dtype=np.uint8))
+        assert result.segmentation_mask.shape == (2, 3)
+        assert int(result.segmentation_mask[0, 0]) != os.getpid()
+    finally:
+        pool.close()
+
+
+def test_create_pool_segmenter_falls_back_to_stub():
+    model = create_pool_segmenter(1, loader=_stub_loader)
+    assert model.version == "stub-v0.1.0"
+    assert model.backend is None
+
+
+def test_model_cache_uses_pool_in_process_mode(monkeypatch):
+    created = []
+
+    def _fake_create(workers):
+        created.append(workers)
+        return SegmenterModel(name="hair-segmenter", version="pool-v", backend=None)
+
+    monkeypatch.setattr(models_module, "INFERENCE_MODE", "process")
+    monkeypatch.setattr(models_module, "INFERENCE_WORKERS", 3)
+    monkeypatch.setattr(inference_pool_module, "create_pool_segmenter", _fake_create)
+
+    ModelCache.clear()
+    assert ModelCache.segmenter().version == "pool-v"
+    assert created == [3]
+    ModelCache.clear()
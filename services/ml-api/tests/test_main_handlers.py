@@ -3,7 +3,7 @@ import asyncio
 from fastapi import Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse  # type: ignore
-from app.core.errors import ApiError
+from app.core.errors import ApiError, ServerBusyError
 from app.main import (
     _collect_validation_errors,
     api_error_handler,
@@ -17,7 +17,19 @@ from app.core.output_store import OUTPUT_STORE
 
 
 def _build_request():
-    return Request(headers={}, base_url="http://testserver/")
+    # Minimal ASGI scope: accepted by both Starlette and the conftest shim
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "scheme": "http",
+            "server": ("testserver", 80),
+            "path": "/",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [],
+        }
+    )
 
 
 def test_collect_validation_errors():
@@ -44,16 +56,20 @@ def test_validation_exception_handler():
 
 def test_try_on_and_get_image_roundtrip():
     payload = TryOnRequest(
-        selfie="data:image/png;base64,ZmFrZS1kYXRh",
+        selfie=(
+            "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+            "DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        ),
         color="Sunlit Amber",
         intensity=50,
         request_id="req-test",
     )
     request = _build_request()
     response = asyncio.run(try_on(payload, request))
-    assert response.image_url.startswith("http://testserver/images/")
+    image_url = str(response.image_url)
+    assert image_url.startswith("http://testserver/images/")
 
-    image_id = response.image_url.rsplit("/", 1)[-1]
+    image_id = image_url.rsplit("/", 1)[-1]
     image_response = asyncio.run(get_image(image_id, request))
     assert image_response.status_code == 200
 
@@ -71,3 +87,10 @@ def test_generic_exception_handler():
     response = asyncio.run(generic_exception_handler(request, RuntimeError("boom")))
     assert response.status_code == 500
     assert isinstance(response, JSONResponse)
+
+
+def test_api_error_handler_forwards_headers():
+    request = _build_request()
+    response = asyncio.run(api_error_handler(request, ServerBusyError(2)))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "2"
@@ -0,0 +1,195 @@
+from dataclasses import replace
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.core import media as media_module
+from app.core import pipeline as pipeline_module
+from app.core import postprocess as postprocess_module
+from app.core import segmenter as segmenter_module
+from app.core.mask_cache import MASK_CACHE, MaskCache
+from app.core.models import ModelCache, SegmenterModel
+from app.core.segmenter import SegmentResult, segment_selfie
+
+MINIMAL_PNG_B64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+
+def _result(mask_id: str, side: int = 10, version: str = "v1") -> SegmentResult:
+    return SegmentResult(
+        mask_id=mask_id,
+        model_version=version,
+        mask=np.zeros((side, side), dtype=np.uint8),
+        backend="mediapipe",
+        width=side,
+        height=side,
+    )
+
+
+def test_mask_cache_counts_hits_and_misses():
+    cache = MaskCache(max_bytes=1_000)
+    assert cache.get("a", "v1") is None
+    cache.put(_result("a"))
+    assert cache.get("a", "v1") is not None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bytes"] == 100
+
+
+def test_mask_cache_evicts_least_recently_used_by_bytes():
+    cache = MaskCache(max_bytes=250)
+    cache.put(_result("a"))
+    cache.put(_result("b"))
+    cache.get("a", "v1")  # "b" becomes the LRU entry
+    cache.put(_result("c"))
+
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") is not None
+    assert cache.get("c", "v1") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 200
+
+
+def test_mask_cache_skips_masks_larger_than_budget():
+    cache = MaskCache(max_bytes=50)
+    cache.put(_result("big"))
+    assert cache.stats()["entries"] == 0
+
+
+def test_mask_cache_ignores_other_model_versions():
+    cache = MaskCache(max_bytes=1_000)
+    cache.put(_result("a", version="v1"))
+    assert cache.get("a", "v2") is None
+
+
+def test_mask_cache_marks_masks_read_only():
+    cache = MaskCache(max_bytes=1_000)
+    result = _result("a")
+    cache.put(result)
+    assert not result.mask.flags.writeable
+
+
+def test_model_cache_clear_invalidates_masks():
+    MASK_CACHE.put(_result("stale"))
+    ModelCache.clear()
+    assert MASK_CACHE.stats()["entries"] == 0
+
+
+def test_segment_selfie_hit_skips_decode_and_inference(monkeypatch):
+    calls = {"decode": 0, "process": 0}
+
+    class _Backend:
+        def process(self, image_rgb):
+            calls["process"] += 1
+            return SimpleNamespace(
+                segmentation_mask=np.ones(image_rgb.shape[:2], dtype=np.float32)
+            )
+
+    def _decode(data, header=None):
+        calls["decode"] += 1
+        return np.ones((4, 4, 3), dtype=np.uint8)
+
+    model = SegmenterModel(name="hair-segmenter", version="test-v", backend=_Backend())
+    fake_cv2 = SimpleNamespace(COLOR_BGR2RGB=4, cvtColor=lambda image, _flag: image)
+    monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
+    monkeypatch.setattr(segmenter_module, "cv2", fake_cv2)
+    monkeypatch.setattr(ModelCache, "segmenter", classmethod(lambda cls: model))
+    monkeypatch.setattr(media_module, "_decode_image", _decode)
+    MASK_CACHE.invalidate()
+
+    selfie = f"data:image/png;base64,{MINIMAL_PNG_B64}"
+    first = segment_selfie(selfie)
+    second = segment_selfie(selfie)
+
+    assert first.backend == "mediapipe"
+    assert second is first
+    assert calls == {"decode": 1, "process": 1}
+    MASK_CACHE.invalidate()
+
+
+def _processed(raw: SegmentResult, key: str) -> SegmentResult:
+    return replace(raw, mask=np.full_like(raw.mask, 7), postprocess=key)
+
+
+def test_mask_cache_memoizes_processed_masks_on_raw_entry():
+    cache = MaskCache(max_bytes=1_000)
+    raw = _result("a")
+    cache.put(raw)
+    assert cache.get_processed(raw, "f5") is None
+
+    processed = _processed(raw, "f5")
+    cache.put_processed(raw, processed)
+
+    assert cache.get_processed(raw, "f5") is processed
+    assert cache.get_processed(raw, "f7") is None
+    assert not processed.mask.flags.writeable
+    stats = cache.stats()
+    assert stats["processed_entries"] == 1
+    assert (stats["processed_hits"], stats["processed_misses"]) == (1, 2)
+    assert stats["bytes"] == 200
+
+
+def test_mask_cache_processed_requires_the_cached_raw_mask():
+    cache = MaskCache(max_bytes=1_000)
+    raw = _result("a")
+    cache.put_processed(raw, _processed(raw, "f5"))  # raw not cached
+    assert cache.stats()["processed_entries"] == 0
+
+    cache.put(raw)
+    other = _result("a")  # same id, different mask object
+    cache.put_processed(other, _processed(other, "f5"))
+    assert cache.stats()["processed_entries"] == 0
+    cache.put_processed(raw, _processed(raw, "f5"))
+    assert cache.get_processed(other, "f5") is None
+
+
+def test_mask_cache_evicts_processed_masks_with_their_raw_entry():
+    cache = MaskCache(max_bytes=350)
+    raw = _result("a")
+    cache.put(raw)
+    cache.put_processed(raw, _processed(raw, "f3"))
+    cache.put_processed(raw, _processed(raw, "f5"))
+    cache.put(_result("b"))  # 400 bytes: "a" and its variants go together
+
+    assert cache.get("a", "v1") is None
+    assert cache.get_processed(raw, "f3") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["processed_entries"]) == (1, 0)
+    assert stats["bytes"] == 100
+
+
+def test_mask_cache_replacing_raw_drops_its_processed_masks():
+    cache = MaskCache(max_bytes=1_000)
+    raw = _result("a")
+    cache.put(raw)
+    cache.put_processed(raw, _processed(raw, "f5"))
+
+    cache.put(_result("a", version="v2"))
+
+    assert cache.get_processed(raw, "f5") is None
+    assert cache.stats()["bytes"] == 100
+
+
+def test_pipeline_postprocess_reuses_memoized_mask_within_tier(monkeypatch):
+    calls = []
+    original = postprocess_module.postprocess_segment
+
+    def counting(segment, config):
+        calls.append(config.key)
+        return original(segment, config)
+
+    monkeypatch.setattr(pipeline_module, "postprocess_segment", counting)
+    MASK_CACHE.invalidate()
+    raw = _result("memo", side=32)
+    MASK_CACHE.put(raw)
+
+    first, _ = pipeline_module._postprocess(raw, 40)
+    again, elapsed_ms = pipeline_module._postprocess(raw, 65)  # same tier
+    other, _ = pipeline_module._postprocess(raw, 90)
+
+    assert again is first and elapsed_ms == 0.0
+    assert other is not first
+    assert len(calls) == 2
+    MASK_CACHE.invalidate()
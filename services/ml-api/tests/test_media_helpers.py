@@ -1,14 +1,19 @@
 import base64
 
+import numpy as np
 import pytest
 
-from app.core.errors import InvalidSelfieDataError
+from app.core import media as media_module
+from app.core.errors import ImageDimensionsTooLargeError, InvalidSelfieDataError
 from app.core.media import (
     MAX_SELFIE_BYTES,
     PayloadTooLargeError,
     UnsupportedMediaTypeError,
     _decode_base64,
     decode_selfie_payload,
+    load_selfie,
+    load_selfie_bytes,
+    probe_image_header,
     validate_selfie_payload,
 )
 
@@ -67,3 +72,110 @@ def test_decode_selfie_payload_large_data():
 def test_decode_base64_rejects_empty_string():
     with pytest.raises(InvalidSelfieDataError):
         _decode_base64("    ")
+
+
+def test_load_selfie_decodes_once_and_fingerprints_content():
+    data = _encoded_image(".jpg", 8, 8)
+    encoded = base64.b64encode(data).decode()
+    data_url = load_selfie(f"data:image/jpeg;base64,{encoded}")
+    raw = load_selfie(encoded)
+    assert data_url.mime_type == "image/jpeg"
+    assert data_url.data == data
+    assert data_url.size_bytes == len(data)
+    assert data_url.fingerprint == raw.fingerprint
+    assert data_url.image is data_url.image  # decoded once, memoized
+
+
+def test_load_selfie_applies_size_limit():
+    big = base64.b64encode(b"a" * (MAX_SELFIE_BYTES + 1)).decode()
+    with pytest.raises(PayloadTooLargeError):
+        load_selfie(f"data:image/png;base64,{big}")
+
+
+def _encoded_image(ext: str, width: int, height: int) -> bytes:
+    cv2 = pytest.importorskip("cv2")
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, : width // 2] = (40, 80, 160)
+    ok, encoded = cv2.imencode(ext, image)
+    assert ok
+    return encoded.tobytes()
+
+
+@pytest.mark.parametrize("ext", [".png", ".jpg"])
+def test_probe_image_header_reads_headers(ext):
+    data = _encoded_image(ext, 640, 480)
+    header = probe_image_header(data)
+    assert (header.width, header.height, header.channels) == (640, 480, 3)
+    assert header.decoded_bytes(scale=2) == 320 * 240 * 3
+
+
+def test_probe_image_header_ignores_unknown_or_truncated_bytes():
+    assert probe_image_header(b"fake-data") is None
+    assert probe_image_header(_encoded_image(".png", 4, 4)[:20]) is None
+
+
+def test_load_selfie_rejects_pixel_budget_before_decode(monkeypatch):
+    monkeypatch.setattr(media_module, "MAX_SELFIE_PIXELS", 100)
+    monkeypatch.setattr(media_module, "_decode_image", None)  # must not be called
+    data = _encoded_image(".png", 20, 10)
+    with pytest.raises(ImageDimensionsTooLargeError) as excinfo:
+        load_selfie(f"data:image/png;base64,{base64.b64encode(data).decode()}")
+    assert excinfo.value.status_code == 413
+    assert excinfo.value.details["width"] == "20"
+
+
+@pytest.mark.parametrize("ext", [".bmp", ".tiff", ".webp"])
+def test_load_selfie_rejects_other_formats_sent_as_png_or_jpeg(monkeypatch, ext):
+    # cv2.imdecode would decode these, but no header means no pixel budget
+    monkeypatch.setattr(media_module, "_decode_image", None)  # must not be called
+    data = _encoded_image(ext, 100, 100)
+    for mime_type in ("image/png", "image/jpeg"):
+        with pytest.raises(InvalidSelfieDataError):
+            load_selfie(f"data:{mime_type};base64,{base64.b64encode(data).decode()}")
+        with pytest.raises(InvalidSelfieDataError):
+            load_selfie_bytes(data, mime_type)
+
+
+def test_pixel_budget_counts_reduced_jpeg_decode(monkeypatch):
+    monkeypatch.setattr(media_module, "SELFIE_WORKING_MAX_SIDE", 100)
+    monkeypatch.setattr(media_module, "MAX_SELFIE_PIXELS", 4 * 100**2)
+
+    # 400x300 is decoded at 1/4 scale (100x75), well within the budget
+    jpeg = _encoded_image(".jpg", 400, 300)
+    selfie = load_selfie(f"data:image/jpeg;base64,{base64.b64encode(jpeg).decode()}")
+    assert selfie.header.reduced_decode
+    # A PNG is decoded at full size first, so the same size is over budget
+    png = _encoded_image(".png", 400, 300)
+    with pytest.raises(ImageDimensionsTooLargeError):
+        load_selfie(f"data:image/png;base64,{base64.b64encode(png).decode()}")
+
+
+def test_load_selfie_decodes_large_jpeg_at_reduced_scale(monkeypatch):
+    monkeypatch.setattr(media_module, "SELFIE_WORKING_MAX_SIDE", 500)
+    data = _encoded_image(".jpg", 2048, 1024)
+    selfie = load_selfie(
+        f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"
+    )
+    assert selfie.image.shape == (256, 512, 3)
+
+
+def test_load_selfie_keeps_full_scale_below_working_size(monkeypatch):
+    monkeypatch.setattr(media_module, "SELFIE_WORKING_MAX_SIDE", 1280)
+    data = _encoded_image(".png", 800, 600)
+    selfie = load_selfie(f"data:image/png;base64,{base64.b64encode(data).decode()}")
+    assert selfie.image.shape == (600, 800, 3)
+
+
+def test_load_selfie_bytes_sniffs_octet_stream():
+    data = _encoded_image(".jpg", 8, 8)
+    selfie = load_selfie_bytes(data, "application/octet-stream")
+    assert selfie.mime_type == "image/jpeg"
+    assert selfie.header.width == 8
+
+
+def test_load_selfie_bytes_rejects_unknown_types_and_size(monkeypatch):
+    with pytest.raises(UnsupportedMediaTypeError):
+        load_selfie_bytes(b"GIF89a", None)
+    monkeypatch.setattr(media_module, "MAX_SELFIE_BYTES", 4)
+    with pytest.raises(PayloadTooLargeError):
+        load_selfie_bytes(_encoded_image(".png", 2, 2), "image/png")
@@ -1,9 +1,11 @@
 import importlib
 import sys
+import threading
+import time
 import types
 
 from app.core import models as models_module
-from app.core.models import ModelCache, SegmenterModel
+from app.core.models import BackendPool, ModelCache, SegmenterModel
 
 
 class _FakeSegmenter:
@@ -89,3 +91,67 @@ def test_models_module_detects_mediapipe(monkeypatch):
     monkeypatch.delitem(sys.modules, "mediapipe")
     importlib.reload(models_module)
     ModelCache.clear()
+
+
+def test_backend_pool_grows_lazily_up_to_size():
+    created = []
+
+    def factory():
+        created.append(object())
+        return created[-1]
+
+    pool = BackendPool("first", factory, size=2)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first == "first"
+    assert second is created[0]
+    assert pool.stats()["utilization"] == 1.0
+
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is second  # LIFO: reuse the warmest instance
+    assert len(created) == 1
+    assert pool.stats()["checkouts"] == 3
+
+
+def test_backend_pool_waits_for_checkin_when_exhausted():
+    pool = BackendPool("only", lambda: "never", size=1)
+    model = SegmenterModel(
+        name="hair-segmenter", version="v", backend="only", pool=pool
+    )
+    acquired = []
+
+    with model.checkout() as backend:
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        assert acquired == []
+        assert backend == "only"
+    waiter.join(timeout=1)
+
+    assert acquired == ["only"]
+    assert pool.stats()["max_wait_ms"] >= 40
+
+
+def test_model_cache_clear_closes_pooled_backends(monkeypatch):
+    fake_mp = types.SimpleNamespace(
+        solutions=types.SimpleNamespace(
+            selfie_segmentation=types.SimpleNamespace(
+                SelfieSegmentation=_FakeSegmenter
+            )
+        )
+    )
+    monkeypatch.setattr(models_module, "mp", fake_mp)
+    monkeypatch.setattr(models_module, "MP_AVAILABLE", True)
+    monkeypatch.setattr(models_module, "SEGMENTER_POOL_SIZE", 2)
+
+    ModelCache.clear()
+    model = ModelCache.segmenter()
+    first = model.pool.acquire()
+    second = model.pool.acquire()
+    model.pool.release(first)
+    model.pool.release(second)
+    assert ModelCache.stats()["created"] == 2
+
+    ModelCache.clear()
+    assert first.closed and second.closed
@@ -1,3 +1,6 @@
+import os
+import subprocess
+import sys
 import time
 
 import pytest
@@ -6,6 +9,10 @@ from app.core.errors import ImageNotFoundError
 from app.core.output_store import OutputStore, placeholder_png_bytes
 
 
+def _spill_dir(output_dir):
+    return output_dir / f"memory-{os.getpid()}"
+
+
 def test_output_store_save_and_get():
     store = OutputStore(ttl_seconds=10)
     image_id = store.save(placeholder_png_bytes(), "image/png")
@@ -34,3 +41,175 @@ def test_output_store_clear_removes_entries():
     store.clear()
     with pytest.raises(ImageNotFoundError):
         store.get(image_id)
+
+
+def test_output_store_spills_least_recently_used_to_disk(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=250)
+    first = store.save(b"a" * 100, "image/png")
+    second = store.save(b"b" * 100, "image/png")
+    store.get(first)  # "second" becomes the LRU entry
+    third = store.save(b"c" * 100, "image/jpeg")
+
+    spilled = store.lookup(second)
+    assert spilled.data is None
+    assert spilled.path == _spill_dir(tmp_path) / second
+    assert spilled.path.read_bytes() == b"b" * 100
+    assert store.lookup(first).data == b"a" * 100
+    assert store.get(second) == (b"b" * 100, "image/png")
+    assert store.get(third) == (b"c" * 100, "image/jpeg")
+    stats = store.stats()
+    assert (stats["memory_entries"], stats["memory_bytes"]) == (2, 200)
+    assert (stats["disk_entries"], stats["disk_bytes"]) == (1, 100)
+    assert stats["spills"] == 1
+
+
+def test_output_store_memory_stays_within_budget(tmp_path):
+    store = OutputStore(
+        output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=1_000
+    )
+    ids = [store.save(bytes(300), "image/png") for _ in range(20)]
+
+    stats = store.stats()
+    assert stats["memory_bytes"] <= 1_000
+    assert stats["entries"] == 20
+    assert all(store.get(image_id)[0] == bytes(300) for image_id in ids)
+
+
+def test_output_store_oversized_output_goes_straight_to_disk(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=10)
+    image_id = store.save(placeholder_png_bytes(), "image/png")
+    assert store.lookup(image_id).path is not None
+    assert store.stats()["memory_bytes"] == 0
+
+
+def test_output_store_expiry_and_clear_remove_spilled_files(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=0, memory_max_bytes=0)
+    image_id = store.save(b"x" * 10, "image/png")
+    assert (_spill_dir(tmp_path) / image_id).exists()
+    time.sleep(0.01)
+    with pytest.raises(ImageNotFoundError):
+        store.get(image_id)
+    assert not (_spill_dir(tmp_path) / image_id).exists()
+
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0)
+    image_id = store.save(b"x" * 10, "image/png")
+    store.clear()
+    assert list(_spill_dir(tmp_path).iterdir()) == []
+    assert store.stats()["entries"] == 0
+
+
+def test_output_store_removes_spills_left_by_earlier_processes(tmp_path):
+    finished = subprocess.Popen([sys.executable, "-c", "pass"])
+    finished.wait()
+    dead_dir = tmp_path / f"memory-{finished.pid}"
+    live_dir = tmp_path / f"memory-{os.getppid()}"
+    for path in (dead_dir, live_dir, _spill_dir(tmp_path)):
+        path.mkdir()
+        (path / "0123abcd").write_bytes(b"orphan")
+        (path / "4567ef01.tmp").write_bytes(b"partial")
+
+    OutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+
+    assert not dead_dir.exists()
+    assert list(_spill_dir(tmp_path).iterdir()) == []
+    assert len(list(live_dir.iterdir())) == 2  # another worker's spills
+
+
+def test_output_store_keeps_output_in_memory_when_spill_fails(tmp_path, monkeypatch):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0)
+
+    def failing_write(self, data):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(type(tmp_path), "write_bytes", failing_write)
+    image_id = store.save(b"x" * 10, "image/png")
+
+    assert store.get(image_id) == (b"x" * 10, "image/png")
+    assert store.stats()["spill_errors"] == 1
+
+
+def test_output_store_spill_survives_refresh_during_write(tmp_path, monkeypatch):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0)
+    write_bytes = type(tmp_path).write_bytes
+
+    def refresh_then_write(self, data):
+        # A GET refreshes the TTL while the spill file is being written
+        for image_id in list(store._metadata):
+            store.refresh(image_id)
+        return write_bytes(self, data)
+
+    monkeypatch.setattr(type(tmp_path), "write_bytes", refresh_then_write)
+    image_id = store.save(b"x" * 10, "image/png")
+
+    spilled = store.lookup(image_id)
+    assert spilled.data is None
+    assert spilled.path.read_bytes() == b"x" * 10
+    stats = store.stats()
+    assert (stats["memory_entries"], stats["disk_entries"]) == (0, 1)
+
+
+def test_output_store_purges_unfetched_expired_outputs(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=150)
+    ids = [store.save(b"x" * 100, "image/png") for _ in range(3)]
+    now = time.time()
+
+    assert store.purge_expired(now) == 0
+    assert store.purge_expired(now + 11) == 3
+
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"], stats["memory_bytes"]) == (0, 0, 0)
+    assert stats["expirations"] == 3
+    assert list(_spill_dir(tmp_path).iterdir()) == []
+    with pytest.raises(ImageNotFoundError):
+        store.get(ids[0])
+
+
+def test_output_store_purge_skips_entries_already_removed(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=0)
+    image_id = store.save(b"x", "image/png")
+    time.sleep(0.01)
+    with pytest.raises(ImageNotFoundError):
+        store.get(image_id)  # expired on access
+
+    assert store.purge_expired() == 0
+    assert store.stats()["expirations"] == 1
+
+
+def test_output_store_evicts_oldest_beyond_max_entries(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, max_entries=2)
+    first = store.save(b"a", "image/png")
+    second = store.save(b"b", "image/png")
+    third = store.save(b"c", "image/png")
+
+    with pytest.raises(ImageNotFoundError):
+        store.get(first)
+    assert store.get(second)[0] == b"b"
+    assert store.get(third)[0] == b"c"
+    assert store.stats()["evictions"] == 1
+
+
+def test_output_store_evicts_oldest_beyond_max_bytes(tmp_path):
+    store = OutputStore(
+        output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0, max_bytes=250
+    )
+    ids = [store.save(b"x" * 100, "image/png") for _ in range(4)]
+
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 200, 2)
+    spilled = sorted(path.name for path in _spill_dir(tmp_path).iterdir())
+    assert spilled == sorted(ids[2:])
+
+
+def test_output_store_sweeper_purges_in_background(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=0)
+    store.save(b"x", "image/png")
+    store.start_sweeper(interval_seconds=0.01)
+    try:
+        deadline = time.time() + 2
+        while store.stats()["entries"] and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop_sweeper()
+
+    assert store.stats()["entries"] == 0
+    assert store.stats()["expirations"] == 1
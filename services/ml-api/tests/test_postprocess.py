@@ -6,6 +6,7 @@ import numpy as np
 import pytest
 
 from app.core import postprocess as postprocess_module
+from app.core import segmenter as segmenter_module
 from app.core.postprocess import PostprocessConfig, apply_postprocess, postprocess_mask
 from app.core.recolor import RecolorResult
 from app.core.segmenter import SegmentResult
@@ -172,3 +173,90 @@ def test_apply_postprocess_low_intensity_uses_min_feathering():
     recolor = _dummy_recolor(intensity=20)
     metadata = apply_postprocess(segment, recolor, intensity=20)
     assert "feather_radius=3" in metadata["postprocess"]
+
+
+def test_postprocess_on_roi_matches_full_frame_crop():
+    """Feathering the ROI view equals feathering the full frame, cropped."""
+    pytest.importorskip("cv2")
+    mask = np.zeros((240, 320), dtype=np.uint8)
+    mask[60:140, 100:220] = 255
+    segment = SegmentResult(
+        mask_id="roi", model_version="v", mask=mask, width=320, height=240
+    )
+    x, y, width, height = segmenter_module.segment_roi(segment)
+    config = PostprocessConfig(feather_radius=7, anti_bleed_threshold=10)
+    original = mask.copy()
+
+    full = postprocess_mask(mask, config)
+    region = postprocess_mask(mask[y : y + height, x : x + width], config)
+
+    assert np.array_equal(region, full[y : y + height, x : x + width])
+    assert np.array_equal(mask, original)
+
+
+def test_postprocess_kernels_are_cached_per_config_and_scale():
+    pytest.importorskip("cv2")
+    postprocess_module._kernels.cache_clear()
+    mask = np.zeros((32, 32), dtype=np.uint8)
+    mask[8:24, 8:24] = 255
+    config = postprocess_module.postprocess_config_for(80)
+
+    for _ in range(3):
+        postprocess_mask(mask, config)
+    postprocess_mask(mask, config, scale=0.5)
+
+    info = postprocess_module._kernels.cache_info()
+    assert (info.misses, info.hits) == (2, 2)
+
+
+def test_postprocess_feather_is_at_least_one_mask_pixel():
+    """Radii scaled below a mask pixel are clamped, not dropped."""
+    pytest.importorskip("cv2")
+    mask = np.zeros((32, 32), dtype=np.uint8)
+    mask[8:24, 8:24] = 255
+    config = postprocess_module.postprocess_config_for(20)
+
+    # 3 px feather on a 3840 px source, 256 px model mask: 0.2 mask pixels
+    result = postprocess_mask(mask, config, scale=256 / 3840)
+
+    assert postprocess_module._kernels(config, 0.01).gaussian.size == 3
+    assert 0 < result[16, 7] < 255  # soft edge, one mask pixel wide
+    assert result[16, 6] == 0 and result[16, 16] == 255
+
+
+def test_postprocess_segment_feathers_at_model_resolution():
+    """Low-res feathering + upsampling tracks full-res feathering closely."""
+    pytest.importorskip("cv2")
+    low = np.zeros((60, 80), dtype=np.uint8)
+    low[15:45, 20:60] = 255
+    segment = SegmentResult(
+        mask_id="lowres", model_version="v", mask=low, width=320, height=240
+    )
+    config = postprocess_module.postprocess_config_for(80)
+
+    processed = postprocess_module.postprocess_segment(segment, config)
+    reference = postprocess_mask(segmenter_module.upsample_mask(segment), config)
+
+    assert processed.postprocess == config.key
+    assert not processed.mask.flags.writeable
+    assert segment.mask is low and segment.postprocess == ""
+    upsampled = segmenter_module.upsample_mask(processed).astype(np.int16)
+    assert np.abs(upsampled - reference).max() <= 64
+    assert np.abs(upsampled - reference).mean() < 2
+
+
+def test_postprocess_segment_without_mask_is_unchanged():
+    segment = _dummy_segment()
+    config = postprocess_module.postprocess_config_for(50)
+    assert postprocess_module.postprocess_segment(segment, config) is segment
+
+
+def test_postprocess_timings_report_per_config():
+    timings = postprocess_module.PostprocessTimings()
+    config = postprocess_module.postprocess_config_for(80)
+    timings.record(config, 2.0)
+    timings.record(config, 4.0)
+
+    assert timings.stats() == {
+        config.key: {"count": 2, "avg_ms": 3.0, "max_ms": 4.0}
+    }
@@ -0,0 +1,353 @@
+import base64
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.core import pipeline as pipeline_module
+from app.core import recolor as recolor_module
+from app.core.color_lut import palette_lab
+from app.core.delta_cache import DELTA_CACHE
+from app.core.media import load_selfie_bytes
+from app.core.output_store import OUTPUT_STORE
+from app.core.recolor import (
+    apply_recolor,
+    build_recolor_delta,
+    recolor_image,
+    render_delta,
+    render_intensity_sweep,
+    render_palette,
+)
+from app.core.segmenter import SegmentResult, segment_roi, upsample_mask
+from app.schemas import IntensitySweepRequest, PalettePreviewRequest, TryOnOptions
+
+
+def _selfie_and_mask(height: int = 48, width: int = 64):
+    image = np.full((height, width, 3), (40, 60, 90), dtype=np.uint8)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    mask[: height // 2, width // 4 : 3 * width // 4] = 255
+    return image, mask
+
+
+def _mean_ab(image: np.ndarray) -> np.ndarray:
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    return lab[..., 1:].reshape(-1, 2).mean(axis=0)
+
+
+def test_recolor_image_only_touches_masked_pixels():
+    image, mask = _selfie_and_mask()
+    output = recolor_image(image, mask, "Forest Veil", 100)
+
+    assert output is not image
+    assert np.array_equal(output[mask == 0], image[mask == 0])
+    assert not np.array_equal(output[mask > 0], image[mask > 0])
+    # Chroma of the masked region lands on the target's
+    _, target_a, target_b = palette_lab("Forest Veil")
+    hair = output[: mask.shape[0] // 2, 20:44]
+    assert np.allclose(_mean_ab(hair), (target_a, target_b), atol=3)
+
+
+def test_recolor_image_scales_with_intensity():
+    image, mask = _selfie_and_mask()
+    untouched = recolor_image(image, mask, "Copper Bloom", 0)
+    half = recolor_image(image, mask, "Copper Bloom", 50)
+    full = recolor_image(image, mask, "Copper Bloom", 100)
+
+    assert np.array_equal(untouched, image)
+    source = image.astype(np.int16)[mask > 0]
+    half_delta = np.abs(half.astype(np.int16)[mask > 0] - source).mean()
+    full_delta = np.abs(full.astype(np.int16)[mask > 0] - source).mean()
+    assert 0 < half_delta < full_delta
+
+
+def test_recolor_image_empty_mask_returns_copy():
+    image, _ = _selfie_and_mask()
+    output = recolor_image(image, np.zeros(image.shape[:2], np.uint8), "Lilac Mist", 80)
+    assert np.array_equal(output, image)
+
+
+def test_apply_recolor_renders_from_selfie_pixels():
+    image, mask = _selfie_and_mask()
+    _, encoded = cv2.imencode(".png", image)
+    selfie = load_selfie_bytes(encoded.tobytes(), "image/png")
+    segment = SegmentResult(
+        mask_id=selfie.fingerprint,
+        model_version="test",
+        mask=mask,
+        backend="mediapipe",
+        width=image.shape[1],
+        height=image.shape[0],
+    )
+
+    result = apply_recolor(segment, "Sunlit Amber", 70, selfie=selfie)
+
+    assert result.image is not None
+    assert result.image.shape == image.shape
+    assert result.metadata["recolor"] == "lab-v1"
+    assert "sunlit-amber-70" in result.image_url
+
+
+def test_apply_recolor_without_mask_renders_nothing():
+    image, _ = _selfie_and_mask()
+    _, encoded = cv2.imencode(".png", image)
+    selfie = load_selfie_bytes(encoded.tobytes(), "image/png")
+    segment = SegmentResult(mask_id="stub", model_version="test")
+
+    result = apply_recolor(segment, "Sunlit Amber", 70, selfie=selfie)
+
+    assert result.image is None
+    assert "recolor" not in result.metadata
+
+
+def test_pipeline_stores_rendered_image(monkeypatch):
+    image, mask = _selfie_and_mask()
+    _, encoded = cv2.imencode(".jpg", image)
+
+    def fake_segment(selfie):
+        return SegmentResult(
+            mask_id=selfie.fingerprint,
+            model_version="test",
+            mask=mask,
+            backend="mediapipe",
+            width=image.shape[1],
+            height=image.shape[0],
+        )
+
+    monkeypatch.setattr(pipeline_module, "segment_selfie", fake_segment)
+    response = pipeline_module.process_tryon_upload(
+        encoded.tobytes(),
+        "image/jpeg",
+        TryOnOptions(color="Blush Garnet", intensity=60, request_id="req-render"),
+        base_url="http://test",
+    )
+
+    image_id = str(response.image_url).rsplit("/", 1)[-1]
+    data, content_type = OUTPUT_STORE.get(image_id)
+    assert content_type == "image/jpeg"
+    rendered = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert rendered.shape == image.shape
+    assert response.details["recolor"] == "lab-v1"
+    assert float(response.details["postprocess_ms"]) >= 0
+
+
+def test_render_delta_matches_blend_at_every_intensity():
+    image, mask = _selfie_and_mask()
+    mask = cv2.GaussianBlur(mask, (9, 9), 0)
+    delta = build_recolor_delta(image, mask, "Rosewood Fade")
+    full = recolor_image(image, mask, "Rosewood Fade", 100).astype(np.int16)
+    alpha = mask[..., None] / 255.0
+
+    for intensity in (5, 40, 100):
+        expected = image + (full - image) * (intensity / 100)
+        rendered = render_delta(image, delta, intensity).astype(np.int16)
+        assert np.abs(rendered - expected).max() <= 2
+        assert np.array_equal(rendered[alpha[..., 0] == 0], image[alpha[..., 0] == 0])
+
+
+def test_apply_recolor_reuses_cached_delta(monkeypatch):
+    image, mask = _selfie_and_mask()
+    _, encoded = cv2.imencode(".png", image)
+    selfie = load_selfie_bytes(encoded.tobytes(), "image/png")
+    segment = SegmentResult(
+        mask_id=selfie.fingerprint,
+        model_version="test-delta",
+        mask=mask,
+        backend="mediapipe",
+        width=image.shape[1],
+        height=image.shape[0],
+    )
+    builds = []
+    original = recolor_module._build_delta
+
+    def counting_build(*args, **kwargs):
+        builds.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(recolor_module, "_build_delta", counting_build)
+    DELTA_CACHE.clear()
+    low = apply_recolor(segment, "Saffron Glaze", 20, selfie=selfie)
+    high = apply_recolor(segment, "Saffron Glaze", 90, selfie=selfie)
+    apply_recolor(segment, "Soft Slate", 90, selfie=selfie)
+
+    assert len(builds) == 2
+    assert not np.array_equal(low.image, high.image)
+    assert DELTA_CACHE.stats()["hits"] == 1
+
+
+def test_render_palette_matches_single_color_renders():
+    image = np.random.default_rng(5).integers(0, 256, (40, 50, 3), dtype=np.uint8)
+    _, mask = _selfie_and_mask(40, 50)
+    colors = ["Copper Bloom", "Forest Veil", "Champagne Frost"]
+
+    tiles = render_palette(image, mask, colors, 75)
+
+    assert tiles.shape == (3, 40, 50, 3)
+    for tile, color in zip(tiles, colors):
+        single = recolor_image(image, mask, color, 75)
+        assert np.abs(tile.astype(np.int16) - single).max() <= 2
+        assert np.array_equal(tile[mask == 0], image[mask == 0])
+
+
+def test_palette_preview_sprite_from_pipeline(monkeypatch):
+    image, mask = _selfie_and_mask(120, 160)
+    _, encoded = cv2.imencode(".png", image)
+    selfie_b64 = base64.b64encode(encoded.tobytes()).decode()
+
+    def fake_segment(selfie):
+        return SegmentResult(
+            mask_id=selfie.fingerprint,
+            model_version="test",
+            mask=mask,
+            backend="mediapipe",
+            width=image.shape[1],
+            height=image.shape[0],
+        )
+
+    monkeypatch.setattr(pipeline_module, "segment_selfie", fake_segment)
+    response = pipeline_module.process_palette_preview(
+        PalettePreviewRequest(
+            selfie=f"data:image/png;base64,{selfie_b64}",
+            max_side=80,
+            sprite=True,
+            request_id="req-preview",
+        ),
+        base_url="http://test",
+    )
+
+    assert (response.tile_width, response.tile_height) == (80, 60)
+    assert [(item.x, item.y) for item in response.previews][:6] == [
+        (0, 0), (80, 0), (160, 0), (240, 0), (320, 0), (0, 60)
+    ]
+    data, _ = OUTPUT_STORE.get(str(response.sprite_url).rsplit("/", 1)[-1])
+    sheet = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert sheet.shape == (120, 400, 3)
+
+
+def test_intensity_sweep_shares_one_delta(monkeypatch):
+    image, mask = _selfie_and_mask()
+    _, encoded = cv2.imencode(".png", image)
+    selfie = load_selfie_bytes(encoded.tobytes(), "image/png")
+    segment = SegmentResult(
+        mask_id=selfie.fingerprint,
+        model_version="test-sweep",
+        mask=mask,
+        backend="mediapipe",
+        width=image.shape[1],
+        height=image.shape[0],
+    )
+    builds = []
+    original = recolor_module._build_delta
+
+    def counting_build(*args, **kwargs):
+        builds.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(recolor_module, "_build_delta", counting_build)
+    intensities = list(range(0, 101, 5))
+
+    frames = render_intensity_sweep(selfie, segment, "Forest Veil", intensities)
+
+    assert frames.shape == (21,) + image.shape
+    assert len(builds) == 1
+    assert np.array_equal(frames[0], image)
+    single = apply_recolor(segment, "Forest Veil", 35, selfie=selfie).image
+    assert np.array_equal(frames[7], single)
+    assert len(builds) == 1  # the try-on reused the sweep's cached delta
+
+
+def test_intensity_sweep_sprite_from_pipeline(monkeypatch):
+    image, mask = _selfie_and_mask(120, 160)
+    _, encoded = cv2.imencode(".jpg", image)
+    selfie_b64 = base64.b64encode(encoded.tobytes()).decode()
+
+    def fake_segment(selfie):
+        return SegmentResult(
+            mask_id=selfie.fingerprint,
+            model_version="test",
+            mask=mask,
+            backend="mediapipe",
+            width=image.shape[1],
+            height=image.shape[0],
+        )
+
+    monkeypatch.setattr(pipeline_module, "segment_selfie", fake_segment)
+    response = pipeline_module.process_intensity_sweep(
+        IntensitySweepRequest(
+            selfie=f"data:image/jpeg;base64,{selfie_b64}",
+            color="Lilac Mist",
+            max_side=40,
+            sprite=True,
+            request_id="req-sweep",
+        ),
+        base_url="http://test",
+    )
+
+    assert (response.frame_width, response.frame_height) == (40, 30)
+    assert [frame.intensity for frame in response.frames] == list(range(0, 101, 5))
+    assert response.frames[-1].x == 0 and response.frames[-1].y == 120
+    data, content_type = OUTPUT_STORE.get(str(response.sprite_url).rsplit("/", 1)[-1])
+    assert content_type == "image/jpeg"
+    sheet = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert sheet.shape == (150, 200, 3)
+
+
+def test_pipeline_sweep_builds_one_delta_per_postprocess_tier(monkeypatch):
+    image, mask = _selfie_and_mask()
+    _, encoded = cv2.imencode(".png", image)
+    selfie = load_selfie_bytes(encoded.tobytes(), "image/png")
+    segment = SegmentResult(
+        mask_id=selfie.fingerprint,
+        model_version="test-tiers",
+        mask=mask,
+        backend="mediapipe",
+        width=image.shape[1],
+        height=image.shape[0],
+    )
+    builds = []
+    original = recolor_module._build_delta
+
+    def counting_build(*args, **kwargs):
+        builds.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(recolor_module, "_build_delta", counting_build)
+    intensities = list(range(0, 101, 5))
+
+    frames = pipeline_module._render_sweep(
+        selfie, segment, "Forest Veil", intensities, None
+    )
+
+    assert frames.shape == (21,) + image.shape
+    assert len(builds) == 3  # feather tiers 3 / 5 / 7
+    processed, _ = pipeline_module._postprocess(segment, 35)
+    single = apply_recolor(processed, "Forest Veil", 35, selfie=selfie).image
+    assert np.array_equal(frames[7], single)
+    assert len(builds) == 3
+
+
+def test_apply_recolor_with_low_res_mask_only_touches_roi():
+    image = np.random.default_rng(11).integers(0, 256, (270, 480, 3), dtype=np.uint8)
+    _, encoded = cv2.imencode(".png", image)
+    selfie = load_selfie_bytes(encoded.tobytes(), "image/png")
+    low_res = np.zeros((72, 128), dtype=np.uint8)
+    low_res[10:30, 40:90] = 255
+    segment = SegmentResult(
+        mask_id=selfie.fingerprint,
+        model_version="test-roi",
+        mask=low_res,
+        backend="mediapipe",
+        width=480,
+        height=270,
+    )
+
+    rendered = apply_recolor(segment, "Copper Bloom", 80, selfie=selfie).image
+    reference = recolor_image(
+        image, upsample_mask(segment, guide=image), "Copper Bloom", 80
+    )
+
+    assert np.abs(rendered.astype(np.int16) - reference).max() <= 2
+    x, y, width, height = segment_roi(segment)
+    outside = np.ones(image.shape[:2], dtype=bool)
+    outside[y : y + height, x : x + width] = False
+    assert np.array_equal(rendered[outside], image[outside])
@@ -0,0 +1,145 @@
+"""Benchmark for the recolor stage (1080p selfie, single core).
+
+Target: p50 < 30 ms per render with a typical hair mask; changing only
+the intensity of an already rendered color must be much cheaper, and the
+cost of a first render must scale with hair area (ROI), not frame size.
+
+Timings depend on the CPU: they are only reported unless
+``ENFORCE_LATENCY_BUDGETS=1`` (see ``latency_budget`` in conftest).
+"""
+import time
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.core import recolor as recolor_module
+from app.core.color_lut import ColorLutCache
+from app.core.delta_cache import DELTA_CACHE
+from app.core.media import DecodedSelfie
+from app.core.recolor import (
+    apply_recolor,
+    build_recolor_delta,
+    recolor_image,
+    render_delta,
+)
+from app.core.segmenter import SegmentResult
+
+RECOLOR_BUDGET_MS = 30
+INTENSITY_BUDGET_MS = 10
+
+
+@pytest.fixture
+def selfie_1080p():
+    rng = np.random.default_rng(7)
+    image = rng.integers(0, 256, size=(1080, 1920, 3), dtype=np.uint8)
+    # Hair-like mask: upper-head ellipse, ~20% of the frame
+    mask = np.zeros((1080, 1920), dtype=np.uint8)
+    cv2.ellipse(mask, (960, 380), (420, 330), 0, 0, 360, 255, -1)
+    mask = cv2.GaussianBlur(mask, (15, 15), 0)
+    return image, mask
+
+
+@pytest.fixture(autouse=True)
+def private_luts(monkeypatch, tmp_path):
+    """Build the LUTs under ``tmp_path``, not the shared default directory."""
+    monkeypatch.setattr(recolor_module, "COLOR_LUTS", ColorLutCache(str(tmp_path)))
+
+
+@pytest.fixture
+def single_core():
+    previous = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    yield
+    cv2.setNumThreads(previous)
+
+
+def test_recolor_latency_1080p(selfie_1080p, single_core, latency_budget):
+    image, mask = selfie_1080p
+    for _ in range(3):  # warm up buffers and LUTs
+        recolor_image(image, mask, "Copper Bloom", 65)
+
+    latencies = []
+    for _ in range(15):
+        start = time.perf_counter()
+        recolor_image(image, mask, "Copper Bloom", 65)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    print(
+        f"\nRecolor latency (1080p, 1 thread): p50 {p50:.1f} ms,"
+        f" max {latencies[-1]:.1f} ms"
+    )
+
+    latency_budget(
+        p50 < RECOLOR_BUDGET_MS, f"p50 recolor latency too high: {p50:.1f} ms"
+    )
+
+
+def test_intensity_change_latency_1080p(selfie_1080p, single_core, latency_budget):
+    image, mask = selfie_1080p
+    delta = build_recolor_delta(image, mask, "Copper Bloom")
+    render_delta(image, delta, 50)
+
+    latencies = []
+    for intensity in range(0, 101, 5):
+        start = time.perf_counter()
+        render_delta(image, delta, intensity)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    print(f"\nIntensity re-render (1080p, 1 thread): p50 {p50:.1f} ms")
+
+    latency_budget(
+        p50 < INTENSITY_BUDGET_MS, f"p50 intensity re-render too high: {p50:.1f} ms"
+    )
+
+
+def _first_render_ms(image: np.ndarray, low_res_mask: np.ndarray) -> float:
+    selfie = DecodedSelfie(
+        mime_type="image/png",
+        data=b"",
+        fingerprint="bench",
+        _image=image,
+        _image_decoded=True,
+    )
+    segment = SegmentResult(
+        mask_id="bench",
+        model_version="bench",
+        mask=low_res_mask,
+        backend="mediapipe",
+        width=image.shape[1],
+        height=image.shape[0],
+    )
+    latencies = []
+    for _ in range(7):
+        DELTA_CACHE.clear()
+        start = time.perf_counter()
+        apply_recolor(segment, "Copper Bloom", 65, selfie=selfie)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)[len(latencies) // 2]
+
+
+def test_first_render_scales_with_hair_area(
+    selfie_1080p, single_core, latency_budget
+):
+    image, _ = selfie_1080p
+    small = np.zeros((144, 256), dtype=np.uint8)
+    small[10:50, 90:166] = 255  # ~10% of the frame
+    large = np.full((144, 256), 255, dtype=np.uint8)
+    _first_render_ms(image, small)
+
+    small_ms = _first_render_ms(image, small)
+    large_ms = _first_render_ms(image, large)
+    print(
+        f"\nFirst render (1080p): small hair {small_ms:.1f} ms,"
+        f" full frame {large_ms:.1f} ms"
+    )
+
+    latency_budget(
+        small_ms < large_ms * 0.6,
+        f"small-hair render {small_ms:.1f} ms vs full frame {large_ms:.1f} ms",
+    )
@@ -0,0 +1,133 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.core import pipeline as pipeline_module
+from app.core.models import ModelCache
+from app.core.output_store import OUTPUT_STORE, OutputStore
+from app.core.render_cache import RENDER_CACHE, CachedRender, RenderCache
+from app.core.segmenter import SegmentResult
+from app.schemas import TryOnOptions
+
+
+def _live(_image_id: str) -> bool:
+    return True
+
+
+def test_render_cache_hit_rate_counters():
+    cache = RenderCache(max_entries=4)
+    key = ("mask", "Copper Bloom", 50, "v1", "f5")
+    assert cache.get(key, _live) is None
+    cache.put(key, CachedRender(image_id="img", details={}))
+    assert cache.get(key, _live).image_id == "img"
+    assert cache.get(key, _live).image_id == "img"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3, abs=1e-4)
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(max_entries=2)
+    cache.put("a", CachedRender(image_id="a", details={}))
+    cache.put("b", CachedRender(image_id="b", details={}))
+    cache.get("a", _live)
+    cache.put("c", CachedRender(image_id="c", details={}))
+
+    assert cache.get("b", _live) is None
+    assert cache.get("a", _live) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_render_cache_drops_entries_whose_image_is_gone():
+    cache = RenderCache(max_entries=4)
+    cache.put("a", CachedRender(image_id="expired", details={}))
+
+    assert cache.get("a", lambda _image_id: False) is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["stale"], stats["misses"]) == (0, 1, 1)
+
+
+def test_output_store_refresh_restarts_ttl(tmp_path):
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=1)
+    image_id = store.save(b"x", "image/png")
+    before = store.lookup(image_id).expires_at
+    time.sleep(0.01)
+
+    assert store.refresh(image_id)
+    assert store.lookup(image_id).expires_at > before
+    assert store.purge_expired(before + 0.001) == 0
+    assert not store.refresh("missing")
+
+
+@pytest.fixture
+def rendered_upload(monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    image = np.random.default_rng(4).integers(0, 256, (48, 64, 3), dtype=np.uint8)
+    mask = np.zeros((48, 64), dtype=np.uint8)
+    mask[5:30, 10:50] = 255
+    _, encoded = cv2.imencode(".png", image)
+    calls = []
+
+    def fake_segment(selfie):
+        calls.append(selfie.fingerprint)
+        return SegmentResult(
+            mask_id=selfie.fingerprint,
+            model_version=ModelCache.segmenter().version,
+            mask=mask,
+            backend="mediapipe",
+            width=64,
+            height=48,
+        )
+
+    monkeypatch.setattr(pipeline_module, "segment_selfie", fake_segment)
+    RENDER_CACHE.clear()
+
+    def upload(color: str = "Copper Bloom", intensity: int = 60):
+        return pipeline_module.process_tryon_upload(
+            encoded.tobytes(),
+            "image/png",
+            TryOnOptions(color=color, intensity=intensity, request_id="req-cache"),
+            base_url="http://test",
+        )
+
+    yield upload, calls
+    RENDER_CACHE.clear()
+
+
+def test_identical_try_on_returns_cached_image_without_segmenting(rendered_upload):
+    upload, calls = rendered_upload
+    first = upload()
+    second = upload()
+
+    assert second.image_url == first.image_url
+    assert len(calls) == 1
+    assert first.details["render_cache"] == "miss"
+    assert second.details["render_cache"] == "hit"
+    assert second.details["recolor"] == first.details["recolor"]
+
+
+def test_try_on_cache_key_includes_color_and_intensity(rendered_upload):
+    upload, calls = rendered_upload
+    urls = {
+        upload().image_url,
+        upload(intensity=65).image_url,
+        upload("Forest Veil").image_url,
+    }
+
+    assert len(urls) == 3
+    assert len(calls) == 3
+
+
+def test_try_on_rerenders_when_cached_image_expired(rendered_upload):
+    upload, calls = rendered_upload
+    first = upload()
+    OUTPUT_STORE.clear()
+
+    second = upload()
+
+    assert second.image_url != first.image_url
+    assert second.details["render_cache"] == "miss"
+    assert len(calls) == 2
+    assert RENDER_CACHE.stats()["stale"] == 1
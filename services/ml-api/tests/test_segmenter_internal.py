@@ -1,8 +1,11 @@
 from types import SimpleNamespace
 
 import numpy as np
+import pytest
 
+from app.core import media as media_module
 from app.core import segmenter as segmenter_module
+from app.core.media import load_selfie
 from app.core.segmenter import SegmenterModel
 
 
@@ -43,13 +46,19 @@ class _FakeCV2ReturningNone(_FakeCV2):
         return None
 
 
-def _make_selfie() -> str:
-    return f"data:image/png;base64,{MINIMAL_PNG_B64}"
+def _make_selfie():
+    return load_selfie(f"data:image/png;base64,{MINIMAL_PNG_B64}")
+
+
+def _patch_cv2(monkeypatch, fake_cv2) -> None:
+    monkeypatch.setattr(segmenter_module, "cv2", fake_cv2)
+    monkeypatch.setattr(media_module, "cv2", fake_cv2)
+    monkeypatch.setattr(media_module, "CV2_AVAILABLE", True)
 
 
 def test_segment_with_mediapipe_success(monkeypatch):
     monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
-    monkeypatch.setattr(segmenter_module, "cv2", _FakeCV2())
+    _patch_cv2(monkeypatch, _FakeCV2())
 
     backend = _FakeBackend()
     model = SegmenterModel(name="hair-segmenter", version="test-v", backend=backend)
@@ -62,9 +71,31 @@ def test_segment_with_mediapipe_success(monkeypatch):
     assert result.height == 2
 
 
+def test_segment_with_mediapipe_reuses_decoded_pixels(monkeypatch):
+    calls = []
+
+    class _CountingCV2(_FakeCV2):
+        def imdecode(self, nparr, flags):
+            calls.append(flags)
+            return super().imdecode(nparr, flags)
+
+    monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
+    _patch_cv2(monkeypatch, _CountingCV2())
+
+    selfie = _make_selfie()
+    model = SegmenterModel(
+        name="hair-segmenter", version="test-v", backend=_FakeBackend()
+    )
+    first = segmenter_module._segment_with_mediapipe(selfie, model)
+    second = segmenter_module._segment_with_mediapipe(selfie, model)
+
+    assert len(calls) == 1
+    assert first.mask_id == second.mask_id == selfie.fingerprint
+
+
 def test_segment_with_mediapipe_falls_back_on_error(monkeypatch):
     monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
-    monkeypatch.setattr(segmenter_module, "cv2", _FakeCV2())
+    _patch_cv2(monkeypatch, _FakeCV2())
 
     backend = _FakeBackend(raise_error=True)
     model = SegmenterModel(name="hair-segmenter", version="test-v", backend=backend)
@@ -85,7 +116,7 @@ def test_segment_with_mediapipe_shortcircuits_when_unavailable(monkeypatch):
 
 def test_segment_with_mediapipe_falls_back_on_invalid_image(monkeypatch):
     monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
-    monkeypatch.setattr(segmenter_module, "cv2", _FakeCV2ReturningNone())
+    _patch_cv2(monkeypatch, _FakeCV2ReturningNone())
 
     backend = _FakeBackend()
     model = SegmenterModel(name="hair-segmenter", version="test-v", backend=backend)
@@ -96,7 +127,7 @@ def test_segment_with_mediapipe_falls_back_on_invalid_image(monkeypatch):
 
 def test_segment_with_mediapipe_falls_back_when_mask_missing(monkeypatch):
     monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
-    monkeypatch.setattr(segmenter_module, "cv2", _FakeCV2())
+    _patch_cv2(monkeypatch, _FakeCV2())
 
     backend = _FakeBackendNoMask()
     model = SegmenterModel(name="hair-segmenter", version="test-v", backend=backend)
@@ -118,3 +149,88 @@ def test_segmenter_module_detects_mediapipe(monkeypatch):
     monkeypatch.delitem(sys.modules, "mediapipe")
     importlib.reload(segmenter_module)
     segmenter_module.ModelCache.clear()
+
+
+def test_segment_with_mediapipe_infers_at_model_resolution(monkeypatch):
+    cv2 = pytest.importorskip("cv2")
+    seen_shapes = []
+
+    class _RecordingBackend:
+        def process(self, image_rgb):
+            seen_shapes.append(image_rgb.shape)
+            mask = np.zeros(image_rgb.shape[:2], dtype=np.float32)
+            mask[:, : image_rgb.shape[1] // 2] = 0.9
+            return SimpleNamespace(segmentation_mask=mask)
+
+    image = np.full((512, 1024, 3), 90, dtype=np.uint8)
+    monkeypatch.setattr(segmenter_module, "MP_AVAILABLE", True)
+    monkeypatch.setattr(segmenter_module, "cv2", cv2)
+    monkeypatch.setattr(segmenter_module, "SEGMENTER_INPUT_SIZE", 256)
+    monkeypatch.setattr(
+        media_module, "_decode_image", lambda _data, _header=None: image
+    )
+
+    model = SegmenterModel(
+        name="hair-segmenter", version="test-v", backend=_RecordingBackend()
+    )
+    result = segmenter_module._segment_with_mediapipe(_make_selfie(), model)
+
+    assert seen_shapes == [(128, 256, 3)]
+    assert result.mask.shape == (128, 256)
+    assert (result.width, result.height) == (1024, 512)
+    assert set(np.unique(result.mask)) == {0, 255}
+
+    full = segmenter_module.upsample_mask(result)
+    assert full.shape == (512, 1024)
+    assert full[:, :500].min() == 255
+    assert full[:, 524:].max() == 0
+
+
+def test_upsample_mask_returns_mask_when_sizes_match():
+    mask = np.zeros((4, 4), dtype=np.uint8)
+    segment = segmenter_module.SegmentResult(
+        mask_id="m", model_version="v", mask=mask, width=4, height=4
+    )
+    assert segmenter_module.upsample_mask(segment) is mask
+
+
+def _low_res_segment():
+    mask = np.zeros((144, 256), dtype=np.uint8)
+    mask[20:60, 100:180] = 255
+    return segmenter_module.SegmentResult(
+        mask_id="m", model_version="v", mask=mask, width=1920, height=1080
+    )
+
+
+def test_segment_roi_scales_bbox_and_adds_margin(monkeypatch):
+    monkeypatch.setattr(segmenter_module, "SEGMENT_ROI_MARGIN", 16)
+    x, y, width, height = segmenter_module.segment_roi(_low_res_segment())
+
+    # bbox 100..180 x 20..60 at 7.5x scale, padded by 16 + 8 pixels per side
+    assert (x, y) == (750 - 24, 150 - 24)
+    assert (x + width, y + height) == (1350 + 24, 450 + 24)
+
+
+def test_segment_roi_empty_mask_is_zero_sized():
+    segment = segmenter_module.SegmentResult(
+        mask_id="m", model_version="v", mask=np.zeros((8, 8), np.uint8)
+    )
+    assert segmenter_module.segment_roi(segment) == (0, 0, 0, 0)
+
+
+def test_upsample_mask_roi_matches_full_upsample_crop():
+    pytest.importorskip("cv2")
+    segment = _low_res_segment()
+    roi = segmenter_module.segment_roi(segment)
+    x, y, width, height = roi
+
+    full = segmenter_module.upsample_mask(segment)
+    region = segmenter_module.upsample_mask(segment, roi=roi)
+
+    assert region.shape == (height, width)
+    diff = np.abs(region.astype(np.int16) - full[y : y + height, x : x + width])
+    assert diff.max() <= 1
+    # Everything outside the ROI is background
+    outside = full.copy()
+    outside[y : y + height, x : x + width] = 0
+    assert outside.max() == 0
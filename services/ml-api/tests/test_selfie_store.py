@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from app.core.errors import SelfieNotFoundError
+from app.core.media import load_selfie
+from app.core.segmenter import SegmentResult
+from app.core.selfie_store import SelfieStore
+
+
+def _session_parts():
+    selfie = load_selfie(
+        "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4"
+        "2mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+    )
+    segment = SegmentResult(mask_id=selfie.fingerprint, model_version="stub-v0.1.0")
+    return selfie, segment
+
+
+def test_selfie_store_save_and_get():
+    store = SelfieStore(ttl_seconds=10)
+    selfie, segment = _session_parts()
+    selfie_id = store.save(selfie, segment)
+    session = store.get(selfie_id)
+    assert session.selfie is selfie
+    assert session.segment is segment
+
+
+def test_selfie_store_expiry():
+    store = SelfieStore(ttl_seconds=0)
+    selfie_id = store.save(*_session_parts())
+    time.sleep(0.01)
+    with pytest.raises(SelfieNotFoundError):
+        store.get(selfie_id)
+
+
+def test_selfie_store_drops_oldest_when_full():
+    store = SelfieStore(ttl_seconds=10, max_entries=1)
+    first = store.save(*_session_parts())
+    second = store.save(*_session_parts())
+    with pytest.raises(SelfieNotFoundError):
+        store.get(first)
+    assert store.get(second)
+
+
+def test_selfie_store_is_bounded_by_session_bytes():
+    selfie, segment = _session_parts()
+    session_bytes = len(selfie.data) + selfie.image.nbytes
+    store = SelfieStore(ttl_seconds=10, max_bytes=2 * session_bytes)
+    ids = [store.save(selfie, segment) for _ in range(3)]
+
+    with pytest.raises(SelfieNotFoundError):
+        store.get(ids[0])
+    assert store.get(ids[2]).nbytes == session_bytes
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"]) == (2, 2 * session_bytes)
+    assert stats["evictions"] == 1
+
+
+def test_selfie_store_keeps_newest_session_over_budget():
+    store = SelfieStore(ttl_seconds=10, max_bytes=0)
+    selfie_id = store.save(*_session_parts())
+    assert store.get(selfie_id)
+    assert store.stats()["entries"] == 1
+
+
+def test_selfie_store_purges_expired_sessions():
+    store = SelfieStore(ttl_seconds=10)
+    ids = [store.save(*_session_parts()) for _ in range(3)]
+    now = time.time()
+
+    assert store.purge_expired(now) == 0
+    assert store.purge_expired(now + 11) == 3
+
+    stats = store.stats()
+    assert (stats["entries"], stats["bytes"], stats["expirations"]) == (0, 0, 3)
+    with pytest.raises(SelfieNotFoundError):
+        store.get(ids[0])
+
+
+def test_selfie_store_sweeper_purges_in_background():
+    store = SelfieStore(ttl_seconds=0)
+    store.save(*_session_parts())
+
+    store.start_sweeper(interval_seconds=0.01)
+    try:
+        deadline = time.time() + 5
+        while store.stats()["entries"] and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop_sweeper()
+
+    assert store.stats()["expirations"] == 1
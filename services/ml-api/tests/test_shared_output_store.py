@@ -0,0 +1,157 @@
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from app.core.errors import ImageNotFoundError
+from app.core.output_store import OutputStore, create_output_store
+from app.core.shared_output_store import INDEX_FILENAME, SqliteOutputStore
+
+
+def _save_in_worker(output_dir, data, queue):
+    store = SqliteOutputStore(output_dir=output_dir, ttl_seconds=10)
+    queue.put(store.save(data, "image/png"))
+
+
+def test_shared_store_save_lookup_and_get(tmp_path):
+    store = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+    image_id = store.save(b"\x89PNG shared", "image/png")
+
+    output = store.lookup(image_id)
+    assert output.path == tmp_path / image_id
+    assert output.size == len(b"\x89PNG shared")
+    assert output.etag.startswith('"')
+    assert store.get(image_id) == (b"\x89PNG shared", "image/png")
+    with pytest.raises(ImageNotFoundError):
+        store.get("missing-id")
+
+
+def test_shared_store_is_visible_across_instances(tmp_path):
+    # Two instances on one OUTPUT_DIR stand in for two uvicorn workers
+    worker_a = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+    worker_b = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+
+    image_id = worker_a.save(b"from a", "image/png")
+
+    assert worker_b.get(image_id) == (b"from a", "image/png")
+    assert worker_b.refresh(image_id) is True
+    worker_b.clear()
+    with pytest.raises(ImageNotFoundError):
+        worker_a.lookup(image_id)
+
+
+def test_shared_store_serves_output_saved_by_another_process(tmp_path):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    worker = context.Process(
+        target=_save_in_worker, args=(str(tmp_path), b"\x89PNG child", queue)
+    )
+    worker.start()
+    image_id = queue.get(timeout=60)
+    worker.join(timeout=60)
+
+    store = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+    assert store.get(image_id) == (b"\x89PNG child", "image/png")
+    assert store.stats()["entries"] == 1
+
+
+def test_shared_store_concurrent_saves_keep_totals_consistent(tmp_path):
+    stores = [
+        SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10) for _ in range(4)
+    ]
+    image_ids = []
+
+    def save(store):
+        for index in range(25):
+            image_ids.append(store.save(bytes([index]) * 10, "image/png"))
+
+    threads = [threading.Thread(target=save, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = stores[0].stats()
+    assert stats["entries"] == len(set(image_ids)) == 100
+    assert stats["bytes"] == 1000
+
+
+def test_shared_store_removes_file_when_index_insert_fails(tmp_path, monkeypatch):
+    store = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+
+    def busy(statements):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_write", busy)
+    with pytest.raises(sqlite3.OperationalError):
+        store.save(b"orphan", "image/png")
+
+    # Only the index (and its WAL/shm files) is left
+    assert all(path.name.startswith(INDEX_FILENAME) for path in tmp_path.iterdir())
+
+
+def test_shared_store_expired_outputs_are_hidden_then_purged(tmp_path):
+    store = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=0)
+    image_id = store.save(b"gone", "image/png")
+    time.sleep(0.01)
+
+    with pytest.raises(ImageNotFoundError):
+        store.lookup(image_id)
+    assert store.refresh(image_id) is False
+    assert (tmp_path / image_id).exists()
+
+    assert store.purge_expired() == 1
+    assert not (tmp_path / image_id).exists()
+    stats = store.stats()
+    assert stats["entries"] == 0
+    assert stats["bytes"] == 0
+    assert stats["expirations"] == 1
+
+
+def test_shared_store_evicts_least_recently_touched_over_caps(tmp_path):
+    store = SqliteOutputStore(
+        output_dir=str(tmp_path), ttl_seconds=10, max_bytes=25, max_entries=10
+    )
+    first = store.save(b"a" * 10, "image/png")
+    second = store.save(b"b" * 10, "image/png")
+    assert store.refresh(first) is True
+
+    third = store.save(b"c" * 10, "image/png")
+
+    with pytest.raises(ImageNotFoundError):
+        store.lookup(second)
+    assert not (tmp_path / second).exists()
+    assert store.get(first)[0] == b"a" * 10
+    assert store.get(third)[0] == b"c" * 10
+    stats = store.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 20
+    assert stats["evictions"] == 1
+
+
+def test_shared_store_sweeper_purges_in_background(tmp_path):
+    store = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=0)
+    image_id = store.save(b"gone", "image/png")
+
+    store.start_sweeper(interval_seconds=0.01)
+    try:
+        deadline = time.time() + 5
+        while (tmp_path / image_id).exists() and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        store.stop_sweeper()
+
+    assert not (tmp_path / image_id).exists()
+    assert store.stats()["expirations"] == 1
+
+
+def test_create_output_store_selects_backend(tmp_path):
+    memory = create_output_store("memory", output_dir=str(tmp_path))
+    assert isinstance(memory, OutputStore)
+    store = create_output_store("sqlite", output_dir=str(tmp_path))
+    assert isinstance(store, SqliteOutputStore)
+    assert store.stats()["backend"] == "sqlite"
+    with pytest.raises(ValueError):
+        create_output_store("redis")
@@ -6,7 +6,11 @@ from app.schemas.tryon import TryOnRequest, TryOnResponse
 
 
 def _make_selfie_payload() -> str:
-    return "data:image/png;base64,ZmFrZS1kYXRh"
+    # 1x1 PNG
+    return (
+        "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR4"
+        "2mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+    )
 
 
 def test_process_tryon_has_expected_fields():
@@ -22,7 +26,7 @@ def test_process_tryon_has_expected_fields():
     assert response.color == "Sunlit Amber"
     assert response.processing_ms >= 1
     assert response.details is not None
-    assert response.image_url.startswith("http://localhost/images/")
+    assert str(response.image_url).startswith("http://localhost/images/")
     assert "mask_hash" in response.details
 
 
@@ -43,3 +47,15 @@ def test_tryon_request_rejects_invalid_color():
             intensity=40,
             request_id="req-xyz",
         )
+
+
+def test_tryon_request_requires_exactly_one_selfie_source():
+    with pytest.raises(ValidationError):
+        TryOnRequest(color="Copper Bloom", request_id="req-abc")
+    with pytest.raises(ValidationError):
+        TryOnRequest(
+            selfie=_make_selfie_payload(),
+            selfie_id="abc",
+            color="Copper Bloom",
+            request_id="req-abc",
+        )
@@ -13,6 +13,13 @@ from app.main import app
 client = TestClient(app)
 
 
+# 1x1 PNG: selfies must carry a readable PNG/JPEG header
+_PNG_BASE64 = (
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9aw"
+    "AAAABJRU5ErkJggg=="
+)
+
+
 def _make_payload(selfie_base64: str):
     return {
         "selfie": f"data:image/png;base64,{selfie_base64}",
@@ -45,7 +52,7 @@ def test_try_on_rejects_bad_mime():
 
 
 def test_try_on_returns_image_url_and_fetchable_output():
-    payload = _make_payload(base64.b64encode(b"fake").decode())
+    payload = _make_payload(_PNG_BASE64)
     response = client.post("/try-on", json=payload)
     assert response.status_code == 200
     image_url = response.json()["image_url"]
@@ -53,3 +60,287 @@ def test_try_on_returns_image_url_and_fetchable_output():
     fetch = client.get(image_path)
     assert fetch.status_code == 200
     assert fetch.headers["content-type"].startswith("image/")
+
+
+def test_get_image_serves_spilled_output_from_disk(tmp_path, monkeypatch):
+    from app import main as main_module
+    from app.core.output_store import OutputStore
+
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0)
+    monkeypatch.setattr(main_module, "OUTPUT_STORE", store)
+    image_id = store.save(b"\xff\xd8spilled", "image/jpeg")
+
+    fetch = client.get(f"/images/{image_id}")
+
+    assert fetch.status_code == 200
+    assert fetch.headers["content-type"] == "image/jpeg"
+    assert fetch.content == b"\xff\xd8spilled"
+
+
+def test_get_image_404_when_spilled_file_was_removed(tmp_path, monkeypatch):
+    from app import main as main_module
+    from app.core.output_store import OutputStore
+
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0)
+    monkeypatch.setattr(main_module, "OUTPUT_STORE", store)
+    image_id = store.save(b"\xff\xd8spilled", "image/jpeg")
+    # Swept between the lookup and the response
+    store.lookup(image_id).path.unlink()
+
+    fetch = client.get(f"/images/{image_id}")
+
+    assert fetch.status_code == 404
+    assert fetch.json()["code"] == "IMAGE_NOT_FOUND"
+
+
+def test_get_image_serves_output_from_shared_store(tmp_path, monkeypatch):
+    from app import main as main_module
+    from app.core.shared_output_store import SqliteOutputStore
+
+    # Saved by one worker, served by another
+    image_id = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10).save(
+        b"\x89PNGshared", "image/png"
+    )
+    worker = SqliteOutputStore(output_dir=str(tmp_path), ttl_seconds=10)
+    monkeypatch.setattr(main_module, "OUTPUT_STORE", worker)
+
+    fetch = client.get(f"/images/{image_id}")
+
+    assert fetch.status_code == 200
+    assert fetch.headers["content-type"] == "image/png"
+    assert fetch.headers["etag"].startswith('"')
+    assert fetch.content == b"\x89PNGshared"
+
+
+def _stored_image_url(data: bytes = bytes(range(100))) -> str:
+    from app.core.output_store import OUTPUT_STORE
+
+    return f"/images/{OUTPUT_STORE.save(data, 'image/png')}"
+
+
+def test_get_image_sends_validators_and_immutable_cache_control():
+    fetch = client.get(_stored_image_url())
+
+    assert fetch.status_code == 200
+    assert fetch.headers["etag"].startswith('"')
+    assert fetch.headers["cache-control"].startswith("public, max-age=")
+    assert fetch.headers["cache-control"].endswith(", immutable")
+    assert fetch.headers["accept-ranges"] == "bytes"
+
+
+def test_get_image_if_none_match_returns_304():
+    url = _stored_image_url()
+    etag = client.get(url).headers["etag"]
+
+    revalidated = client.get(url, headers={"If-None-Match": etag})
+
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+
+def test_get_image_serves_byte_ranges():
+    url = _stored_image_url()
+
+    partial = client.get(url, headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(10, 20))
+    assert partial.headers["content-range"] == "bytes 10-19/100"
+
+    unsatisfiable = client.get(url, headers={"Range": "bytes=500-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == "bytes */100"
+
+
+def test_get_image_ranges_and_etag_for_spilled_output(tmp_path, monkeypatch):
+    from app import main as main_module
+    from app.core.output_store import OutputStore
+
+    store = OutputStore(output_dir=str(tmp_path), ttl_seconds=10, memory_max_bytes=0)
+    monkeypatch.setattr(main_module, "OUTPUT_STORE", store)
+    image_id = store.save(bytes(range(100)), "image/png")
+    etag = store.lookup(image_id).etag
+
+    partial = client.get(f"/images/{image_id}", headers={"Range": "bytes=-5"})
+    assert partial.status_code == 206
+    assert partial.content == bytes(range(95, 100))
+    assert partial.headers["etag"] == etag
+
+    revalidated = client.get(f"/images/{image_id}", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+
+def test_stats_exposes_mask_cache_counters():
+    response = client.get("/stats")
+    assert response.status_code == 200
+    assert {"hits", "misses", "bytes"} <= set(response.json()["mask_cache"])
+
+
+def test_selfie_session_roundtrip():
+    upload = client.post(
+        "/selfies",
+        json={
+            "selfie": f"data:image/png;base64,{_PNG_BASE64}",
+            "request_id": "req-test",
+        },
+    )
+    assert upload.status_code == 200
+    selfie_id = upload.json()["selfie_id"]
+
+    response = client.post(
+        "/try-on",
+        json={
+            "selfie_id": selfie_id,
+            "color": "Copper Bloom",
+            "intensity": 30,
+            "request_id": "req-test",
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["details"]["mime_type"] == "image/png"
+
+
+def test_try_on_unknown_selfie_id_returns_404():
+    response = client.post(
+        "/try-on",
+        json={
+            "selfie_id": "missing",
+            "color": "Copper Bloom",
+            "request_id": "req-test",
+        },
+    )
+    assert response.status_code == 404
+    assert response.json()["code"] == "SELFIE_NOT_FOUND"
+
+
+def _png_bytes() -> bytes:
+    return base64.b64decode(_PNG_BASE64)
+
+
+def test_try_on_upload_accepts_raw_octet_stream():
+    response = client.post(
+        "/try-on/upload",
+        content=_png_bytes(),
+        headers={
+            "content-type": "application/octet-stream",
+            "x-color": "Forest Veil",
+            "x-intensity": "35",
+            "x-request-id": "req-binary",
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["request_id"] == "req-binary"
+    assert body["details"]["mime_type"] == "image/png"
+    assert body["details"]["intensity"] == "35"
+
+
+def test_try_on_upload_accepts_multipart():
+    pytest.importorskip("python_multipart")
+    response = client.post(
+        "/try-on/upload",
+        files={"selfie": ("selfie.png", _png_bytes(), "image/png")},
+        data={"color": "Lilac Mist", "request_id": "req-multipart"},
+    )
+    assert response.status_code == 200
+    assert response.json()["color"] == "Lilac Mist"
+
+
+def test_try_on_upload_rejects_unknown_binary():
+    response = client.post(
+        "/try-on/upload",
+        content=b"GIF89a-not-supported",
+        headers={"content-type": "application/octet-stream", "x-color": "Forest Veil"},
+    )
+    assert response.status_code == 415
+
+
+def test_try_on_upload_validates_options():
+    response = client.post(
+        "/try-on/upload",
+        content=_png_bytes(),
+        headers={"content-type": "image/png", "x-color": "Not A Color"},
+    )
+    assert response.status_code == 400
+    assert response.json()["code"] == "INVALID_PAYLOAD"
+
+
+def test_palette_preview_returns_one_image_per_color():
+    response = client.post(
+        "/try-on/palette-preview",
+        json={
+            "selfie": f"data:image/png;base64,{_PNG_BASE64}",
+            "request_id": "req-preview",
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["color"] for item in body["previews"]][:2] == [
+        "Midnight Espresso",
+        "Copper Bloom",
+    ]
+    assert len(body["previews"]) == 10
+    assert all(item["image_url"] for item in body["previews"])
+    assert body["sprite_url"] is None
+
+
+def test_palette_preview_sprite_subset():
+    response = client.post(
+        "/try-on/palette-preview",
+        json={
+            "selfie": f"data:image/png;base64,{_PNG_BASE64}",
+            "colors": ["Lilac Mist", "Soft Slate"],
+            "sprite": True,
+            "request_id": "req-preview",
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["color"] for item in body["previews"]] == ["Lilac Mist", "Soft Slate"]
+    fetch = client.get(body["sprite_url"].replace("http://testserver", ""))
+    assert fetch.status_code == 200
+
+
+def test_palette_preview_rejects_unknown_color():
+    response = client.post(
+        "/try-on/palette-preview",
+        json={
+            "selfie": f"data:image/png;base64,{_PNG_BASE64}",
+            "colors": ["Neon Green"],
+            "request_id": "req-preview",
+        },
+    )
+    assert response.status_code == 400
+    assert response.json()["code"] == "INVALID_PAYLOAD"
+
+
+def test_intensity_sweep_lists_every_slider_position():
+    response = client.post(
+        "/try-on/intensity-sweep",
+        json={
+            "selfie": f"data:image/png;base64,{_PNG_BASE64}",
+            "color": "Copper Bloom",
+            "request_id": "req-sweep",
+        },
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert [frame["intensity"] for frame in body["frames"]] == list(range(0, 101, 5))
+    assert all(frame["image_url"] for frame in body["frames"])
+    assert body["color"] == "Copper Bloom"
+
+
+def test_intensity_sweep_rejects_max_side_above_preview_cap():
+    from app.schemas.tryon import MAX_PREVIEW_SIDE
+
+    response = client.post(
+        "/try-on/intensity-sweep",
+        json={
+            "selfie": f"data:image/png;base64,{_PNG_BASE64}",
+            "color": "Copper Bloom",
+            "max_side": MAX_PREVIEW_SIDE + 1,
+            "request_id": "req-sweep",
+        },
+    )
+    assert response.status_code == 400
+    assert response.json()["code"] == "INVALID_PAYLOAD"
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.core import segmenter as segmenter_module
+from app.core.segmenter import SegmentResult, upsample_mask
+from app.core.upsample import guided_upsample, upsample_region
+
+
+def _hair_scene(height: int = 240, width: int = 320):
+    """Dark hair blob with thin strands on a light, noisy background."""
+    rng = np.random.default_rng(5)
+    truth = np.zeros((height, width), dtype=np.uint8)
+    center, axes = (width // 2, height // 3), (width // 4, height // 4)
+    cv2.ellipse(truth, center, axes, 0, 0, 360, 255, -1)
+    for offset in range(-60, 61, 12):
+        start = (width // 2 + offset, height // 3 + height // 4 - 4)
+        cv2.line(truth, start, (start[0] + offset // 3, start[1] + 40), 255, 2)
+    image = np.where(truth[..., None] > 0, (40, 50, 70), (170, 190, 215))
+    image = image.astype(np.float32)
+    image += rng.normal(0, 8, (height, width, 1))
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    low = cv2.resize(truth, (width // 5, height // 5), interpolation=cv2.INTER_AREA)
+    return image, truth, low
+
+
+def _iou(mask: np.ndarray, truth: np.ndarray) -> float:
+    predicted = mask >= 128
+    expected = truth > 0
+    return (predicted & expected).sum() / (predicted | expected).sum()
+
+
+@pytest.mark.parametrize(
+    "size, low_size",
+    [((320, 240), (64, 48)), ((1000, 750), (256, 192)), ((1001, 777), (255, 198))],
+)
+def test_upsample_region_matches_full_resize_crop(size, low_size):
+    mask = np.random.default_rng(1).integers(0, 256, low_size[::-1], dtype=np.uint8)
+    full = cv2.resize(mask, size)
+    width, height = size
+    corner = (width - 50, height - 40, 50, 40)
+    for roi in [(0, 0, width, height), (13, 27, 150, 100), corner]:
+        x, y, roi_width, roi_height = roi
+        region = upsample_region(mask, width, height, roi)
+        assert region.shape == (roi_height, roi_width)
+        expected = full[y : y + roi_height, x : x + roi_width]
+        diff = np.abs(region.astype(np.int16) - expected)
+        assert diff.max() <= 1
+
+
+def test_guided_upsample_follows_image_edges():
+    image, truth, low = _hair_scene()
+
+    guided = guided_upsample(low, image)
+    linear = cv2.resize(low, (image.shape[1], image.shape[0]))
+
+    assert guided.shape == truth.shape and guided.dtype == np.uint8
+    assert _iou(guided, truth) > _iou(linear, truth)
+    assert _iou(guided, truth) > 0.97
+
+
+def test_guided_upsample_roi_matches_full_frame_crop():
+    image, _, low = _hair_scene()
+    roi = (60, 20, 200, 150)
+    x, y, width, height = roi
+
+    full = guided_upsample(low, image)
+    region = guided_upsample(low, image, roi)
+
+    assert region.shape == (height, width)
+    diff = np.abs(region.astype(np.int16) - full[y : y + height, x : x + width])
+    assert diff.max() <= 1
+
+
+def test_upsample_mask_uses_guide_only_in_guided_mode(monkeypatch):
+    image, _, low = _hair_scene()
+    segment = SegmentResult(
+        mask_id="guided", model_version="v", mask=low, width=320, height=240
+    )
+
+    guided = upsample_mask(segment, guide=image)
+    assert np.array_equal(guided, guided_upsample(low, image))
+
+    monkeypatch.setattr(segmenter_module, "MASK_UPSAMPLE_MODE", "linear")
+    linear = upsample_mask(segment, guide=image)
+    assert np.array_equal(linear, cv2.resize(low, (320, 240)))
@@ -0,0 +1,125 @@
+"""Latency vs quality (IoU) of mask upsampling (1080p selfie, single core).
+
+Compares the low-resolution paths (feather at model resolution, then
+linear or guided upsampling of the hair ROI) against feathering the
+full-resolution mask. Guided upsampling must match full-res quality at a
+fraction of its cost (the latency budget is enforced with
+``ENFORCE_LATENCY_BUDGETS=1``).
+"""
+import time
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from app.core.postprocess import (
+    postprocess_config_for,
+    postprocess_mask,
+    postprocess_segment,
+)
+from app.core.segmenter import SegmentResult, segment_roi, upsample_mask
+
+
+@pytest.fixture
+def hair_scene_1080p():
+    """Wavy hair outline with stray strands, and a 256x144 model mask."""
+    rng = np.random.default_rng(3)
+    height, width = 1080, 1920
+    rows, columns = np.mgrid[0:height, 0:width]
+    angle = np.arctan2(rows - 420, columns - 960)
+    radius = np.hypot((columns - 960) / 430, (rows - 420) / 360)
+    outline = 1 + 0.06 * np.sin(angle * 23) + 0.03 * np.sin(angle * 57 + 1)
+    truth = (radius < outline).astype(np.uint8) * 255
+    for _ in range(120):
+        theta = rng.uniform(0.9 * np.pi, 2.1 * np.pi)
+        start = (960 + 387 * np.cos(theta), 420 + 324 * np.sin(theta))
+        length = rng.uniform(30, 90)
+        direction = theta + rng.normal(0, 0.3)
+        end = (
+            start[0] + length * np.cos(direction),
+            start[1] + length * np.sin(direction),
+        )
+        cv2.line(
+            truth,
+            (int(start[0]), int(start[1])),
+            (int(end[0]), int(end[1])),
+            255,
+            int(rng.integers(2, 5)),
+        )
+    hair = np.array([40, 55, 80], dtype=np.float32)
+    background = np.array([170, 190, 215], dtype=np.float32)
+    image = np.where(truth[..., None] > 0, hair, background)
+    image += rng.normal(0, 10, (height, width, 1)).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    low = cv2.resize(truth, (256, 144), interpolation=cv2.INTER_AREA)
+    segment = SegmentResult(
+        mask_id="bench", model_version="v", mask=low, width=width, height=height
+    )
+    return image, truth, segment
+
+
+@pytest.fixture
+def single_core():
+    previous = cv2.getNumThreads()
+    cv2.setNumThreads(1)
+    yield
+    cv2.setNumThreads(previous)
+
+
+def _iou(mask: np.ndarray, truth: np.ndarray) -> float:
+    predicted = mask >= 128
+    expected = truth > 0
+    return float((predicted & expected).sum() / (predicted | expected).sum())
+
+
+def _p50_ms(render, runs: int = 9) -> float:
+    render()
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        render()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)[runs // 2]
+
+
+def test_guided_upsampling_latency_vs_iou(
+    hair_scene_1080p, single_core, latency_budget
+):
+    image, truth, segment = hair_scene_1080p
+    config = postprocess_config_for(80)
+    x, y, width, height = segment_roi(segment)
+
+    def full_resolution():
+        return postprocess_mask(upsample_mask(segment), config)
+
+    def low_resolution(guide):
+        processed = postprocess_segment(segment, config)
+        mask = np.zeros(truth.shape, dtype=np.uint8)
+        mask[y : y + height, x : x + width] = upsample_mask(
+            processed, roi=(x, y, width, height), guide=guide
+        )
+        return mask
+
+    results = {
+        "full-res feather": (_p50_ms(full_resolution), _iou(full_resolution(), truth)),
+        "low-res + linear": (
+            _p50_ms(lambda: low_resolution(None)),
+            _iou(low_resolution(None), truth),
+        ),
+        "low-res + guided": (
+            _p50_ms(lambda: low_resolution(image)),
+            _iou(low_resolution(image), truth),
+        ),
+    }
+    print("\nMask upsampling (1080p, 1 thread):")
+    for name, (latency, iou) in results.items():
+        print(f"  {name:<18} p50 {latency:6.1f} ms  IoU {iou:.4f}")
+
+    full_ms, full_iou = results["full-res feather"]
+    guided_ms, guided_iou = results["low-res + guided"]
+    assert guided_iou >= full_iou
+    assert guided_iou >= results["low-res + linear"][1]
+    latency_budget(
+        guided_ms < full_ms, f"guided {guided_ms:.1f} ms vs full-res {full_ms:.1f} ms"
+    )